@@ -0,0 +1,78 @@
+import os
+import sys
+import time
+import argparse
+import threading
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Usage (from backend_brain/):
+#   python -m modules.face_models export        # once
+#   python -m benchmarks.batch_inference [--model vgg_face] [--concurrency 1,2,4,8]
+# N threads (stand-ins for N sessions) call one ONNX face model concurrently, once through
+# the batching queue and once unbatched. Batched throughput should grow with concurrency.
+CALLS_PER_THREAD = 20
+WARMUP_CALLS = 3
+
+def run(fn, face, threads, calls):
+    """Returns: items/sec across all threads."""
+    barrier = threading.Barrier(threads + 1)
+
+    def caller():
+        barrier.wait()
+        for _ in range(calls): fn(face)
+
+    workers = [threading.Thread(target=caller) for _ in range(threads)]
+    for w in workers: w.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for w in workers: w.join()
+    return threads * calls / (time.perf_counter() - started)
+
+def main():
+    parser = argparse.ArgumentParser(description="Batched vs unbatched face model throughput under concurrency")
+    parser.add_argument("--model", choices=["emotion", "vgg_face"], default="vgg_face")
+    parser.add_argument("--concurrency", default="1,2,4,8")
+    parser.add_argument("--calls", type=int, default=CALLS_PER_THREAD)
+    parser.add_argument("--quantized", action="store_true")
+    args = parser.parse_args()
+
+    from modules import face_models
+    from modules.inference_queue import MAX_BATCH, MAX_WAIT
+    if not face_models.exported(args.quantized):
+        print("❌ ONNX face models not exported (python -m modules.face_models export)")
+        return 1
+
+    face = np.random.default_rng(0).random((160, 160, 3), dtype=np.float32)  # Pre-cropped BGR [0, 1]
+    rows = []
+    for batching in (False, True):
+        backend = face_models.OnnxFaceBackend(quantized=args.quantized, batching=batching)
+        fn = backend.embedding if args.model == "vgg_face" else backend.emotion_probs
+        queue = backend.vgg_face_queue if args.model == "vgg_face" else backend.emotion_queue
+        for _ in range(WARMUP_CALLS): fn(face)
+        for threads in (int(n) for n in args.concurrency.split(",")):
+            before = queue.stats()
+            rate = run(fn, face, threads, args.calls)
+            after = queue.stats()
+            batches = after["batches"] - before["batches"]
+            mean = (after["items"] - before["items"]) / batches if batches else 1.0
+            rows.append((batching, threads, rate, mean))
+
+    print(f"   {args.model}   max batch {MAX_BATCH}, max wait {MAX_WAIT * 1000:.1f} ms")
+    for batching, threads, rate, mean in rows:
+        label = "batched  " if batching else "unbatched"
+        print(f"   {label} x{threads:<3} {rate:8.1f} items/s   mean batch {mean:.2f}")
+
+    unbatched = {t: r for b, t, r, _ in rows if not b}
+    batched = {t: r for b, t, r, _ in rows if b}
+    top = max(batched)
+    print(f"✅ x{top}: batched {batched[top] / unbatched[top]:.2f}x unbatched throughput")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
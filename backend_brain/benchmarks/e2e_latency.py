@@ -0,0 +1,314 @@
+import os
+import sys
+import json
+import time
+import math
+import wave
+import base64
+import asyncio
+import argparse
+import subprocess
+import urllib.error
+import urllib.request
+import numpy as np
+import cv2
+import websockets
+from scipy import signal
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+from benchmarks.mock_services import MockConfig, MockServices
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Usage (from backend_brain/):
+#   python -m benchmarks.e2e_latency --audio fixtures/*.wav [--video clip.mp4] --out results.json
+# Audio fixtures: one trimmed utterance per WAV (resampled to 16 kHz mono if needed).
+SAMPLE_RATE = 16000
+CHUNK_SAMPLES = 512               # 32 ms per "audio" packet (Silero VAD frame size at 16 kHz)
+TRAILING_SILENCE = 3.0            # Max silence streamed after an utterance while waiting for "thinking"
+TURN_TIMEOUT = 60.0               # Seconds to wait for a full reply
+TIMING_GRACE = 1.0                # Wait after response_end for the server's turn_timing packet
+JPEG_QUALITY = 80
+
+# Reported stages. Server-measured ones come from the "turn_timing" packet
+# (AVAANI_TURN_TIMINGS=1); client_total is what the user feels: last speech sample sent
+# -> first avatar audio received.
+STAGES = ("endpoint_ms", "stt_ms", "llm_ms", "tts_first_chunk_ms", "total_ms", "client_total_ms")
+PERCENTILES = (50, 95, 99)
+
+# ==========================================
+# FIXTURES
+# ==========================================
+def load_wav(path):
+    """Returns: int16 mono samples at SAMPLE_RATE."""
+    with wave.open(path, "rb") as w:
+        if w.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit PCM WAV is supported")
+        rate, channels = w.getframerate(), w.getnchannels()
+        audio = np.frombuffer(w.readframes(w.getnframes()), dtype=np.int16)
+    if channels > 1:
+        audio = audio.reshape(-1, channels).mean(axis=1)
+    if rate != SAMPLE_RATE:
+        g = math.gcd(rate, SAMPLE_RATE)
+        audio = signal.resample_poly(audio.astype(np.float32), SAMPLE_RATE // g, rate // g)
+    return np.clip(audio, -32768, 32767).astype(np.int16)
+
+def load_video_frames(path, max_frames=300):
+    """Decodes a clip once into base64 JPEG payloads (looped during the run)."""
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < max_frames:
+        ok, frame = cap.read()
+        if not ok: break
+        ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+        if ok: frames.append(base64.b64encode(buf.tobytes()).decode("ascii"))
+    cap.release()
+    if not frames:
+        raise ValueError(f"{path}: no decodable frames")
+    return frames
+
+def chunks(audio):
+    for i in range(0, len(audio), CHUNK_SAMPLES):
+        piece = audio[i:i + CHUNK_SAMPLES]
+        if len(piece) < CHUNK_SAMPLES:
+            piece = np.pad(piece, (0, CHUNK_SAMPLES - len(piece)))
+        yield base64.b64encode(piece.tobytes()).decode("ascii")
+
+SILENCE = base64.b64encode(np.zeros(CHUNK_SAMPLES, np.int16).tobytes()).decode("ascii")
+
+# ==========================================
+# SESSION
+# ==========================================
+class Turn:
+    def __init__(self, fixture):
+        self.fixture = fixture
+        self.speech_end = None
+        self.marks = {}
+        self.timing = None
+        self.thinking = asyncio.Event()
+        self.ended = asyncio.Event()
+        self.done = asyncio.Event()
+
+    def mark(self, name):
+        self.marks.setdefault(name, time.time())
+
+    def result(self):
+        row = {"fixture": self.fixture, "ok": "first_audio" in self.marks}
+        if self.timing:
+            row.update({k: self.timing.get(k) for k in STAGES if k in self.timing})
+            row["stt_path"] = self.timing.get("stt_path")
+            row["speculated"] = self.timing.get("speculated")
+        if row["ok"] and self.speech_end is not None:
+            row["client_total_ms"] = round((self.marks["first_audio"] - self.speech_end) * 1000, 1)
+        return row
+
+async def _receive(ws, state):
+    async for raw in ws:
+        msg = json.loads(raw)
+        kind = msg.get("type")
+        turn = state.get("turn")
+        if kind == "system":
+            state.setdefault("system", []).append(msg.get("status"))
+            if msg.get("status") == "biometrics_loaded":
+                state["biometrics"].set()
+        if turn is None: continue
+        if kind == "status" and msg.get("mode") == "thinking":
+            turn.mark("thinking")
+            turn.thinking.set()
+        elif kind == "response_start":
+            turn.mark("response_start")
+        elif kind == "audio_chunk":
+            turn.mark("first_audio")
+        elif kind == "response_end":
+            turn.mark("response_end")
+            turn.ended.set()
+        elif kind == "turn_timing":
+            turn.timing = msg
+            turn.done.set()
+
+async def _send_video(ws, frames, fps):
+    interval = 1.0 / fps
+    i = 0
+    while True:
+        await ws.send(json.dumps({"type": "video", "payload": frames[i % len(frames)]}))
+        i += 1
+        await asyncio.sleep(interval)
+
+async def _run_turn(ws, state, name, audio):
+    turn = Turn(name)
+    state["turn"] = turn
+    period = CHUNK_SAMPLES / SAMPLE_RATE
+
+    # Real-time utterance, then silence until the server endpoints (a live mic keeps sending)
+    for payload in chunks(audio):
+        await ws.send(json.dumps({"type": "audio", "payload": payload}))
+        await asyncio.sleep(period)
+    turn.speech_end = time.time() - period
+    deadline = time.time() + TRAILING_SILENCE
+    while not turn.thinking.is_set() and time.time() < deadline:
+        await ws.send(json.dumps({"type": "audio", "payload": SILENCE}))
+        await asyncio.sleep(period)
+
+    try:
+        await asyncio.wait_for(turn.ended.wait(), TURN_TIMEOUT)
+        await asyncio.wait_for(turn.done.wait(), TIMING_GRACE)
+    except asyncio.TimeoutError:
+        pass
+    state["turn"] = None
+    return turn.result()
+
+async def run_session(url, fixtures, turns, video_frames=None, video_fps=10, user_id=None, username=None):
+    results = []
+    async with websockets.connect(url, max_size=None) as ws:
+        state = {"turn": None, "biometrics": asyncio.Event()}
+        receiver = asyncio.create_task(_receive(ws, state))
+        video = asyncio.create_task(_send_video(ws, video_frames, video_fps)) if video_frames else None
+        try:
+            if user_id:
+                await ws.send(json.dumps({"type": "config", "user_id": user_id, "username": username or "bench"}))
+                try: await asyncio.wait_for(state["biometrics"].wait(), 30)
+                except asyncio.TimeoutError: print("⚠️ Biometrics not loaded, continuing")
+
+            names = list(fixtures)
+            for i in range(turns):
+                name = names[i % len(names)]
+                row = await _run_turn(ws, state, name, fixtures[name])
+                results.append(row)
+                status = f"{row.get('client_total_ms', '-')} ms" if row["ok"] else "no reply"
+                print(f"   turn {i + 1}/{turns} [{os.path.basename(name)}]: {status}")
+        finally:
+            for task in (receiver, video):
+                if task: task.cancel()
+    return results
+
+# ==========================================
+# SERVER
+# ==========================================
+def spawn_server(port, env_overrides):
+    env = dict(os.environ)
+    env.update(env_overrides)
+    env["AVAANI_TURN_TIMINGS"] = "1"
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BACKEND_DIR, env=env
+    )
+
+def wait_ready(http_url, timeout, proc=None):
+    """Polls /ready until every subsystem is loaded. Returns: the final status payload."""
+    deadline = time.time() + timeout
+    last = None
+    while time.time() < deadline:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError(f"Server exited during startup (code {proc.returncode})")
+        try:
+            with urllib.request.urlopen(f"{http_url}/ready", timeout=2) as r:
+                return json.loads(r.read())
+        except urllib.error.HTTPError as e:
+            last = json.loads(e.read() or b"{}")
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"Server not ready after {timeout}s: {last}")
+
+# ==========================================
+# REPORT
+# ==========================================
+def summarize(results):
+    stages = {}
+    for stage in STAGES:
+        values = [r[stage] for r in results if r.get(stage) is not None]
+        if not values: continue
+        p = np.percentile(values, PERCENTILES)
+        stages[stage] = {"n": len(values), "mean": round(float(np.mean(values)), 1),
+                         **{f"p{q}": round(float(v), 1) for q, v in zip(PERCENTILES, p)}}
+    return stages
+
+def print_report(stages, baseline=None):
+    print(f"\n{'stage':<22}{'n':>5}{'p50':>10}{'p95':>10}{'p99':>10}" + ("   Δp50     Δp95" if baseline else ""))
+    for stage, s in stages.items():
+        line = f"{stage:<22}{s['n']:>5}{s['p50']:>10.1f}{s['p95']:>10.1f}{s['p99']:>10.1f}"
+        old = (baseline or {}).get(stage)
+        if old:
+            line += f"{s['p50'] - old['p50']:>+9.1f}{s['p95'] - old['p95']:>+9.1f}"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end conversational latency benchmark")
+    parser.add_argument("--audio", nargs="+", required=True, help="Utterance WAV fixtures (replayed in order)")
+    parser.add_argument("--video", help="Video clip replayed as 'video' frames during the run")
+    parser.add_argument("--video-fps", type=float, default=10)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--url", help="Benchmark an already running server (ws://host:port). Default: spawn one")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--mock-port", type=int, default=8766)
+    parser.add_argument("--llm-latency", type=float, default=0.35, help="Mock Groq time to first token (s)")
+    parser.add_argument("--llm-jitter", type=float, default=0.05)
+    parser.add_argument("--llm-token-interval", type=float, default=0.02)
+    parser.add_argument("--reply", default=None, help="Text the mock LLM answers with")
+    parser.add_argument("--faces", help="Dir served as Supabase 'faces' storage ({user_id}/pose_N.jpg)")
+    parser.add_argument("--user-id", help="Send a login config for this user (loads biometrics)")
+    parser.add_argument("--ready-timeout", type=float, default=600)
+    parser.add_argument("--out", help="Write JSON results here")
+    parser.add_argument("--compare", help="Previous JSON results to diff against")
+    args = parser.parse_args()
+
+    fixtures = {path: load_wav(path) for path in args.audio}
+    frames = load_video_frames(args.video) if args.video else None
+    config = MockConfig(first_token=args.llm_latency, token_interval=args.llm_token_interval,
+                        jitter=args.llm_jitter, faces_dir=args.faces)
+    if args.reply: config.reply = args.reply
+
+    mocks = MockServices(config, port=args.mock_port).start()
+    proc = None
+    try:
+        if args.url:
+            ws_url = args.url.rstrip("/") + "/ws/avaani"
+        else:
+            print(f"🚀 Spawning server on :{args.port} (mocks on {mocks.url})")
+            proc = spawn_server(args.port, mocks.server_env())
+            ws_url = f"ws://127.0.0.1:{args.port}/ws/avaani"
+        http_url = ws_url.replace("ws://", "http://", 1).replace("wss://", "https://", 1).rsplit("/ws/", 1)[0]
+
+        started = time.time()
+        ready = wait_ready(http_url, args.ready_timeout, proc)
+        print(f"✅ Server ready in {time.time() - started:.1f}s")
+
+        results = asyncio.run(run_session(ws_url, fixtures, args.turns, frames, args.video_fps, args.user_id))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try: proc.wait(timeout=15)
+            except subprocess.TimeoutExpired: proc.kill()
+        mocks.stop()
+
+    stages = summarize(results)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f).get("stages")
+    print_report(stages, baseline)
+
+    report = {
+        "meta": {
+            "timestamp": time.time(),
+            "url": ws_url,
+            "fixtures": [os.path.basename(p) for p in args.audio],
+            "video": os.path.basename(args.video) if args.video else None,
+            "turns": args.turns,
+            "failures": sum(1 for r in results if not r["ok"]),
+            "llm": {"first_token": config.first_token, "jitter": config.jitter, "token_interval": config.token_interval},
+            "subsystems": ready.get("subsystems")
+        },
+        "stages": stages,
+        "turns": results
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n📝 Results written to {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import os
+import sys
+import argparse
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+from benchmarks.micro import speech_like, SAMPLE_RATE, CHUNK_SAMPLES
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Usage (from backend_brain/):
+#   python -m benchmarks.echo_check [--delay 0.35] [--echo-gain 0.5]
+# Simulates a session on a virtual clock: Avaani's reply is sent in paced slices (24 kHz, like
+# Kokoro), the mic hears it back through a short room response after `delay`, and the user talks
+# over the last part. Exit code 1 if echo-only chunks are not silenced or the user's speech is.
+TTS_RATE = 24000
+REPLY_SECONDS = 4.0
+SLICE_SECONDS = 0.25
+LEAD = 0.3                        # Sent ahead of playback, as modules.playout does
+BARGE_IN = (2.5, 4.0)             # User talks over Avaani from/to (seconds)
+SETTLE = 1.5                      # Delay estimation gets this long before echo chunks are judged
+MIN_GATED = 0.9                   # Share of echo-only chunks that must be silenced
+MAX_USER_GATED = 0.05             # Share of user speech chunks that may be silenced
+
+def user_voice(seconds, rng):
+    """A different talker: higher pitch, other syllable rate."""
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    phase = 2 * np.pi * np.cumsum(220 + 30 * np.sin(2 * np.pi * 1.3 * t)) / SAMPLE_RATE
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 3 * t + 1.0) ** 2
+    return (0.25 * sum(np.sin(k * phase) / k for k in range(1, 5)) * envelope).astype(np.float32)
+
+def main():
+    parser = argparse.ArgumentParser(description="Echo suppression check on synthetic audio")
+    parser.add_argument("--delay", type=float, default=0.35, help="Send -> echo-in-mic delay (s)")
+    parser.add_argument("--echo-gain", type=float, default=0.5)
+    args = parser.parse_args()
+
+    from scipy.signal import resample_poly
+    from modules.echo import EchoSuppressor
+    rng = np.random.default_rng(7)
+
+    reply16 = speech_like(REPLY_SECONDS, rng)
+    reply24 = np.clip(resample_poly(reply16, 3, 2), -1, 1)
+    pcm = (reply24 * 32767).astype(np.int16).tobytes()
+    step = int(SLICE_SECONDS * TTS_RATE) * 2
+
+    # Mic: room-coloured echo `delay` after the first slice is sent (end of the first mic chunk), noise,
+    # then the user barging in
+    total = int((REPLY_SECONDS + args.delay + 1.0) * SAMPLE_RATE)
+    room = np.array([1.0, 0.0, 0.35, 0.0, 0.0, 0.15, 0.05])
+    echo = np.zeros(total, dtype=np.float32)
+    shift = CHUNK_SAMPLES + int(args.delay * SAMPLE_RATE)
+    echo[shift:shift + len(reply16)] = args.echo_gain * np.convolve(reply16, room)[:len(reply16)]
+    user = np.zeros(total, dtype=np.float32)
+    a, b = (int(s * SAMPLE_RATE) for s in BARGE_IN)
+    user[a:b] = user_voice(BARGE_IN[1] - BARGE_IN[0], rng)
+    mic = echo + user + 0.003 * rng.standard_normal(total).astype(np.float32)
+
+    now = [0.0]
+    suppressor = EchoSuppressor(clock=lambda: now[0], enabled=True)
+    sent = 0
+    echo_only, user_gated, user_chunks, user_kept = [], 0, 0, []
+    for i in range(0, total - CHUNK_SAMPLES, CHUNK_SAMPLES):
+        now[0] = (i + CHUNK_SAMPLES) / SAMPLE_RATE
+        while sent < len(pcm) and sent / 2 / TTS_RATE - LEAD <= now[0]:
+            suppressor.played(pcm[sent:sent + step], TTS_RATE)
+            sent += step
+        out = suppressor.process(mic[i:i + CHUNK_SAMPLES].copy())
+
+        e, u = echo[i:i + CHUNK_SAMPLES], user[i:i + CHUNK_SAMPLES]
+        has_echo, has_user = np.abs(e).max() > 0.02, np.abs(u).max() > 0.02
+        if has_echo and not has_user and now[0] > SETTLE:
+            echo_only.append(not out.any())
+        elif has_user:
+            user_chunks += 1
+            if not out.any(): user_gated += 1
+            else: user_kept.append(np.dot(out, u) / (np.linalg.norm(out) * np.linalg.norm(u) + 1e-9))
+
+    gated = np.mean(echo_only) if echo_only else 0.0
+    lost = user_gated / max(user_chunks, 1)
+    print(f"   delay estimate      {suppressor.delay / SAMPLE_RATE if suppressor.delay is not None else float('nan'):.3f} s "
+          f"(true {args.delay:.3f}, correlation {suppressor.correlation:.2f})")
+    print(f"   echo-only gated     {gated:.0%} of {len(echo_only)} chunks")
+    print(f"   user chunks gated   {lost:.0%} of {user_chunks}; kept ones correlate {np.mean(user_kept) if user_kept else 0:.2f} with the clean voice")
+
+    failures = []
+    if gated < MIN_GATED: failures.append(f"only {gated:.0%} of echo-only chunks silenced")
+    if lost > MAX_USER_GATED: failures.append(f"{lost:.0%} of user speech chunks silenced")
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("✅ Echo silenced, barge-in speech kept")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
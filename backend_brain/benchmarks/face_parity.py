@@ -0,0 +1,110 @@
+import os
+import sys
+import glob
+import time
+import argparse
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Usage (from backend_brain/):
+#   python -m modules.face_models export [--quantize]       # once
+#   python -m benchmarks.face_parity --images faces/*.jpg [--quantized]
+# Compares the ONNX face backend with DeepFace on the same images. Exit code 1 on a parity failure.
+#
+# 1. Model parity: both runtimes get the SAME DeepFace-extracted face crop.
+# 2. Pipeline parity: each backend does its own face extraction (what production sees).
+EMOTION_TOLERANCE = 1.0           # Max abs difference of any emotion score (percent points)
+EMBEDDING_TOLERANCE = 1e-3        # Max cosine distance between the two embeddings of one crop
+QUANTIZED_EMOTION_TOLERANCE = 5.0
+QUANTIZED_EMBEDDING_TOLERANCE = 0.02
+PIPELINE_DOMINANT_AGREEMENT = 0.9 # Share of images whose dominant emotion must match
+PIPELINE_EMBEDDING_TOLERANCE = 0.05
+
+def load_images(patterns):
+    import cv2
+    images = []
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)):
+            img = cv2.imread(path)
+            if img is not None: images.append((os.path.basename(path), img))
+    return images
+
+def deepface_crops(img):
+    """The face crop DeepFace itself feeds its models (BGR, [0, 1])."""
+    from deepface import DeepFace
+    faces = DeepFace.extract_faces(img, detector_backend="opencv", enforce_detection=False, align=True)
+    return faces[0]["face"][:, :, ::-1].astype(np.float32)  # extract_faces returns RGB
+
+def timed(fn, repeat=5):
+    fn()
+    started = time.perf_counter()
+    for _ in range(repeat): fn()
+    return (time.perf_counter() - started) / repeat * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="ONNX vs DeepFace parity for the emotion and VGG-Face models")
+    parser.add_argument("--images", nargs="+", required=True, help="Face images (globs allowed)")
+    parser.add_argument("--quantized", action="store_true", help="Check the int8 exports")
+    args = parser.parse_args()
+
+    from modules import face_models
+    from deepface import DeepFace
+    images = load_images(args.images)
+    if not images:
+        print("❌ No readable images")
+        return 1
+
+    onnx = face_models.OnnxFaceBackend(quantized=args.quantized)
+    reference = face_models.DeepFaceBackend()
+    keras_emotion = DeepFace.build_model(model_name="Emotion", task="facial_attribute")
+    keras_vgg = DeepFace.build_model(model_name="VGG-Face", task="facial_recognition")
+    emo_tol = QUANTIZED_EMOTION_TOLERANCE if args.quantized else EMOTION_TOLERANCE
+    emb_tol = QUANTIZED_EMBEDDING_TOLERANCE if args.quantized else EMBEDDING_TOLERANCE
+
+    failures = []
+    emo_diffs, emb_dists, pipe_agree, pipe_dists = [], [], [], []
+    for name, img in images:
+        # 1. Model parity (same crop)
+        face = deepface_crops(img)
+        keras_probs = face_models.emotion_result(keras_emotion.model.predict(face_models.emotion_input(face), verbose=0)[0])
+        onnx_probs = face_models.emotion_result(onnx.emotion_probs(face))
+        diff = max(abs(keras_probs[0]["emotion"][k] - onnx_probs[0]["emotion"][k]) for k in face_models.EMOTION_LABELS)
+        dist = face_models.cosine_distance(keras_vgg.forward(face_models.vgg_face_input(face)), onnx.embedding(face))
+        emo_diffs.append(diff)
+        emb_dists.append(dist)
+        if diff > emo_tol: failures.append(f"{name}: emotion differs by {diff:.2f} points")
+        if dist > emb_tol: failures.append(f"{name}: embedding cosine distance {dist:.5f}")
+
+        # 2. Pipeline parity (own extraction, same output shapes the vision workers consume)
+        ref = reference.analyze_emotion(img)[0]
+        ours = onnx.analyze_emotion(img)[0]
+        pipe_agree.append(ref["dominant_emotion"] == ours["dominant_emotion"])
+        pipe_dists.append(face_models.cosine_distance(reference.represent(img)[0]["embedding"], onnx.represent(img)[0]["embedding"]))
+
+    print(f"   images                     {len(images)}")
+    print(f"   emotion max diff (points)  {max(emo_diffs):.4f}   (tolerance {emo_tol})")
+    print(f"   embedding max distance     {max(emb_dists):.6f} (tolerance {emb_tol})")
+    print(f"   pipeline dominant agree    {np.mean(pipe_agree):.0%}")
+    print(f"   pipeline embedding dist    p50 {np.median(pipe_dists):.4f}  max {max(pipe_dists):.4f}")
+    if np.mean(pipe_agree) < PIPELINE_DOMINANT_AGREEMENT:
+        failures.append(f"pipeline: dominant emotion agrees on {np.mean(pipe_agree):.0%} of images")
+    if max(pipe_dists) > PIPELINE_EMBEDDING_TOLERANCE:
+        failures.append(f"pipeline: embedding distance up to {max(pipe_dists):.4f}")
+
+    _, img = images[0]
+    print(f"   analyze_emotion   deepface {timed(lambda: reference.analyze_emotion(img)):7.1f} ms   onnx {timed(lambda: onnx.analyze_emotion(img)):7.1f} ms")
+    print(f"   represent         deepface {timed(lambda: reference.represent(img)):7.1f} ms   onnx {timed(lambda: onnx.represent(img)):7.1f} ms")
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("✅ ONNX face models match DeepFace")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+from benchmarks.mock_services import MockConfig, MockServices
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Usage (from backend_brain/):
+#   python -m benchmarks.llm_failover                # all scenarios
+#   python -m benchmarks.llm_failover --only outage
+# Runs modules.llm_providers against two local mock Groq endpoints and checks that hedging,
+# failover and circuit breaking behave. Exit code 1 when a scenario's expectation fails.
+PRIMARY_PORT = 8767
+SECONDARY_PORT = 8768
+MESSAGES = [{"role": "user", "content": "ping"}]
+
+# ==========================================
+# SCENARIOS
+# ==========================================
+def run(router, n):
+    """Returns: list of (seconds, provider or None)."""
+    from modules.llm_providers import LLMUnavailable
+    rows = []
+    for _ in range(n):
+        started = time.perf_counter()
+        try:
+            _, provider = router.complete(MESSAGES, max_tokens=20)
+        except LLMUnavailable:
+            provider = None
+        rows.append((time.perf_counter() - started, provider))
+    return rows
+
+def summarize(name, rows):
+    seconds = [s for s, _ in rows]
+    winners = {}
+    for _, provider in rows:
+        winners[provider or "failed"] = winners.get(provider or "failed", 0) + 1
+    p50, p95 = np.percentile(seconds, [50, 95])
+    print(f"   {name:<10} p50 {p50 * 1000:7.0f} ms   p95 {p95 * 1000:7.0f} ms   winners {winners}")
+    return winners
+
+def scenario_hedge(router, primary, secondary, args):
+    """Primary has a slow tail: hedges to the secondary should cut p95."""
+    primary.first_token, primary.jitter = 0.3, 0.0
+    run(router, 12)  # Fill the primary's latency window (p95 ~ 0.3 s)
+    primary.first_token, primary.jitter = 1.5, 1.2
+    winners = summarize("hedge", run(router, args.requests))
+    return winners.get("secondary", 0) > 0 and "failed" not in winners
+
+def scenario_outage(router, primary, secondary, args):
+    """Primary returns 503s: requests fail over, then the circuit stops trying it."""
+    time.sleep(3.0)  # Let primary calls left running by hedges finish (a late success closes the circuit)
+    primary.fail_rate, primary.first_token, primary.jitter = 1.0, 0.05, 0.0
+    rows = run(router, args.requests)
+    winners = summarize("outage", rows)
+    state = router.providers[0].breaker.state
+    print(f"   primary circuit: {state}")
+    return winners.get("secondary", 0) == args.requests and state == "open"
+
+def scenario_recovery(router, primary, secondary, args):
+    """Primary comes back: after the cooldown a probe closes the circuit."""
+    primary.fail_rate = 0.0
+    breaker = router.providers[0].breaker
+    time.sleep(max(0.0, breaker.cooldown - (time.time() - (breaker.opened_at or 0))) + 0.1)
+    winners = summarize("recovery", run(router, args.requests))
+    print(f"   primary circuit: {breaker.state}")
+    return winners.get("primary", 0) > 0 and breaker.state == "closed"
+
+SCENARIOS = {
+    "hedge": scenario_hedge,
+    "outage": scenario_outage,
+    "recovery": scenario_recovery
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM provider hedging/failover check against local mocks")
+    parser.add_argument("--only", help=f"Comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--cooldown", type=float, default=3.0, help="Circuit breaker cooldown for the run")
+    args = parser.parse_args()
+
+    primary_cfg = MockConfig(first_token=0.3, token_interval=0.0, reply="primary")
+    secondary_cfg = MockConfig(first_token=0.25, token_interval=0.0, reply="secondary")
+    mocks = [MockServices(primary_cfg, port=PRIMARY_PORT).start(), MockServices(secondary_cfg, port=SECONDARY_PORT).start()]
+
+    os.environ["GROQ_API_KEY"] = "gsk_benchmark"
+    from modules.llm_providers import Provider, ProviderRouter
+    router = ProviderRouter([
+        Provider("primary", "mock", base_url=mocks[0].url, timeout=5.0),
+        Provider("secondary", "mock", base_url=mocks[1].url, timeout=5.0)
+    ])
+    for provider in router.providers:
+        provider.breaker.cooldown = args.cooldown
+
+    failed = []
+    try:
+        selected = args.only.split(",") if args.only else list(SCENARIOS)
+        for name in selected:
+            print(f"🔀 {name}: {SCENARIOS[name].__doc__}")
+            if not SCENARIOS[name](router, primary_cfg, secondary_cfg, args):
+                failed.append(name)
+    finally:
+        for mock in mocks: mock.stop()
+
+    for name in failed:
+        print(f"❌ {name}: expectation not met")
+    if not failed:
+        print("✅ Hedging, failover and circuit breaking behave")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,281 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import subprocess
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Usage (from backend_brain/):
+#   python -m benchmarks.micro                      # run all, compare to baseline, append history
+#   python -m benchmarks.micro --only gesture,emotion
+#   python -m benchmarks.micro --update-baseline    # accept current numbers as the new baseline
+# Exit code 1 when any metric regresses beyond its tolerance or a benchmark crashes.
+# A benchmark whose optional dependency is not installed is reported as skipped.
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+BASELINE_PATH = os.path.join(RESULTS_DIR, "micro_baseline.json")
+HISTORY_PATH = os.path.join(RESULTS_DIR, "micro_history.jsonl")
+
+DEFAULT_TOLERANCE = 0.15          # Fractional slowdown allowed before a metric counts as a regression
+TOLERANCES = {                    # Noisier stages (by metric prefix) get more slack
+    "vision.": 0.25,
+    "mouth.": 0.20,
+    "ears.process_buffer": 0.20
+}
+
+SAMPLE_RATE = 16000
+CHUNK_SAMPLES = 512
+UTTERANCE_SECONDS = (1.0, 3.0, 6.0)
+RESOLUTIONS = {"480p": (640, 480), "720p": (1280, 720), "1080p": (1920, 1080)}
+TTS_TEXT = "Hello there. I can see you are holding a coffee mug, so let us keep this short."
+SEED = 1234
+
+LOWER, HIGHER = "lower", "higher"   # Which direction is better
+
+# ==========================================
+# FIXTURES (deterministic)
+# ==========================================
+def speech_like(seconds, rng):
+    """Harmonic tone amplitude-modulated at a syllable rate, plus noise. float32 in [-1, 1]."""
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    f0 = 140 + 20 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(f0) / SAMPLE_RATE
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 6))
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t) ** 2
+    audio = 0.3 * voiced * envelope + 0.02 * rng.standard_normal(len(t))
+    return np.clip(audio, -1, 1).astype(np.float32)
+
+def load_wav_float(path):
+    from benchmarks.e2e_latency import load_wav
+    return load_wav(path).astype(np.float32) / 32768.0
+
+def load_image(path, rng):
+    import cv2
+    if path:
+        img = cv2.imread(path)
+        if img is None: raise ValueError(f"{path}: not an image")
+        return img
+    # No fixture: smooth synthetic scene (landmark models will mostly find nothing)
+    img = rng.integers(0, 255, (270, 480, 3), dtype=np.uint8)
+    return cv2.GaussianBlur(img, (0, 0), 6)
+
+# ==========================================
+# MEASUREMENT
+# ==========================================
+def measure(fn, repeat, warmup=3):
+    """Median seconds per call."""
+    for _ in range(warmup): fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return float(np.median(samples))
+
+def metric(value, unit, better):
+    return {"value": round(value, 4), "unit": unit, "better": better}
+
+# ==========================================
+# BENCHMARKS
+# ==========================================
+def bench_gesture(args, rng):
+    from modules.eyes import GestureEngine
+    engine = GestureEngine()
+    hand = rng.uniform(0.3, 0.7, (21, 3)).astype(np.float32)
+    per_call = measure(lambda: engine.analyze(hand, (720, 1280, 3)), args.repeat * 100)
+    return {"gesture.analyze": metric(per_call * 1e6, "us", LOWER)}
+
+def bench_emotion(args, rng):
+    from modules.eyes import EmotionEngine, RAW_EMOTIONS
+    engine = EmotionEngine()
+    scores = rng.uniform(1, 100, len(RAW_EMOTIONS))
+    analysis = [{"emotion": {e: float(s) for e, s in zip(RAW_EMOTIONS, scores / scores.sum() * 100)}}]
+    landmarks = rng.uniform(0.3, 0.7, (478, 3)).astype(np.float32)
+    posture = {"inclination": 5.0, "status": "Upright"}
+    per_call = measure(lambda: engine.process(analysis, 0.8, posture, 0.9, landmarks), args.repeat * 100)
+    return {"emotion.process": metric(per_call * 1e6, "us", LOWER)}
+
+def bench_vision(args, rng):
+    import cv2
+    from modules.eyes import VisionSystem
+    vision = VisionSystem()
+    vision.stop()  # Background detectors off: measure the per-frame landmark path only
+    base = load_image(args.image, rng)
+    results = {}
+    for name, size in RESOLUTIONS.items():
+        frame = cv2.resize(base, size, interpolation=cv2.INTER_LINEAR)
+        per_call = measure(lambda: vision.process_frame(frame.copy()), args.repeat)
+        results[f"vision.process_frame.{name}"] = metric(1.0 / per_call, "fps", HIGHER)
+    return results
+
+def bench_ears(args, rng):
+    from modules.ears import EarSystem, load_stt_model
+    ears = EarSystem(load_stt_model())
+    utterance = load_wav_float(args.audio) if args.audio else speech_like(max(UTTERANCE_SECONDS), rng)
+    if len(utterance) < max(UTTERANCE_SECONDS) * SAMPLE_RATE:
+        utterance = np.tile(utterance, int(np.ceil(max(UTTERANCE_SECONDS) * SAMPLE_RATE / len(utterance))))
+    chunks = [utterance[i:i + CHUNK_SAMPLES] for i in range(0, len(utterance) - CHUNK_SAMPLES, CHUNK_SAMPLES)]
+
+    # Per-chunk cost (VAD + gating). Fed faster than real time, so the silence timer never fires.
+    state = {"i": 0}
+    def feed():
+        ears.process_chunk(chunks[state["i"] % len(chunks)].copy())
+        state["i"] += 1
+        if state["i"] % len(chunks) == 0: ears._reset_buffer()
+    per_chunk = measure(feed, args.repeat * 20, warmup=10)
+    ears._reset_buffer()
+    ears.is_speaking = False
+
+    results = {
+        "ears.process_chunk": metric(per_chunk * 1e6, "us", LOWER),
+        "ears.process_chunk.realtime_x": metric((CHUNK_SAMPLES / SAMPLE_RATE) / per_chunk, "x", HIGHER)
+    }
+    # Post-endpoint cost only: the utterance is buffered (and streamed through the DSP) up front
+    for seconds in UTTERANCE_SECONDS:
+        ears._reset_buffer()
+        for chunk in np.array_split(utterance[:int(seconds * SAMPLE_RATE)], int(seconds * SAMPLE_RATE) // CHUNK_SAMPLES):
+            ears._buffer_chunk(chunk.copy(), True)
+        results[f"ears.process_buffer.{seconds:g}s"] = metric(measure(ears._process_buffer, max(3, args.repeat // 5), warmup=1) * 1000, "ms", LOWER)
+    return results
+
+def bench_mouth(args, rng):
+    from modules.mouth import Mouth
+    mouth = Mouth()
+    if mouth.kokoro is None: raise RuntimeError("Kokoro failed to load")
+
+    async def synthesize():
+        started = time.perf_counter()
+        first, samples, rate = None, 0, 24000
+        async for pcm, sample_rate in mouth.generate_stream(TTS_TEXT):
+            if first is None: first = time.perf_counter() - started
+            samples += len(pcm) // 2
+            rate = sample_rate
+        return first, time.perf_counter() - started, samples / rate
+
+    asyncio.run(synthesize())  # Warmup
+    runs = [asyncio.run(synthesize()) for _ in range(max(3, args.repeat // 5))]
+    first = float(np.median([r[0] for r in runs]))
+    rtf = float(np.median([r[1] / r[2] for r in runs]))
+    return {
+        "mouth.generate_stream.rtf": metric(rtf, "x", LOWER),
+        "mouth.generate_stream.first_chunk": metric(first * 1000, "ms", LOWER)
+    }
+
+BENCHES = {
+    "gesture": bench_gesture,
+    "emotion": bench_emotion,
+    "vision": bench_vision,
+    "ears": bench_ears,
+    "mouth": bench_mouth
+}
+
+# ==========================================
+# REGRESSION TRACKING
+# ==========================================
+def tolerance_for(name, default):
+    for prefix, tol in TOLERANCES.items():
+        if name.startswith(prefix): return max(tol, default)
+    return default
+
+def compare(current, baseline, tolerance):
+    """Returns: list of (name, old, new, change) for metrics worse than their tolerance."""
+    regressions = []
+    for name, m in current.items():
+        old = baseline.get(name)
+        if not old or not old["value"]: continue
+        change = (m["value"] - old["value"]) / old["value"]
+        worse = change if m["better"] == LOWER else -change
+        if worse > tolerance_for(name, tolerance):
+            regressions.append((name, old["value"], m["value"], change))
+    return regressions
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage microbenchmarks with regression thresholds")
+    parser.add_argument("--only", help=f"Comma-separated subset of: {', '.join(BENCHES)}")
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--audio", help="WAV utterance fixture for the ears benchmarks")
+    parser.add_argument("--image", help="Image fixture (ideally a person in frame) for the vision benchmark")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--no-history", action="store_true")
+    args = parser.parse_args()
+
+    selected = args.only.split(",") if args.only else list(BENCHES)
+    rng = np.random.default_rng(SEED)
+    metrics, skipped, failed = {}, {}, {}
+    for name in selected:
+        print(f"⏱️ {name}...")
+        try:
+            metrics.update(BENCHES[name](args, rng))
+        except ModuleNotFoundError as e:
+            if not e.name or e.name.split(".")[0] in ("modules", "benchmarks"):
+                failed[name] = str(e)   # Our own code failing to import is a crash, not a missing extra
+                print(f"❌ {name} failed: {e}")
+            else:
+                skipped[name] = str(e)  # Optional dependency not installed here
+                print(f"⚠️ Skipped {name}: {e}")
+        except Exception as e:
+            failed[name] = f"{type(e).__name__}: {e}"
+            print(f"❌ {name} failed: {failed[name]}")
+
+    for name, m in metrics.items():
+        print(f"   {name:<36}{m['value']:>12.2f} {m['unit']}")
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    run = {
+        "timestamp": time.time(),
+        "revision": git_revision(),
+        "host": {"machine": platform.machine(), "processor": platform.processor(), "cpus": os.cpu_count()},
+        "metrics": metrics,
+        "skipped": skipped,
+        "failed": failed
+    }
+    if not args.no_history:
+        with open(HISTORY_PATH, "a") as f:
+            f.write(json.dumps(run) + "\n")
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f).get("metrics", {})
+
+    if failed:
+        print(f"❌ {len(failed)} benchmark(s) crashed: {', '.join(failed)}" + (" (baseline not updated)" if args.update_baseline else ""))
+        return 1
+
+    if args.update_baseline:
+        merged = {**baseline, **metrics}
+        with open(args.baseline, "w") as f:
+            json.dump({**run, "metrics": merged}, f, indent=2)
+        print(f"📌 Baseline updated: {args.baseline}")
+        return 0
+
+    if not baseline:
+        print("⚠️ No baseline yet (run with --update-baseline to record one)")
+        return 0
+
+    regressions = compare(metrics, baseline, args.tolerance)
+    for name, old, new, change in regressions:
+        print(f"❌ REGRESSION {name}: {old} -> {new} ({change:+.1%})")
+    if not regressions:
+        print("✅ No regressions")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
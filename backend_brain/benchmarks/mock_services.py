@@ -0,0 +1,124 @@
+import os
+import json
+import time
+import random
+import asyncio
+import threading
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+DEFAULT_REPLY = "Sure, I can help with that. Give me one second to think it through."
+
+class MockConfig:
+    """Latency profile of the stand-in services (all seconds). Attributes may be changed while running."""
+    def __init__(self, first_token=0.35, token_interval=0.02, jitter=0.0, reply=DEFAULT_REPLY,
+                 storage_latency=0.05, faces_dir=None, fail_rate=0.0):
+        self.first_token = first_token
+        self.token_interval = token_interval
+        self.jitter = jitter
+        self.reply = reply
+        self.storage_latency = storage_latency
+        self.faces_dir = faces_dir   # {faces_dir}/{user_id}/pose_{i}.jpg served as Supabase storage
+        self.fail_rate = fail_rate   # Fraction of chat completions answered with a 503
+
+    def first_token_delay(self):
+        return max(0.0, self.first_token + random.uniform(-self.jitter, self.jitter))
+
+# ==========================================
+# STAND-IN SERVICES
+# ==========================================
+def create_mock_app(config):
+    """
+    One local app standing in for both external services:
+    - Groq chat completions (OpenAI-compatible, optionally streamed as SSE)
+    - Supabase storage object downloads
+    Point the server at it with GROQ_BASE_URL and SUPABASE_URL.
+    """
+    app = FastAPI(title="Avaani Benchmark Mocks")
+    app.state.requests = 0
+
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+        if config.fail_rate and random.random() < config.fail_rate:
+            await asyncio.sleep(config.first_token_delay())
+            return JSONResponse({"error": {"message": "Service unavailable (mock)", "type": "service_unavailable"}}, status_code=503)
+        model = body.get("model", "mock")
+        created = int(time.time())
+        tokens = [w + " " for w in config.reply.split(" ")]
+        tokens[-1] = tokens[-1].rstrip()
+
+        if not body.get("stream"):
+            # Whole reply arrives at once: first token == last token
+            await asyncio.sleep(config.first_token_delay() + config.token_interval * (len(tokens) - 1))
+            return JSONResponse({
+                "id": "chatcmpl-bench", "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": config.reply}, "finish_reason": "stop", "logprobs": None}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens)}
+            })
+
+        async def events():
+            await asyncio.sleep(config.first_token_delay())
+            for i, token in enumerate(tokens):
+                if i: await asyncio.sleep(config.token_interval)
+                chunk = {
+                    "id": "chatcmpl-bench", "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": {"role": "assistant", "content": token}, "finish_reason": None, "logprobs": None}]
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+            final = {
+                "id": "chatcmpl-bench", "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop", "logprobs": None}]
+            }
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/storage/v1/object/{bucket}/{path:path}")
+    async def storage_download(bucket: str, path: str):
+        await asyncio.sleep(config.storage_latency)
+        if config.faces_dir and bucket == "faces":
+            full = os.path.normpath(os.path.join(config.faces_dir, path))
+            if full.startswith(os.path.abspath(config.faces_dir)) and os.path.isfile(full):
+                with open(full, "rb") as f:
+                    return Response(f.read(), media_type="image/jpeg")
+        return JSONResponse({"statusCode": "404", "error": "not_found", "message": "Object not found"}, status_code=404)
+
+    return app
+
+class MockServices:
+    """Runs the mock app on a background thread for the duration of a benchmark."""
+    def __init__(self, config, host="127.0.0.1", port=8766):
+        self.url = f"http://{host}:{port}"
+        self.app = create_mock_app(config)
+        self._server = uvicorn.Server(uvicorn.Config(self.app, host=host, port=port, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    def start(self, timeout=10.0):
+        self._thread.start()
+        deadline = time.time() + timeout
+        while not self._server.started:
+            if time.time() > deadline or not self._thread.is_alive():
+                raise RuntimeError(f"Mock services failed to start on {self.url}")
+            time.sleep(0.05)
+        return self
+
+    def stop(self):
+        self._server.should_exit = True
+        self._thread.join(timeout=5.0)
+
+    def server_env(self):
+        """Environment that routes the real server's Groq and Supabase clients here."""
+        return {
+            "GROQ_BASE_URL": self.url,
+            "GROQ_API_KEY": "gsk_benchmark",
+            "SUPABASE_URL": self.url,
+            # Dummy key in JWT shape (the Supabase client validates the format)
+            "SUPABASE_SERVICE_ROLE_KEY": "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.benchmark"
+        }
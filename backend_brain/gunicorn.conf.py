@@ -0,0 +1,48 @@
+import os
+import sys
+import multiprocessing
+
+# ==========================================
+# AVAANI PRODUCTION SERVING (Pre-Fork)
+# ==========================================
+# Usage (from backend_brain/):  gunicorn -c gunicorn.conf.py server:app
+#
+# preload_app imports server.py once in the master. With AVAANI_PREFORK=1 it verifies the
+# model files (one download/hash instead of one per worker) and reads the Kokoro weights,
+# which all workers' TTS sessions then share copy-on-write (never written, so never copied).
+# Each worker builds its own inference sessions, vision process and Groq client in post_fork;
+# Whisper weights and the vision process are per worker: budget those per worker.
+os.environ.setdefault("AVAANI_PREFORK", "1")
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", max(1, multiprocessing.cpu_count() // 4)))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+
+# WebSocket sessions are long-lived: never recycle a worker mid conversation, and give
+# open sockets time to finish a reply on shutdown. `timeout` is the worker heartbeat only.
+max_requests = 0
+timeout = 120
+graceful_timeout = 30
+keepalive = 75
+
+# Per-worker session cap: MAX_SESSIONS_PER_WORKER env var (default 8), enforced in server.py
+
+def post_fork(server, worker):
+    app_module = sys.modules.get("server")
+    if app_module is not None and app_module.PREFORK:
+        app_module.init_worker()
+
+def worker_exit(server, worker):
+    app_module = sys.modules.get("server")
+    if app_module is None: return
+    # The vision worker process, even if it never became ready; else the in-process one (VISION_MODE=thread)
+    vision = app_module._vision_process or app_module.subsystems.get("vision")
+    if vision is not None:
+        vision.stop()
+
+def child_exit(server, worker):
+    # Multi-process Prometheus: drop the dead worker's live gauges (see modules/metrics.py)
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -1,12 +1,12 @@
 import os
 import io
 import re
+import threading
 import numpy as np
 import cv2
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException, status
 from pydantic import BaseModel
 from typing import List
-from supabase import create_client, Client
 from dotenv import load_dotenv
 
 # 1. Load Environment Variables
@@ -18,11 +18,30 @@ load_dotenv()
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
 
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise ValueError("❌ CRITICAL: Missing Supabase Credentials in .env")
+class LazySupabaseClient:
+    """
+    Admin client created on first use (or by the server's background 'auth' loader)
+    instead of at import, so importing this module stays cheap.
+    """
+    def __init__(self):
+        self._client = None
+        self._lock = threading.Lock()
+
+    def connect(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    if not SUPABASE_URL or not SUPABASE_KEY:
+                        raise ValueError("❌ CRITICAL: Missing Supabase Credentials in .env")
+                    from supabase import create_client
+                    self._client = create_client(SUPABASE_URL, SUPABASE_KEY)
+        return self._client
+
+    def __getattr__(self, name):
+        return getattr(self.connect(), name)
 
-# Initialize Admin Client
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Initialize Admin Client (lazily)
+supabase = LazySupabaseClient()
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
 # Load OpenCV Face Detector (Server-Side Validation)
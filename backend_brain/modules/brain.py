@@ -1,8 +1,8 @@
-import os
 import time
 import re
-from groq import Groq
 from dotenv import load_dotenv
+from modules.metrics import LLM_SECONDS
+from modules.llm_providers import ProviderRouter, load_providers
 
 # 1. Load Environment Variables
 load_dotenv()
@@ -10,8 +10,10 @@ load_dotenv()
 # ==========================================
 # CONFIGURATION
 # ==========================================
-API_KEY = os.getenv("GROQ_API_KEY")
-MODEL_NAME = "llama3-70b-8192" 
+# Providers/models (ordered, with hedging and circuit breaking) are configured in llm_providers
+
+OFFLINE_REPLY = "I am unable to think right now. My brain connection is missing."
+ERROR_REPLY = "I'm having a bit of trouble connecting to the cloud. Can you say that again?"
 
 # ==========================================
 # THE "SOUL" OF AVAANI (System Prompt)
@@ -53,19 +55,17 @@ You must seamlessly integrate visual and auditory data:
 
 class BrainSystem:
     def __init__(self):
-        print("🧠 Initializing Avaani Brain (Groq Llama-3)...")
+        print("🧠 Initializing Avaani Brain (LLM Providers)...")
         
-        # Security Check
-        if not API_KEY:
-            print("❌ CRITICAL ERROR: GROQ_API_KEY not found in .env file!")
+        # Security Check (providers without an API key are skipped)
+        providers = load_providers()
+        if not providers:
+            print("❌ CRITICAL ERROR: No LLM provider available (is GROQ_API_KEY in .env?)")
             self.client = None
         else:
-            try:
-                self.client = Groq(api_key=API_KEY)
-                print(f"✅ Brain Active ({MODEL_NAME}).")
-            except Exception as e:
-                print(f"❌ Connection Error: {e}")
-                self.client = None
+            self.client = ProviderRouter(providers)
+            print(f"✅ Brain Active ({', '.join(p.name for p in providers)}).")
+        self.last_provider = None
 
         # Short Term Memory (Rolling Context)
         self.history = [
@@ -84,8 +84,51 @@ class BrainSystem:
             str: The clean text response for mouth.py.
         """
         if not self.client:
-            return "I am unable to think right now. My brain connection is missing."
+            return OFFLINE_REPLY
+
+        user_message = self._user_message(user_text, vision_context)
+        self._remember(user_message)
+        reply = self._complete(self.history)
+        if reply is None:
+            return ERROR_REPLY
+        self._remember({"role": "assistant", "content": reply})
+        return reply
+
+    def draft(self, user_text, vision_context=None):
+        """
+        Speculative think(): produces the same reply without touching memory.
+        Returns: (user_message, reply). Pass both to commit() if the user really finished speaking.
+        """
+        if not self.client:
+            return None, OFFLINE_REPLY
+        user_message = self._user_message(user_text, vision_context)
+        reply = self._complete(self._window(self.history + [user_message]))
+        return user_message, reply if reply is not None else ERROR_REPLY
+
+    def commit(self, user_message, reply):
+        """Records a drafted exchange as if think() had produced it."""
+        if user_message is None: return
+        self._remember(user_message)
+        if reply != ERROR_REPLY:
+            self._remember({"role": "assistant", "content": reply})
+
+    def note(self, user_text, reply, vision_context=None):
+        """Records a turn answered without the LLM (fast-path intents) so the conversation stays coherent."""
+        self.commit(self._user_message(user_text, vision_context), reply)
+
+    def _remember(self, message):
+        self.history.append(message)
+        if message["role"] == "user":
+            self.history = self._window(self.history)
+
+    @staticmethod
+    def _window(messages):
+        # Memory Management: Keep context window efficient (System + Last 6 turns)
+        if len(messages) > 8:
+            return [messages[0]] + messages[-6:]
+        return messages
 
+    def _user_message(self, user_text, vision_context):
         # --- 1. PARSE VISION CONTEXT ---
         # Defaults
         identity = "Stranger"
@@ -120,42 +163,31 @@ class BrainSystem:
         """
 
         full_user_input = f"{scene_report}\n\n[USER SAID]: \"{user_text}\""
-        
-        # --- 3. UPDATE MEMORY ---
-        self.history.append({"role": "user", "content": full_user_input})
-        
-        # Memory Management: Keep context window efficient (System + Last 6 turns)
-        if len(self.history) > 8:
-            self.history = [self.history[0]] + self.history[-6:]
+        return {"role": "user", "content": full_user_input}
 
+    def _complete(self, messages):
+        """Returns: cleaned reply, or None if the request failed."""
         try:
             # --- 4. INFERENCE (Thinking) ---
             start_time = time.time()
             
-            completion = self.client.chat.completions.create(
-                model=MODEL_NAME,
-                messages=self.history,
+            raw_response, self.last_provider = self.client.complete(
+                messages,
                 temperature=0.65, 
                 max_tokens=200,   
-                top_p=1,
-                stream=False
+                top_p=1
             )
             
-            raw_response = completion.choices[0].message.content.strip()
+            LLM_SECONDS.observe(time.time() - start_time)
+            raw_response = raw_response.strip()
             
             # --- 5. CLEANUP FOR TTS ---
             # Remove *actions*, markdown, and weird symbols
             clean_response = re.sub(r'[\*\_]', '', raw_response).strip()
             clean_response = re.sub(r'[^\w\s,.?!@#$%^&-+=]', '', clean_response).strip()
             
-            # Save to memory
-            self.history.append({"role": "assistant", "content": clean_response})
-            
-            # latency = (time.time() - start_time) * 1000
-            # print(f"   🧠 Thought generated in {latency:.0f}ms")
-            
             return clean_response
 
         except Exception as e:
             print(f"❌ Brain Error: {e}")
-            return "I'm having a bit of trouble connecting to the cloud. Can you say that again?"
\ No newline at end of file
+            return None
\ No newline at end of file
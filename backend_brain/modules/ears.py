@@ -3,77 +3,138 @@ import numpy as np
 import os
 import time
 import string
+from concurrent.futures import ThreadPoolExecutor
 from faster_whisper import WhisperModel
 from scipy import signal
+from modules import model_store
+from modules.metrics import VAD_SECONDS, STT_SECONDS, STT_PATHS, SPECULATIONS, SPECULATION_WASTED_SECONDS
+from modules.tracing import NULL_TRACER
 
 # ==========================================
 # CONFIGURATION
 # ==========================================
-# Anchor paths to this file's location
-CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+# Model files, URLs and checksums live in model_manifest.json (groups "whisper", "whisper_small", "silero_vad")
 MODEL_DIR_NAME = "base.en" 
-MODEL_PATH = os.path.join(CURRENT_DIR, "../../models", MODEL_DIR_NAME)
+MODEL_PATH = model_store.group_dir("whisper")
+SMALL_MODEL_GROUP = "whisper_small"   # tiny.en
 
 DEVICE = "cpu"
 COMPUTE_TYPE = "int8" 
+SAMPLE_RATE = 16000
 
 # VAD / Sensitivity
 VAD_THRESHOLD = 0.5               
 SILENCE_LIMIT = 0.8               # Seconds of silence to consider sentence finished
 MIN_SPEECH_DURATION = 0.4         # Minimum speech duration to trigger STT
 
+# Speculative Mode: transcribe at the start of a pause so the reply can be drafted while
+# SILENCE_LIMIT runs out; resumed speech discards it, a confirmed endpoint commits it.
+SPECULATE = os.getenv("AVAANI_SPECULATE") == "1"
+SPECULATE_AFTER = 0.25            # Seconds of silence before speculating (>= TRIM_PAD, so the trimmed audio is final)
+SPECULATION_THREADS = int(os.getenv("AVAANI_SPECULATION_THREADS", "2"))  # Per worker: pause decodes run here, off the event loop
+
+# STT Decoding Policy
+TRIM_PAD = 0.2                    # Seconds kept around the first/last VAD speech chunk
+SHORT_UTTERANCE = 2.0             # Trimmed length (s) at or below which decoding starts greedy
+BEAM_SIZE = 5
+LOGPROB_FALLBACK = -0.7           # Greedy mean avg_logprob below this -> re-decode with beam search
+USE_SMALL_MODEL = os.getenv("AVAANI_STT_SMALL_MODEL") == "1"  # Short utterances go to tiny.en first
+INITIAL_PROMPT = "Avaani. Hello Avaani, I am speaking to you."
+
 # DATASETS
 BLACKLIST = {
     "thank you", "thanks", "subtitles", "copyright", "audio", "video", 
     "thanks for watching", "watching", "subscribe"
 }
 
+_speculation_pool = ThreadPoolExecutor(max_workers=SPECULATION_THREADS, thread_name_prefix="speculate")
+
 def strip_punctuation(s):
     return s.translate(str.maketrans('', '', string.punctuation))
 
+MAPPED_FILES = ("model.bin",)     # Weights are memory-mapped; tokenizer.json/vocabulary.txt/config.json are passed as bytes
+
+def read_model_files(group="whisper"):
+    """
+    Verifies a CTranslate2 Whisper model and reads its small files into memory.
+    Used before forking server workers. The weights stay a path: each load maps them itself
+    (read through the page cache; CTranslate2 still copies them into the worker's own memory).
+    Returns: {filename: bytes or path of a MAPPED_FILES entry}, for load_stt_model(files=...).
+    """
+    files = {}
+    for path in model_store.ensure_group(group):
+        name = os.path.basename(path)
+        if name in MAPPED_FILES:
+            files[name] = path
+        else:
+            with open(path, "rb") as f:
+                files[name] = f.read()  # tokenizers.Tokenizer.from_buffer only takes bytes
+    return files
+
+def load_stt_model(files=None, group="whisper"):
+    """Builds a Whisper model. `files` (from read_model_files) skips the disk lookup."""
+    model_dir = model_store.group_dir(group)
+    if files:
+        print(f"   - Loading Preloaded Model: {os.path.basename(model_dir)}")
+        # Own dict per load: a map is a file-like object with a read position, so it is never shared
+        files = {name: model_store.open_mapped(v) if name in MAPPED_FILES else v for name, v in files.items()}
+        return WhisperModel(os.path.basename(model_dir), device=DEVICE, compute_type=COMPUTE_TYPE, cpu_threads=4, files=files)
+
+    model_store.ensure_group(group)
+    print(f"   - Loading Local Model: {model_dir}")
+    return WhisperModel(
+        model_size_or_path=model_dir,
+        device=DEVICE, 
+        compute_type=COMPUTE_TYPE, 
+        cpu_threads=4,
+        local_files_only=True
+    )
+
 class EarSystem:
-    def __init__(self):
+    def __init__(self, stt_model=None, small_model=None):
+        """
+        stt_model: shared per-worker WhisperModel. VAD is always per-connection (it is stateful).
+        small_model: optional faster model tried first on short utterances.
+        """
         print(f"👂 Initializing Avaani Ears (Server DSP Mode)...")
         
-        # 1. Load VAD (Silero)
+        # 1. Load VAD (Silero, from the pinned hub checkout in the model store)
         torch.set_num_threads(4) 
         try:
             self.vad_model, utils = torch.hub.load(
-                repo_or_dir='snakers4/silero-vad',
+                repo_or_dir=model_store.ensure("silero-vad"),
                 model='silero_vad',
-                force_reload=False,
-                onnx=True,
-                trust_repo=True
+                source='local',
+                onnx=True
             )
         except Exception as e:
             print(f"❌ VAD Load Error: {e}")
             raise
 
-        # 2. Load Whisper
-        if os.path.exists(MODEL_PATH):
-            print(f"   - Loading Local Model: {MODEL_PATH}")
-            model_source = MODEL_PATH
-        else:
-            print(f"   - Downloading Model: {MODEL_DIR_NAME}")
-            model_source = MODEL_DIR_NAME
-
-        self.stt_model = WhisperModel(
-            model_size_or_path=model_source,
-            device=DEVICE, 
-            compute_type=COMPUTE_TYPE, 
-            cpu_threads=4,
-            local_files_only=os.path.exists(MODEL_PATH)
-        )
+        # 2. Load Whisper (or reuse the worker's shared model)
+        self.stt_model = stt_model if stt_model is not None else load_stt_model()
+        self.small_model = small_model
+        self.force_greedy = False     # Set under load (load_control): never fall back to beam search
         
-        # 3. DSP Pipeline
+        # 3. DSP Pipeline (streamed: each buffered chunk is filtered on arrival, see _buffer_chunk)
         # 80Hz Highpass (rumble), 7500Hz Lowpass (aliasing)
         self.sos = signal.butter(10, [80, 7500], 'bandpass', fs=16000, output='sos')
 
         # 4. State
         self.audio_buffer = []        
+        self.chunk_flags = []         # (samples, is_speech) per chunk in audio_buffer, from the VAD
+        self.filtered_chunks = []     # Bandpassed copy of audio_buffer, chunk by chunk
+        self.filter_state = None      # sosfilt zi carried between chunks of one utterance
+        self.peak = 0.0               # Running max |sample| of the filtered audio
         self.is_speaking = False      
         self.silence_start_time = None
         self.status = "listening" 
+        self.last_turn = None         # {"speech_end", "endpointed", "stt", "stt_path"} of the last finished sentence
+        self.last_stt = None          # Decoding path taken for the last utterance (see _decode)
+        self.speculation = None       # {"id", "text", "stt", "last_stt"} transcript taken at the current pause
+        self._speculating = None      # (id, future, started) pause decode still running on _speculation_pool
+        self._speculation_ids = 0
+        self.tracer = NULL_TRACER     # Session tracer (set by the server)
         print("✅ Ears Active.")
 
     def process_chunk(self, audio_chunk_float32):
@@ -89,10 +150,14 @@ class EarSystem:
         # --- STAGE 2: VAD ---
         audio_tensor = torch.tensor(audio_chunk_float32)
         
-        try:
-            speech_prob = self.vad_model(audio_tensor, 16000).item()
-        except:
-            speech_prob = 0.0
+        started = time.perf_counter()
+        with self.tracer.span("vad", "ears") as span:
+            try:
+                speech_prob = self.vad_model(audio_tensor, 16000).item()
+            except:
+                speech_prob = 0.0
+            span.set(prob=round(speech_prob, 3))
+        VAD_SECONDS.observe(time.perf_counter() - started)
 
         current_time = time.time()
         
@@ -104,7 +169,10 @@ class EarSystem:
                 # print("   --> [Speech Started]")
             
             self.silence_start_time = None
-            self.audio_buffer.extend(audio_chunk_float32)
+            self._buffer_chunk(audio_chunk_float32, True)
+            if self.speculation is not None or self._speculating is not None:
+                # User kept talking: the pause was not the end
+                self._cancel_speculation()
             
         else:
             # SILENCE DETECTED
@@ -116,17 +184,38 @@ class EarSystem:
                 
                 if duration_silent < SILENCE_LIMIT:
                     # Allow short pauses (breathing)
-                    self.audio_buffer.extend(audio_chunk_float32)
+                    self._buffer_chunk(audio_chunk_float32, False)
+                    if self._speculating is not None:
+                        self._collect_speculation(wait=False)
+                    elif SPECULATE and self.speculation is None and duration_silent >= SPECULATE_AFTER:
+                        self._speculate()
                 else:
                     # --- SENTENCE COMPLETED ---
+                    self.tracer.instant("endpoint", "ears", silence=round(duration_silent, 3))
                     self.is_speaking = False
                     self.status = "processing"
                     
-                    # Process the accumulated buffer
-                    transcript = self._process_buffer()
+                    # Process the accumulated buffer (already done if speculating)
+                    if self._speculating is not None:
+                        self._collect_speculation(wait=True)  # Less left to wait for than a fresh decode
+                    speculation = self.speculation
+                    if speculation is not None:
+                        SPECULATIONS.labels("committed").inc()
+                        transcript, self.last_stt = speculation["text"], speculation["last_stt"]
+                    else:
+                        self.last_stt = None
+                        transcript = self._process_buffer()
+                    self.last_turn = {
+                        "speech_end": self.silence_start_time,
+                        "endpointed": current_time,
+                        "stt": time.time() - current_time,
+                        "stt_path": self.last_stt["path"] if self.last_stt else None,
+                        "speculation": speculation["id"] if speculation else None
+                    }
+                    self.speculation = None
                     
                     # Reset State
-                    self.audio_buffer = []
+                    self._reset_buffer()
                     self.silence_start_time = None
                     self.status = "listening"
                     
@@ -135,56 +224,190 @@ class EarSystem:
 
         return None
 
+    def _speculate(self):
+        """
+        Starts transcribing the utterance so far on _speculation_pool (the decode never runs on the
+        event loop). A later chunk collects it into self.speculation, from which the server drafts a reply.
+        """
+        self._speculation_ids += 1
+        self.tracer.instant("speculate", "ears", id=self._speculation_ids)
+        utterance = (np.array(self.audio_buffer, dtype=np.float32), list(self.filtered_chunks), list(self.chunk_flags), self.peak)
+        future = _speculation_pool.submit(self._transcribe_utterance, utterance)
+        self._speculating = (self._speculation_ids, future, time.perf_counter())
+
+    def _collect_speculation(self, wait):
+        """Moves a finished pause decode into self.speculation. wait=True blocks until it finishes (endpoint)."""
+        speculation_id, future, started = self._speculating
+        if not wait and not future.done(): return
+        try:
+            text, last_stt = future.result()
+        except Exception as e:
+            print(f"STT Error: {e}")
+            text, last_stt = None, None
+        self._speculating = None
+        self.speculation = {
+            "id": speculation_id,
+            "text": text,
+            "stt": time.perf_counter() - started,
+            "last_stt": last_stt
+        }
+
+    def _cancel_speculation(self):
+        """Resumed speech: drops the pause transcript. A decode still running is booked as wasted when it ends."""
+        if self._speculating is not None:
+            speculation_id, future, started = self._speculating
+            future.add_done_callback(lambda _: SPECULATION_WASTED_SECONDS.labels("stt").inc(time.perf_counter() - started))
+            self._speculating = None
+        else:
+            speculation_id = self.speculation["id"]
+            SPECULATION_WASTED_SECONDS.labels("stt").inc(self.speculation["stt"])
+        self.tracer.instant("speculation_cancelled", "ears", id=speculation_id)
+        SPECULATIONS.labels("cancelled").inc()
+        self.speculation = None
+
+    def _buffer_chunk(self, audio_chunk_float32, is_speech):
+        """Appends a chunk to the utterance and bandpasses it now, so endpointing finds the DSP already done."""
+        self.audio_buffer.extend(audio_chunk_float32)
+        self.chunk_flags.append((len(audio_chunk_float32), is_speech))
+        try:
+            if self.filter_state is None:
+                self.filter_state = np.zeros((self.sos.shape[0], 2))  # Utterance start: same as filtering the whole buffer
+            filtered, self.filter_state = signal.sosfilt(self.sos, audio_chunk_float32, zi=self.filter_state)
+            self.filtered_chunks.append(filtered.astype(np.float32))
+            self.peak = max(self.peak, float(np.max(np.abs(filtered))))
+        except Exception:
+            pass  # Length mismatch below makes _process_buffer filter the whole buffer instead
+
+    def _reset_buffer(self):
+        self.audio_buffer = []
+        self.chunk_flags = []
+        self.filtered_chunks = []
+        self.filter_state = None
+        self.peak = 0.0
+
     def _process_buffer(self):
         """Filters audio, Boosts Volume, and Transcribes."""
+        text, self.last_stt = self._transcribe_utterance((self.audio_buffer, self.filtered_chunks, self.chunk_flags, self.peak))
+        return text
+
+    def _transcribe_utterance(self, utterance):
+        """
+        utterance: (audio_buffer, filtered_chunks, chunk_flags, peak), the live buffer or a copy of it.
+        Touches no buffer state, so a copy can be transcribed on another thread.
+        Returns: (text or None, last_stt dict or None).
+        """
+        audio_buffer, filtered_chunks, chunk_flags, peak = utterance
+        last_stt = None
         # 1. Duration Check (Ignore glitches < 0.4s)
-        if len(self.audio_buffer) < 6400: # 6400 samples = 0.4s at 16k
-            return None
-            
-        audio_data = np.array(self.audio_buffer, dtype=np.float32)
+        if len(audio_buffer) < 6400: # 6400 samples = 0.4s at 16k
+            return None, last_stt
 
         # --- DSP PIPE ---
         try:
-            # A. Bandpass Filter
-            clean_audio = signal.sosfilt(self.sos, audio_data)
+            # A. Bandpass Filter (normally already streamed in by _buffer_chunk)
+            if sum(len(c) for c in filtered_chunks) == len(audio_buffer):
+                clean_audio = np.concatenate(filtered_chunks)
+                max_val = peak
+            else:
+                clean_audio = signal.sosfilt(self.sos, np.array(audio_buffer, dtype=np.float32)).astype(np.float32)
+                max_val = float(np.max(np.abs(clean_audio)))
+            audio_data = self._trim_silence(clean_audio, chunk_flags)
             
             # B. Normalization / Smart Boost
-            max_val = np.max(np.abs(clean_audio))
+            # Peak is over the untrimmed utterance: at worst slightly under target, never clipping
             if max_val > 0.05: 
                 # Target 90% volume (0.9)
                 gain = 0.9 / max_val 
-                clean_audio = clean_audio * gain
-            
-            audio_data = clean_audio
+                audio_data = audio_data * gain
         except Exception:
-            pass 
+            audio_data = self._trim_silence(np.array(audio_buffer, dtype=np.float32), chunk_flags)
 
         # --- TRANSCRIPTION ---
         try:
-            segments, info = self.stt_model.transcribe(
-                audio_data, 
-                beam_size=5, 
-                language="en",
-                condition_on_previous_text=False,
-                initial_prompt="Avaani. Hello Avaani, I am speaking to you."
-            )
-            
-            text = " ".join([segment.text for segment in segments]).strip()
+            with self.tracer.span("transcribe", "ears", samples=len(audio_data)) as span:
+                started = time.perf_counter()
+                text, path, logprob = self._decode(audio_data)
+                STT_SECONDS.observe(time.perf_counter() - started)
+                STT_PATHS.labels(path).inc()
+                last_stt = {
+                    "path": path,
+                    "seconds": len(audio_data) / SAMPLE_RATE,
+                    "trimmed": (len(audio_buffer) - len(audio_data)) / SAMPLE_RATE,
+                    "logprob": logprob
+                }
+                span.set(chars=len(text), path=path, logprob=round(logprob, 3))
             
             # --- CLEANING & LOGIC ---
-            if not text or len(text) < 2: return None
+            if not text or len(text) < 2: return None, last_stt
             
             # 1. Hallucination Check
             clean_check = strip_punctuation(text.lower())
             if clean_check in BLACKLIST: 
-                return None
+                return None, last_stt
             
-            return text
+            return text, last_stt
                 
         except Exception as e:
             print(f"STT Error: {e}")
             
-        return None
+        return None, last_stt
+
+    def _trim_silence(self, audio_data, chunk_flags):
+        """Cuts leading/trailing non-speech chunks (per the VAD decisions made while buffering), keeping TRIM_PAD."""
+        if len(chunk_flags) == 0 or sum(n for n, _ in chunk_flags) != len(audio_data):
+            return audio_data  # Buffer was filled some other way (benchmarks): nothing to go on
+
+        offsets = np.cumsum([0] + [n for n, _ in chunk_flags])
+        speech = [i for i, (_, is_speech) in enumerate(chunk_flags) if is_speech]
+        if not speech: return audio_data
+
+        pad = int(TRIM_PAD * SAMPLE_RATE)
+        start = max(0, offsets[speech[0]] - pad)
+        end = min(len(audio_data), offsets[speech[-1] + 1] + pad)
+        return audio_data[start:end]
+
+    def _transcribe(self, model, audio_data, beam_size):
+        """Returns: (text, mean avg_logprob weighted by segment duration; -inf with no segments)."""
+        segments, info = model.transcribe(
+            audio_data, 
+            beam_size=beam_size, 
+            language="en",
+            condition_on_previous_text=False,
+            initial_prompt=INITIAL_PROMPT
+        )
+        segments = list(segments)  # Decoding runs here (lazy generator)
+        text = " ".join([segment.text for segment in segments]).strip()
+        if not segments: return text, float("-inf")
+
+        weights = [max(s.end - s.start, 0.01) for s in segments]
+        logprob = sum(s.avg_logprob * w for s, w in zip(segments, weights)) / sum(weights)
+        return text, logprob
+
+    def _decode(self, audio_data):
+        """
+        Decoding policy:
+        - Short utterances: greedy, on the small model when one is loaded
+        - Low confidence greedy result: re-decode with beam search on the main model
+        - Long utterances: beam search directly
+        - force_greedy (overload): greedy regardless of length or confidence
+        Returns: (text, path, logprob). path is e.g. "greedy", "small_greedy+beam", "beam", "forced_greedy".
+        """
+        if self.force_greedy:
+            text, logprob = self._transcribe(self.small_model or self.stt_model, audio_data, 1)
+            return text, "forced_greedy", logprob
+
+        if len(audio_data) > SHORT_UTTERANCE * SAMPLE_RATE:
+            text, logprob = self._transcribe(self.stt_model, audio_data, BEAM_SIZE)
+            return text, "beam", logprob
+
+        model = self.small_model or self.stt_model
+        path = "small_greedy" if self.small_model else "greedy"
+        text, logprob = self._transcribe(model, audio_data, 1)
+        if logprob >= LOGPROB_FALLBACK:
+            return text, path, logprob
+
+        text, logprob = self._transcribe(self.stt_model, audio_data, BEAM_SIZE)
+        return text, path + "+beam", logprob
 
     def get_status(self):
         return self.status
\ No newline at end of file
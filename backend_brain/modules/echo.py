@@ -0,0 +1,144 @@
+import os
+import time
+from math import gcd
+import numpy as np
+from scipy.signal import resample_poly
+from modules.metrics import ECHO_CHUNKS
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+ENABLED = os.getenv("AVAANI_ECHO_SUPPRESSION", "1") == "1"
+SAMPLE_RATE = 16000               # Mic audio, as EarSystem receives it
+HISTORY_SECONDS = 4.0             # Reference (sent TTS) and mic audio kept for alignment
+MAX_DELAY = 1.0                   # Longest send -> echo-in-mic delay searched (network both ways + client buffer + device)
+ESTIMATE_WINDOW = 1.0             # Mic seconds correlated against the reference per delay estimate
+ESTIMATE_INTERVAL = 0.5           # Mic seconds between estimates while there is reference audio
+MIN_CORRELATION = 0.3             # Normalized cross-correlation peak accepted as our own echo
+FILTER_TAPS = 32                  # Echo path model (2 ms): absorbs small alignment error and speaker/room colouring
+GATE_ERLE = 20.0                  # Mic/residual energy above this (13 dB): chunk is essentially echo -> silence.
+                                  # Echo-only chunks cancel by far more; user speech over loud echo stays below ~15 dB
+ECHO_TAIL = 0.3                   # Seconds past the end of the reference that echo (reverb) is still expected
+RESYNC = 0.1                      # Timeline jumps (s) beyond this are gaps, not jitter
+ACTIVE_RMS = 1e-3                 # Reference quieter than this cannot produce audible echo
+
+def _energy(x):
+    return float(np.dot(x, x))
+
+# ==========================================
+# ECHO SUPPRESSOR (one per session)
+# ==========================================
+class EchoSuppressor:
+    """
+    Removes Avaani's own voice from the session's mic audio before VAD.
+    Reference and mic audio are laid on one timeline (sample positions since the session began):
+    reference as the client should play it (back to back, from when it was sent), mic as received.
+    The echo delay between them is found by cross-correlation, then each mic chunk gets the
+    aligned reference subtracted through a short least-squares filter. Chunks that were
+    essentially echo are silenced; with the user talking over Avaani (double talk) the residual passes.
+    """
+    def __init__(self, sample_rate=SAMPLE_RATE, enabled=ENABLED, clock=time.monotonic):
+        self.sr = sample_rate
+        self.enabled = enabled
+        self.clock = clock
+        size = int(HISTORY_SECONDS * sample_rate)
+        self.ref = np.zeros(size, dtype=np.float32)   # Rings indexed by timeline position % size
+        self.mic = np.zeros(size, dtype=np.float32)
+        self.epoch = clock()
+        self.ref_end = None       # Timeline position after the last reference sample
+        self.mic_end = None
+        self.delay = None         # Samples the echo trails the reference by (None until found)
+        self.correlation = 0.0
+        self.gated = 0            # Mic chunks silenced as echo
+        self._since_estimate = 0
+
+    def _position(self):
+        return int((self.clock() - self.epoch) * self.sr)
+
+    def _write(self, ring, start, x, prev_end):
+        """Writes x at timeline position `start`; a gap since prev_end is cleared (old audio)."""
+        if prev_end is not None and start > prev_end:
+            gap = min(start - prev_end, len(ring))
+            ring[np.arange(start - gap, start) % len(ring)] = 0.0
+        x = x[-len(ring):]
+        ring[np.arange(start, start + len(x)) % len(ring)] = x
+
+    def _read(self, ring, start, n):
+        return ring[np.arange(start, start + n) % len(ring)]
+
+    # --- Reference (what Mouth sent) ---
+    def played(self, pcm_bytes, sample_rate):
+        """Int16 PCM as sent to the client."""
+        if not self.enabled: return
+        x = np.frombuffer(pcm_bytes, dtype=np.int16).astype(np.float32) / 32768.0
+        if sample_rate != self.sr:
+            g = gcd(self.sr, sample_rate)
+            x = resample_poly(x, self.sr // g, sample_rate // g).astype(np.float32)
+        start = self._position() if self.ref_end is None else max(self.ref_end, self._position())
+        self._write(self.ref, start, x, self.ref_end)
+        self.ref_end = start + len(x)
+
+    def cancel_reference(self):
+        """The client dropped its unplayed audio (reply cancelled): forget the part not played yet."""
+        if self.ref_end is None: return
+        now = self._position()
+        if self.ref_end > now:
+            self.ref[np.arange(now, self.ref_end) % len(self.ref)] = 0.0
+            self.ref_end = now
+
+    # --- Mic ---
+    def process(self, chunk):
+        """float32 mic chunk -> the chunk with Avaani's echo removed (zeros if it was only echo)."""
+        if not self.enabled or self.ref_end is None: return chunk
+        n = len(chunk)
+        now = self._position()
+        start = self.mic_end
+        if start is None or abs(start + n - now) > RESYNC * self.sr:
+            start = now - n
+        self._write(self.mic, start, chunk, self.mic_end)
+        self.mic_end = start + n
+
+        # Nothing sent recently enough to be heard: free passthrough
+        if start - self.ref_end > (MAX_DELAY + ECHO_TAIL) * self.sr:
+            return chunk
+
+        self._since_estimate += n
+        if self._since_estimate >= ESTIMATE_INTERVAL * self.sr:
+            self._since_estimate = 0
+            self._estimate_delay()
+        if self.delay is None: return chunk
+
+        # Reference centred on the estimated delay, FILTER_TAPS wide
+        ref = self._read(self.ref, start - self.delay - FILTER_TAPS // 2, n + FILTER_TAPS - 1)
+        if _energy(ref) / len(ref) < ACTIVE_RMS ** 2:
+            return chunk
+        taps = np.lib.stride_tricks.sliding_window_view(ref, FILTER_TAPS)
+        weights = np.linalg.lstsq(taps, chunk, rcond=None)[0]
+        residual = (chunk - taps @ weights).astype(np.float32)
+
+        if _energy(chunk) >= GATE_ERLE * _energy(residual):
+            self.gated += 1
+            ECHO_CHUNKS.labels("gated").inc()
+            return np.zeros_like(chunk)
+        ECHO_CHUNKS.labels("cancelled").inc()
+        return residual
+
+    def _estimate_delay(self):
+        """Cross-correlates the last ESTIMATE_WINDOW of mic audio against the reference up to MAX_DELAY earlier."""
+        w, d = int(ESTIMATE_WINDOW * self.sr), int(MAX_DELAY * self.sr)
+        end = self.mic_end
+        mic = self._read(self.mic, end - w, w)
+        ref = self._read(self.ref, end - w - d, w + d)
+        mic_energy = _energy(mic)
+        if mic_energy < 1e-6 or _energy(ref) < 1e-6: return
+
+        size = 1 << int(np.ceil(np.log2(len(ref) + w)))
+        # corr[k] = sum_i mic[i] * ref[i + k]: mic at position p lines up with the reference at p - (d - k)
+        corr = np.fft.irfft(np.fft.rfft(ref, size) * np.conj(np.fft.rfft(mic, size)), size)[:d + 1]
+        cumulative = np.concatenate(([0.0], np.cumsum(ref.astype(np.float64) ** 2)))
+        ref_energy = cumulative[w:w + d + 1] - cumulative[:d + 1]
+        normalized = np.abs(corr) / np.sqrt(ref_energy * mic_energy + 1e-12)
+        k = int(np.argmax(normalized))
+        if normalized[k] >= MIN_CORRELATION:
+            self.delay = d - k
+            self.correlation = float(normalized[k])
@@ -6,9 +6,14 @@ import numpy as np
 import os
 import math
 from collections import deque, Counter
+from types import MappingProxyType
 from ultralytics import YOLO
-from deepface import DeepFace
-from deepface.commons import distance as dst # For manual vector comparison
+from modules import model_store
+from modules import face_models  # Emotion + VGG-Face: ONNX Runtime, or DeepFace as reference
+from modules.inference_queue import InferenceQueue, shared_model
+from modules.frame_pyramid import FramePyramid, LEVEL_LANDMARKS, LEVEL_DETECTOR, LEVEL_FULL
+from modules.vision_context import ContextSnapshot, initial_snapshot, download_face_images
+from modules.metrics import observe_vision
 
 # ==========================================
 # CONFIGURATION
@@ -21,6 +26,14 @@ EMOTION_TEMPERATURE = 0.65
 # 0.40 is standard, lower is stricter
 IDENTITY_THRESHOLD = 0.40 
 
+# Object Tracking (carries YOLO boxes between detector passes)
+YOLO_INTERVAL = 0.15              # Seconds between YOLO passes (tracker fills the gaps)
+TRACK_IOU_MATCH = 0.3             # Min IoU to associate a detection with a predicted track
+TRACK_CENTROID_GATE = 0.5         # Fallback: max centroid jump as a fraction of box diagonal
+TRACK_MAX_MISSES = 3              # Detector passes a track may go unmatched before removal
+TRACK_MAX_PREDICT = 0.5           # Seconds of constant-velocity extrapolation before boxes freeze
+TRACK_VELOCITY_SMOOTHING = 0.5    # Weight of previous velocity when blending a new measurement
+
 ALLOWED_CLASSES_FOR_HOLDING = {
     'backpack', 'handbag', 'suitcase', 'tie', 'cell phone', 'laptop', 'mouse', 
     'remote', 'keyboard', 'book', 'bottle', 'cup', 'fork', 'knife', 'spoon', 
@@ -34,6 +47,27 @@ HOME_CONTEXT_CLASSES = ALLOWED_CLASSES_FOR_HOLDING.union({
     'toilet', 'tv', 'microwave', 'oven', 'toaster', 'sink', 'refrigerator'
 })
 
+# Hand landmark indices (pip, mcp, dip, tip) for index, middle, ring, pinky
+FINGER_JOINTS = np.array([
+    [5, 6, 7, 8],
+    [9, 10, 11, 12],
+    [13, 14, 15, 16],
+    [17, 18, 19, 20]
+])
+HAND_BOX_PAD = 30
+
+def load_detector():
+    """YOLO behind a batching queue: detector passes from every session in the process share forward passes."""
+    yolo = YOLO(model_store.ensure("yolov8m"))
+    return yolo, InferenceQueue("yolo", lambda frames: list(yolo(frames, verbose=False, conf=0.5)))
+
+def landmarks_to_array(landmark_list):
+    """
+    Converts a MediaPipe NormalizedLandmarkList into a contiguous (N, 3) float32 array.
+    Done once per frame so every engine reads the same buffer instead of protobuf objects.
+    """
+    return np.array([(l.x, l.y, l.z) for l in landmark_list.landmark], dtype=np.float32)
+
 # ==========================================
 # GESTURE ENGINE
 # ==========================================
@@ -42,98 +76,282 @@ class GestureEngine:
         self.history = deque(maxlen=5)
 
     def analyze(self, hand_landmarks, img_shape):
-        if not hand_landmarks: return []
+        """Single hand variant of analyze_hands. hand_landmarks: (21, 3) array."""
+        if hand_landmarks is None or len(hand_landmarks) == 0: return []
+        return self.analyze_hands(hand_landmarks[np.newaxis], img_shape)[0]
+
+    def analyze_hands(self, hands, img_shape):
+        """
+        Classifies every detected hand in one vectorized pass.
+        hands: (num_hands, 21, 3) float32 array of normalized landmarks.
+        Returns: One smoothed gesture list per hand, in input order.
+        """
+        if hands is None or len(hands) == 0: return []
         h, w, _ = img_shape
-        lm = hand_landmarks.landmark
         
-        thumb = self._get_thumb_curl(lm, w, h)
-        index = self._get_finger_curl(lm, 5, 6, 7, 8)
-        middle = self._get_finger_curl(lm, 9, 10, 11, 12)
-        ring = self._get_finger_curl(lm, 13, 14, 15, 16)
-        pinky = self._get_finger_curl(lm, 17, 18, 19, 20)
+        finger_curls = self._get_finger_curls(hands)
+        thumb_curls = self._get_thumb_curls(hands, w, h)
+
+        results = []
+        for k in range(len(hands)):
+            thumb = thumb_curls[k]
+            index, middle, ring, pinky = finger_curls[k]
+
+            gestures = []
+            if index < 0.4 and middle < 0.4 and ring < 0.4 and pinky < 0.4 and thumb < 0.4:
+                gestures.append("open_palm")
+            elif index > 0.8 and middle > 0.8 and ring > 0.8 and pinky > 0.8:
+                gestures.append("fist")
+            elif index < 0.4 and middle < 0.4 and ring > 0.8 and pinky > 0.8:
+                gestures.append("peace")
+            elif index < 0.4 and middle > 0.8 and ring > 0.8 and pinky > 0.8:
+                gestures.append("pointing")
+            elif thumb < 0.4 and index > 0.8 and middle > 0.8 and ring > 0.8 and pinky > 0.8:
+                if hands[k, 4, 1] < hands[k, 5, 1]: gestures.append("thumbs_up")
+                else: gestures.append("fist")
+            else:
+                gestures.append("active_hand")
+
+            self.history.append(gestures)
+            flat = [g for sub in self.history for g in sub]
+            results.append([Counter(flat).most_common(1)[0][0]] if flat else ["active_hand"])
+        return results
+
+    def _get_finger_curls(self, hands):
+        """Returns (num_hands, 4) curls for index, middle, ring, pinky (0 = straight, 1 = curled)."""
+        v1 = hands[:, FINGER_JOINTS[:, 1]] - hands[:, FINGER_JOINTS[:, 0]]
+        v2 = hands[:, FINGER_JOINTS[:, 3]] - hands[:, FINGER_JOINTS[:, 2]]
+        n1 = np.linalg.norm(v1, axis=-1)
+        n2 = np.linalg.norm(v2, axis=-1)
+        valid = (n1 > 0) & (n2 > 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cos_angle = np.einsum('kfi,kfi->kf', v1, v2) / (n1 * n2)
+        cos_angle = np.clip(np.where(valid, cos_angle, 1.0), -1.0, 1.0)
+        return np.where(valid, (np.pi - np.arccos(cos_angle)) / np.pi, 1.0)
+
+    def _get_thumb_curls(self, hands, w, h):
+        scale = np.array([w, h], dtype=np.float32)
+        dist = np.linalg.norm((hands[:, 4, :2] - hands[:, 17, :2]) * scale, axis=-1)
+        palm_width = np.linalg.norm((hands[:, 5, :2] - hands[:, 17, :2]) * scale, axis=-1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return 1.0 - np.minimum(dist / (palm_width * 1.5), 1.0)
 
-        gestures = []
-        if index < 0.4 and middle < 0.4 and ring < 0.4 and pinky < 0.4 and thumb < 0.4:
-            gestures.append("open_palm")
-        elif index > 0.8 and middle > 0.8 and ring > 0.8 and pinky > 0.8:
-            gestures.append("fist")
-        elif index < 0.4 and middle < 0.4 and ring > 0.8 and pinky > 0.8:
-            gestures.append("peace")
-        elif index < 0.4 and middle > 0.8 and ring > 0.8 and pinky > 0.8:
-            gestures.append("pointing")
-        elif thumb < 0.4 and index > 0.8 and middle > 0.8 and ring > 0.8 and pinky > 0.8:
-            if lm[4].y < lm[5].y: gestures.append("thumbs_up")
-            else: gestures.append("fist")
-        else:
-            gestures.append("active_hand")
+# ==========================================
+# HOLDING GEOMETRY
+# ==========================================
+def hand_boxes(hands, w, h, pad=HAND_BOX_PAD):
+    """(num_hands, 21, 3) landmarks -> (num_hands, 4) padded pixel boxes [x1, y1, x2, y2]."""
+    pts = hands[:, :, :2] * np.array([w, h], dtype=np.float32)
+    return np.concatenate([pts.min(axis=1) - pad, pts.max(axis=1) + pad], axis=1)
+
+def hand_collisions(hand_bboxes, obj_bboxes):
+    """
+    For each object box, True if it covers more than IOU_THRESHOLD of any hand box.
+    hand_bboxes: (K, 4), obj_bboxes: (M, 4). Returns: (M,) bool array.
+    """
+    if len(hand_bboxes) == 0 or len(obj_bboxes) == 0:
+        return np.zeros(len(obj_bboxes), dtype=bool)
+    hb = hand_bboxes[np.newaxis, :, :]
+    ob = obj_bboxes[:, np.newaxis, :]
+    iw = np.clip(np.minimum(hb[..., 2], ob[..., 2]) - np.maximum(hb[..., 0], ob[..., 0]), 0, None)
+    ih = np.clip(np.minimum(hb[..., 3], ob[..., 3]) - np.maximum(hb[..., 1], ob[..., 1]), 0, None)
+    hand_area = (hb[..., 2] - hb[..., 0]) * (hb[..., 3] - hb[..., 1])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(hand_area > 0, (iw * ih) / hand_area, 0.0)
+    return (ratio > IOU_THRESHOLD).any(axis=1)
+
+def box_iou(a, b):
+    """Pairwise IoU. a: (N, 4), b: (M, 4) [x1, y1, x2, y2]. Returns: (N, M)."""
+    iw = np.clip(np.minimum(a[:, None, 2], b[None, :, 2]) - np.maximum(a[:, None, 0], b[None, :, 0]), 0, None)
+    ih = np.clip(np.minimum(a[:, None, 3], b[None, :, 3]) - np.maximum(a[:, None, 1], b[None, :, 1]), 0, None)
+    inter = iw * ih
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(union > 0, inter / union, 0.0)
 
-        self.history.append(gestures)
-        flat = [g for sub in self.history for g in sub]
-        if flat: return [Counter(flat).most_common(1)[0][0]]
-        return ["active_hand"]
+# ==========================================
+# OBJECT TRACKER
+# ==========================================
+class ObjectTracker:
+    """
+    IoU / centroid multi-object tracker with constant-velocity prediction.
+    YOLO worker calls update() after each detector pass; process_frame calls predict()
+    every frame so holding checks see boxes that keep moving between YOLO runs.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tracks = {}   # track_id -> {name, box, velocity, t, misses}
+        self._next_id = 1
 
-    def _get_finger_curl(self, lm, pip, mcp, dip, tip):
-        v1 = np.array([lm[mcp].x - lm[pip].x, lm[mcp].y - lm[pip].y, lm[mcp].z - lm[pip].z])
-        v2 = np.array([lm[tip].x - lm[dip].x, lm[tip].y - lm[dip].y, lm[tip].z - lm[dip].z])
-        if np.linalg.norm(v1) == 0 or np.linalg.norm(v2) == 0: return 1.0
-        cos_angle = np.clip(np.dot(v1/np.linalg.norm(v1), v2/np.linalg.norm(v2)), -1.0, 1.0)
-        return (np.pi - np.arccos(cos_angle)) / np.pi 
+    def update(self, detections, timestamp):
+        """detections: list of (name, x1, y1, x2, y2) from one detector pass at `timestamp`."""
+        with self.lock:
+            ids = list(self.tracks)
+            track_boxes = np.array([self._predict_box(self.tracks[i], timestamp) for i in ids], dtype=np.float64).reshape(-1, 4)
+            det_boxes = np.array([d[1:] for d in detections], dtype=np.float64).reshape(-1, 4)
+            same_class = np.array(
+                [[self.tracks[i]['name'] == d[0] for d in detections] for i in ids], dtype=bool
+            ).reshape(len(ids), len(detections))
+
+            matched_tracks, matched_dets = set(), set()
+            for ti, di in self._match(track_boxes, det_boxes, same_class):
+                track = self.tracks[ids[ti]]
+                dt = timestamp - track['t']
+                if dt > 0:
+                    measured = (det_boxes[di] - track['box']) / dt
+                    track['velocity'] = (TRACK_VELOCITY_SMOOTHING * track['velocity'] +
+                                         (1.0 - TRACK_VELOCITY_SMOOTHING) * measured)
+                track['box'] = det_boxes[di]
+                track['t'] = timestamp
+                track['misses'] = 0
+                matched_tracks.add(ti)
+                matched_dets.add(di)
+
+            for ti, track_id in enumerate(ids):
+                if ti in matched_tracks: continue
+                self.tracks[track_id]['misses'] += 1
+                if self.tracks[track_id]['misses'] > TRACK_MAX_MISSES:
+                    del self.tracks[track_id]
+
+            for di, det in enumerate(detections):
+                if di in matched_dets: continue
+                self.tracks[self._next_id] = {
+                    'name': det[0], 'box': det_boxes[di], 'velocity': np.zeros(4),
+                    't': timestamp, 'misses': 0
+                }
+                self._next_id += 1
+
+    def predict(self, timestamp):
+        """Returns: list of (track_id, name, x1, y1, x2, y2) extrapolated to `timestamp`."""
+        with self.lock:
+            out = []
+            for track_id, track in self.tracks.items():
+                x1, y1, x2, y2 = self._predict_box(track, timestamp)
+                out.append((track_id, track['name'], float(x1), float(y1), float(x2), float(y2)))
+            return out
 
-    def _get_thumb_curl(self, lm, w, h):
-        dist = np.hypot((lm[4].x - lm[17].x)*w, (lm[4].y - lm[17].y)*h)
-        palm_width = np.hypot((lm[5].x - lm[17].x)*w, (lm[5].y - lm[17].y)*h)
-        return 1.0 - min(dist / (palm_width * 1.5), 1.0)
+    def clear(self):
+        with self.lock:
+            self.tracks.clear()
+
+    def _predict_box(self, track, timestamp):
+        dt = min(max(timestamp - track['t'], 0.0), TRACK_MAX_PREDICT)
+        return track['box'] + track['velocity'] * dt
+
+    @staticmethod
+    def _match(track_boxes, det_boxes, same_class):
+        """Greedy association: best IoU first, then nearest centroid for the leftovers."""
+        pairs = []
+        if len(track_boxes) == 0 or len(det_boxes) == 0: return pairs
+        used_t, used_d = set(), set()
+
+        iou = np.where(same_class, box_iou(track_boxes, det_boxes), 0.0)
+        for flat in np.argsort(-iou, axis=None):
+            ti, di = divmod(int(flat), iou.shape[1])
+            if iou[ti, di] < TRACK_IOU_MATCH: break
+            if ti in used_t or di in used_d: continue
+            pairs.append((ti, di)); used_t.add(ti); used_d.add(di)
+
+        t_centers = (track_boxes[:, :2] + track_boxes[:, 2:]) / 2
+        d_centers = (det_boxes[:, :2] + det_boxes[:, 2:]) / 2
+        dist = np.linalg.norm(t_centers[:, None, :] - d_centers[None, :, :], axis=-1)
+        diag = np.linalg.norm(track_boxes[:, 2:] - track_boxes[:, :2], axis=-1)
+        dist = np.where(same_class & (dist <= diag[:, None] * TRACK_CENTROID_GATE), dist, np.inf)
+        for flat in np.argsort(dist, axis=None):
+            ti, di = divmod(int(flat), dist.shape[1])
+            if not np.isfinite(dist[ti, di]): break
+            if ti in used_t or di in used_d: continue
+            pairs.append((ti, di)); used_t.add(ti); used_d.add(di)
+        return pairs
 
 # ==========================================
 # EMOTION ENGINE
 # ==========================================
+# Fixed emotion schema. Column order matches the 'probabilities' dict order.
+RAW_EMOTIONS = ('angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral')
+CORE_EMOTIONS = ('angry', 'disgust', 'happy', 'sad', 'surprise', 'neutral')
+DERIVED_STATES = ('calm', 'excited', 'tired')
+EMOTION_CLASSES = CORE_EMOTIONS + DERIVED_STATES
+EMOTION_HISTORY = 8
+EMOTION_DECAY = 0.5
+
+_CORE = {k: i for i, k in enumerate(CORE_EMOTIONS)}
+_MAX_ENTROPY = math.log(len(EMOTION_CLASSES))
+
+# (7 raw -> 6 core) projection: identity for kept classes, fear split into neutral/surprise/sad
+_FEAR_MIX = np.zeros((len(RAW_EMOTIONS), len(CORE_EMOTIONS)))
+for _i, _k in enumerate(RAW_EMOTIONS):
+    if _k in _CORE: _FEAR_MIX[_i, _CORE[_k]] = 1.0
+_FEAR_MIX[RAW_EMOTIONS.index('fear'), [_CORE['neutral'], _CORE['surprise'], _CORE['sad']]] = [0.5, 0.3, 0.2]
+
+# _DECAY_WEIGHTS[n] = normalized weights for n history frames (oldest -> newest), zero padded
+_DECAY_WEIGHTS = np.zeros((EMOTION_HISTORY + 1, EMOTION_HISTORY))
+for _n in range(1, EMOTION_HISTORY + 1):
+    _w = np.exp(np.arange(_n) * EMOTION_DECAY)
+    _DECAY_WEIGHTS[_n, :_n] = _w / _w.sum()
+
 class EmotionEngine:
     def __init__(self):
-        self.emotion_history = deque(maxlen=8)
+        # Ring buffer of merged (core + state) distributions, one row per processed frame
+        self.emotion_history = np.zeros((EMOTION_HISTORY, len(EMOTION_CLASSES)))
+        self._history_head = 0
+        self._history_count = 0
         self.movement_history = deque(maxlen=5) 
         
     def process(self, deepface_result, gaze_score, posture_data, attention_score, face_landmarks):
-        raw_probs = self._extract_raw_probs(deepface_result)
-        
-        fear = raw_probs.pop('fear', 0.0)
-        raw_probs['neutral'] += fear * 0.5
-        raw_probs['surprise'] += fear * 0.3
-        raw_probs['sad'] += fear * 0.2
+        frame = (deepface_result, gaze_score, posture_data, attention_score, face_landmarks)
+        return EmotionEngine.process_batch([self], [frame])[0]
+
+    @staticmethod
+    def process_batch(engines, frames):
+        """
+        Runs one frame for each of many sessions in a single vectorized pass.
+        engines: list of EmotionEngine (one per session, holds that session's history).
+        frames: list of (deepface_result, gaze_score, posture_data, attention_score, face_landmarks).
+        Returns: list of result dicts, same shape as process().
+        """
+        if not engines: return []
+        raw = np.stack([EmotionEngine._extract_raw_probs(f[0]) for f in frames])
+        core = raw @ _FEAR_MIX
+        core /= core.sum(axis=1, keepdims=True)
         
-        total = sum(raw_probs.values())
-        core_probs = {k: v/total for k, v in raw_probs.items()}
+        energy = np.array([eng._calculate_energy(f[4], f[2]) for eng, f in zip(engines, frames)])
+        slouch = np.array([f[2].get('inclination', 0) for f in frames], dtype=np.float64)
+        states = EmotionEngine._derive_states(core, energy, slouch)
+        unified = EmotionEngine._merge_emotions_and_states(core, states)
         
-        energy = self._calculate_energy(face_landmarks, posture_data)
-        state_probs = self._derive_states(core_probs, gaze_score, posture_data, attention_score, energy)
-        unified = self._merge_emotions_and_states(core_probs, state_probs)
+        for eng, row in zip(engines, unified): eng._push_history(row)
+        final_probs = np.einsum('bh,bhc->bc',
+                                np.stack([eng._slot_weights() for eng in engines]),
+                                np.stack([eng.emotion_history for eng in engines]))
         
-        self.emotion_history.append(unified)
-        final_probs = self._temporal_smooth()
-        dominant = max(final_probs, key=final_probs.get)
+        entropy = -np.sum(final_probs * np.log(final_probs + 1e-9), axis=1)
+        intensity = 1.0 - (entropy / _MAX_ENTROPY)
         
-        entropy = -sum(p * math.log(p + 1e-9) for p in final_probs.values())
-        max_entropy = math.log(len(final_probs))
-        intensity = 1.0 - (entropy / max_entropy)
-
-        sorted_probs = sorted(final_probs.values(), reverse=True)
-        confidence = sorted_probs[0] - (sorted_probs[1] if len(sorted_probs) > 1 else 0)
-
-        return {
-            'dominant': dominant,
-            'intensity': float(round(intensity, 2)),
-            'confidence': float(round(confidence, 2)),
-            'energy': float(round(energy, 2)),
-            'probabilities': {k: float(round(v, 3)) for k, v in final_probs.items()}
-        }
-
-    def _extract_raw_probs(self, result):
-        if not result: return {e: 0.16 for e in ['angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral']}
-        raw = result[0]['emotion']
-        total = sum(raw.values())
-        return {k.lower(): v/total for k, v in raw.items()}
+        top2 = np.sort(final_probs, axis=1)[:, -2:]
+        confidence = top2[:, 1] - top2[:, 0]
+        dominant = np.argmax(final_probs, axis=1)
+
+        return [{
+            'dominant': EMOTION_CLASSES[dominant[b]],
+            'intensity': float(round(float(intensity[b]), 2)),
+            'confidence': float(round(float(confidence[b]), 2)),
+            'energy': float(round(float(energy[b]), 2)),
+            'probabilities': {k: float(round(float(v), 3)) for k, v in zip(EMOTION_CLASSES, final_probs[b])}
+        } for b in range(len(engines))]
+
+    @staticmethod
+    def _extract_raw_probs(result):
+        if not result: return np.full(len(RAW_EMOTIONS), 0.16)
+        raw = {k.lower(): v for k, v in result[0]['emotion'].items()}
+        probs = np.array([raw.get(e, 0.0) for e in RAW_EMOTIONS], dtype=np.float64)
+        return probs / probs.sum()
 
     def _calculate_energy(self, landmarks, posture_data):
-        curr_nose = np.array([landmarks[1].x, landmarks[1].y])
+        """landmarks: (N, 3) face mesh array from landmarks_to_array."""
+        curr_nose = landmarks[1, :2].astype(np.float64)
         if len(self.movement_history) > 0:
             dist = np.linalg.norm(curr_nose - self.movement_history[-1])
             kinetic = np.clip(dist * 20, 0, 1) 
@@ -142,40 +360,39 @@ class EmotionEngine:
         self.movement_history.append(curr_nose)
         postural = posture_data.get('energy', 0.5)
         
-        left_eye_h = abs(landmarks[159].y - landmarks[145].y) * 100
-        right_eye_h = abs(landmarks[386].y - landmarks[374].y) * 100
-        facial = np.clip((left_eye_h + right_eye_h) / 2.0, 0.0, 1.0)
+        eye_h = np.abs(landmarks[[159, 386], 1] - landmarks[[145, 374], 1]) * 100
+        facial = np.clip(float(eye_h.mean()), 0.0, 1.0)
         
         return (kinetic * 0.4) + (postural * 0.3) + (facial * 0.3)
 
-    def _derive_states(self, core, gaze, posture, attention, energy):
-        states = {}
-        states['calm'] = (core['neutral'] + core['happy']) * 0.5 * (1.0 - energy)
-        states['excited'] = (core['happy'] + core['surprise']) * 0.5 * energy
-        slouch = posture.get('inclination', 0)
-        states['tired'] = (core['sad'] + core['neutral']) * 0.5 * (1.0 - energy) * (1.0 + slouch)
-        total = sum(states.values())
-        if total == 0: return {k: 0.33 for k in states}
-        return {k: v/total for k, v in states.items()}
-
-    def _merge_emotions_and_states(self, core, state):
-        unified = {}
-        for k, v in core.items(): unified[k] = v * 0.7
-        for k, v in state.items(): unified[k] = v * 0.3
-        logits = {k: math.log(max(v, 1e-9)) / EMOTION_TEMPERATURE for k, v in unified.items()}
-        exp_sum = sum(math.exp(l) for l in logits.values())
-        return {k: math.exp(v)/exp_sum for k, v in logits.items()}
-
-    def _temporal_smooth(self):
-        if not self.emotion_history: return {}
-        smoothed = {k: 0.0 for k in self.emotion_history[0]}
-        weights = [math.exp(i * 0.5) for i in range(len(self.emotion_history))]
-        total_w = sum(weights)
-        for i, frame_probs in enumerate(self.emotion_history):
-            w = weights[i] / total_w
-            for k, v in frame_probs.items():
-                smoothed[k] += v * w
-        return smoothed
+    @staticmethod
+    def _derive_states(core, energy, slouch):
+        """core: (B, 6), energy/slouch: (B,). Returns (B, 3) calm/excited/tired."""
+        neutral, happy = core[:, _CORE['neutral']], core[:, _CORE['happy']]
+        sad, surprise = core[:, _CORE['sad']], core[:, _CORE['surprise']]
+        states = np.stack([
+            (neutral + happy) * 0.5 * (1.0 - energy),
+            (happy + surprise) * 0.5 * energy,
+            (sad + neutral) * 0.5 * (1.0 - energy) * (1.0 + slouch)
+        ], axis=1)
+        total = states.sum(axis=1, keepdims=True)
+        return np.where(total == 0, 0.33, states / np.where(total == 0, 1.0, total))
+
+    @staticmethod
+    def _merge_emotions_and_states(core, state):
+        unified = np.concatenate([core * 0.7, state * 0.3], axis=1)
+        exp_logits = np.exp(np.log(np.maximum(unified, 1e-9)) / EMOTION_TEMPERATURE)
+        return exp_logits / exp_logits.sum(axis=1, keepdims=True)
+
+    def _push_history(self, row):
+        self.emotion_history[self._history_head] = row
+        self._history_head = (self._history_head + 1) % EMOTION_HISTORY
+        self._history_count = min(self._history_count + 1, EMOTION_HISTORY)
+
+    def _slot_weights(self):
+        """Decay weights laid out on ring slots (oldest frame gets the smallest weight)."""
+        oldest = (self._history_head - self._history_count) % EMOTION_HISTORY
+        return np.roll(_DECAY_WEIGHTS[self._history_count], oldest)
 
 # ==========================================
 # VISION SYSTEM (CORE)
@@ -189,21 +406,22 @@ class VisionSystem:
         self.mp_hands = mp.solutions.hands.Hands(max_num_hands=2, min_detection_confidence=0.5)
         self.mp_pose = mp.solutions.pose.Pose(min_detection_confidence=0.5)
         
-        # 2. Load YOLO
-        try:
-            self.yolo = YOLO("models/yolov8m.pt") 
-        except:
-            print("⚠️ Local YOLO model not found, downloading...")
-            self.yolo = YOLO("yolov8m.pt")
+        # 2. Load YOLO and the face models (emotion, VGG-Face identity), once per process
+        self.yolo, self.detector = shared_model("yolo", load_detector)
+        self.faces = shared_model("faces", face_models.load_backend)
         
         # 3. Engines
         self.gesture_engine = GestureEngine()
         self.emotion_engine = EmotionEngine()
+        self.tracker = ObjectTracker()
         
         # 4. State
         self.lock = threading.Lock()
         self.running = True
-        self.latest_frame = None
+        self.latest_frame = None      # FramePyramid (levels are read-only, shared with workers)
+        self.latest_frame_time = 0.0
+        self.frames_processed = 0
+        self.detector_enabled = True  # YOLO passes (switched off under load, see load_control)
         self.collision_counters = {}
         self.latched_objects = set()
         self._current_landmarks = None
@@ -213,24 +431,9 @@ class VisionSystem:
         self.active_username = "Stranger"
         self.known_embeddings = [] # List of vectors
         
-        # 6. Context Packet
-        self.context = {
-            "identity": "Stranger",
-            "emotion": "neutral",
-            "emotion_intensity": 0.0,
-            "state_confidence": 0.0,
-            "energy_level": 0.5,
-            "attention": 0.0,
-            "engagement": 0.0,
-            "gaze": {"score": 0.0, "vector": "averted"},
-            "tracking": {"x": 0.5, "y": 0.5, "z": 0.5, "visible": False},
-            "posture": {"inclination": 0.0, "facing_camera": False, "energy": 0.5},
-            "gestures": [],
-            "holding": [],
-            "surroundings": [],
-            "timestamp": time.time(),
-            "system_status": "active"
-        }
+        # 6. Context Packet (copy-on-write, see _publish)
+        self._publish_lock = threading.Lock()
+        self._snapshot = initial_snapshot()
 
         # 7. Start Background Workers
         self.yolo_thread = threading.Thread(target=self._yolo_worker, daemon=True)
@@ -249,33 +452,16 @@ class VisionSystem:
         No files are saved to the server disk.
         """
         print(f"📡 Downloading Biometrics for: {username}...")
-        embeddings = []
-        
-        for i in range(5):
-            try:
-                # 1. Download bytes from Supabase
-                data = supabase_client.storage.from_("faces").download(f"{user_id}/pose_{i}.jpg")
-                
-                # 2. Convert to OpenCV Image
-                nparr = np.frombuffer(data, np.uint8)
-                img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-                
-                if img is None: continue
-
-                # 3. Generate Embedding (VGG-Face)
-                # enforce_detection=False handles side profiles where face might be partial
-                embedding_obj = DeepFace.represent(
-                    img_path=img, 
-                    model_name="VGG-Face", 
-                    enforce_detection=False
-                )
-                
-                if embedding_obj:
-                    embeddings.append(embedding_obj[0]["embedding"])
-                    
-            except Exception as e:
-                # print(f"⚠️ Failed to process pose_{i}: {e}")
-                continue
+        self.load_user_images(download_face_images(supabase_client, user_id), username)
+
+    def load_user_images(self, images, username):
+        """Generates VGG-Face embeddings from reference JPEG bytes and makes them the active user."""
+        imgs = [cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR) for data in images]
+        imgs = [img for img in imgs if img is not None]
+
+        # VGG-Face embeddings for every pose, submitted together (a failed pose is skipped, not the rest)
+        # (enforce_detection=False handles side profiles where face might be partial)
+        embeddings = [obj[0]["embedding"] for obj in self.faces.represent_many(imgs) if obj]
         
         # Update State
         with self.lock:
@@ -284,70 +470,98 @@ class VisionSystem:
             
         print(f"✅ Loaded {len(embeddings)} face vectors for {username} into RAM.")
 
+    @property
+    def context(self):
+        """Read-only view of the latest published context."""
+        return self._snapshot.data
+
+    def snapshot(self):
+        """
+        Lock-free O(1) read of the latest (version, data) pair.
+        Readers can compare `version` against the last one they saw to skip unchanged work.
+        """
+        return self._snapshot
+
+    def _publish(self, **fields):
+        """
+        Copy-on-write update. Builds a new snapshot and swaps the single reference.
+        The publish lock only serializes producers; readers never block.
+        """
+        with self._publish_lock:
+            current = self._snapshot
+            if all(k in current.data and current.data[k] == v for k, v in fields.items()):
+                return current.version
+            data = dict(current.data)
+            data.update(fields)
+            data["timestamp"] = time.time()
+            self._snapshot = ContextSnapshot(current.version + 1, MappingProxyType(data))
+            return current.version + 1
+
     def process_frame(self, frame):
-        """Main entry point for Server.py"""
+        """
+        Main entry point for Server.py.
+        frame: FramePyramid (preferred) or a BGR ndarray. Landmark models run on the
+        low-res RGB level; coordinates stay in native-resolution pixels.
+        """
+        if not isinstance(frame, FramePyramid):
+            frame = FramePyramid.from_bgr(frame)
         h, w, _ = frame.shape
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        rgb = frame.get(LEVEL_LANDMARKS)
+        prev = self._snapshot.data
+        updates = {}
         
         # --- 1. FACE & GAZE ---
+        started = time.perf_counter()
         face_res = self.mp_face.process(rgb)
+        observe_vision("face_mesh", time.perf_counter() - started)
         if face_res.multi_face_landmarks:
-            lm = face_res.multi_face_landmarks[0].landmark
-            nose = lm[1]
-            eye_dist = np.sqrt((lm[33].x - lm[263].x)**2 + (lm[33].y - lm[263].y)**2)
+            lm = landmarks_to_array(face_res.multi_face_landmarks[0])
+            nose_x, nose_y = float(lm[1, 0]), float(lm[1, 1])
+            eye_dist = float(np.linalg.norm(lm[33, :2] - lm[263, :2]))
             z_raw = np.clip(1.0 - (eye_dist * 4.5), 0.0, 1.0)
-            gaze_score = np.clip(1.0 - (abs(nose.x - 0.5) * 2.5), 0.0, 1.0)
+            gaze_score = np.clip(1.0 - (abs(nose_x - 0.5) * 2.5), 0.0, 1.0)
             
-            self.context["tracking"] = {"x": round(nose.x, 3), "y": round(nose.y, 3), "z": round(z_raw, 3), "visible": True}
-            self.context["gaze"] = {"score": round(gaze_score, 2), "vector": "direct" if gaze_score > 0.6 else "averted"}
+            updates["tracking"] = {"x": round(nose_x, 3), "y": round(nose_y, 3), "z": round(z_raw, 3), "visible": True}
+            updates["gaze"] = {"score": round(gaze_score, 2), "vector": "direct" if gaze_score > 0.6 else "averted"}
             self._current_landmarks = lm
         else:
-            self.context["tracking"]["visible"] = False
+            updates["tracking"] = {**prev["tracking"], "visible": False}
             self._current_landmarks = None
 
         # --- 2. POSE ---
+        started = time.perf_counter()
         pose_res = self.mp_pose.process(rgb)
+        observe_vision("pose", time.perf_counter() - started)
         posture_score = 0.4
         posture_data = {"inclination": 0.0, "facing_camera": False, "energy": 0.5}
         if pose_res.pose_landmarks:
-            plm = pose_res.pose_landmarks.landmark
-            shoulder_z_diff = abs(plm[11].z - plm[12].z)
+            plm = landmarks_to_array(pose_res.pose_landmarks)
+            shoulder_z_diff = float(abs(plm[11, 2] - plm[12, 2]))
             facing = shoulder_z_diff < 0.15
             posture_score = 1.0 if facing else 0.4
-            ms_y = (plm[11].y + plm[12].y) / 2
-            mh_y = (plm[23].y + plm[24].y) / 2
+            ms_y = float(plm[11, 1] + plm[12, 1]) / 2
+            mh_y = float(plm[23, 1] + plm[24, 1]) / 2
             spine_len = abs(mh_y - ms_y)
             pos_energy = np.clip(spine_len * 2.5, 0.2, 1.0) 
             posture_data = {"inclination": round(shoulder_z_diff, 2), "facing_camera": facing, "energy": round(pos_energy, 2)}
-            self.context["posture"] = posture_data
+            updates["posture"] = posture_data
 
         # --- 3. HANDS & HOLDING ---
+        started = time.perf_counter()
         hand_res = self.mp_hands.process(rgb)
+        observe_vision("hands", time.perf_counter() - started)
         gestures = []
-        hand_bboxes = []
         if hand_res.multi_hand_landmarks:
-            for hand_lms in hand_res.multi_hand_landmarks:
-                g_list = self.gesture_engine.analyze(hand_lms, frame.shape)
+            hands = np.stack([landmarks_to_array(hand_lms) for hand_lms in hand_res.multi_hand_landmarks])
+            for g_list in self.gesture_engine.analyze_hands(hands, frame.shape):
                 gestures.extend(g_list)
-                xs = [l.x * w for l in hand_lms.landmark]
-                ys = [l.y * h for l in hand_lms.landmark]
-                pad = 30
-                hx1, hy1, hx2, hy2 = min(xs)-pad, min(ys)-pad, max(xs)+pad, max(ys)+pad
-                hand_bboxes.append((hx1, hy1, hx2, hy2))
+            hand_bboxes = hand_boxes(hands, w, h)
             
-            with self.lock: yolo_boxes = self.context.get("_yolo_boxes", [])
-            for obj_name, ox1, oy1, ox2, oy2 in yolo_boxes:
-                if obj_name not in ALLOWED_CLASSES_FOR_HOLDING: continue
-                is_colliding = False
-                for hx1, hy1, hx2, hy2 in hand_bboxes:
-                    if not (ox1 > hx2 or ox2 < hx1 or oy1 > hy2 or oy2 < hy1):
-                        ix1, iy1 = max(hx1, ox1), max(hy1, oy1)
-                        ix2, iy2 = min(hx2, ox2), min(hy2, oy2)
-                        inter_area = max(0, ix2 - ix1) * max(0, iy2 - iy1)
-                        hand_area = (hx2 - hx1) * (hy2 - hy1)
-                        if hand_area > 0 and (inter_area / hand_area) > IOU_THRESHOLD:
-                            is_colliding = True
-                            break
+            tracked = self.tracker.predict(time.time())
+            yolo_boxes = [t[1:] for t in tracked if t[1] in ALLOWED_CLASSES_FOR_HOLDING]
+            obj_bboxes = np.array([b[1:] for b in yolo_boxes], dtype=np.float32).reshape(-1, 4)
+            colliding = hand_collisions(hand_bboxes, obj_bboxes)
+            for (obj_name, *_), is_colliding in zip(yolo_boxes, colliding):
                 if is_colliding:
                     self.collision_counters[obj_name] = self.collision_counters.get(obj_name, 0) + 1
                     if self.collision_counters[obj_name] >= HOLDING_LATCH_FRAMES:
@@ -362,45 +576,59 @@ class VisionSystem:
             self.collision_counters.clear()
             self.latched_objects.clear()
 
-        self.context["gestures"] = list(set(gestures))
-        self.context["holding"] = [obj for obj in self.latched_objects if self.collision_counters.get(obj, 0) > 0]
+        updates["gestures"] = list(set(gestures))
+        updates["holding"] = [obj for obj in self.latched_objects if self.collision_counters.get(obj, 0) > 0]
 
         # --- 4. ATTENTION ---
-        att_gaze = self.context["gaze"]["score"]
+        att_gaze = updates.get("gaze", prev["gaze"])["score"]
         attention = (att_gaze * 0.6) + (posture_score * 0.4)
         engagement = (attention * 0.7) + (0.3 if len(gestures) > 0 else 0.0)
-        self.context["attention"] = float(round(np.clip(attention, 0, 1.0), 2))
-        self.context["engagement"] = float(round(np.clip(engagement, 0, 1.0), 2))
+        updates["attention"] = float(round(np.clip(attention, 0, 1.0), 2))
+        updates["engagement"] = float(round(np.clip(engagement, 0, 1.0), 2))
+        self._publish(**updates)
         
         self._current_metrics = {'gaze': att_gaze, 'posture': posture_data, 'attention': attention}
         
         with self.lock: 
-            self.latest_frame = frame.copy()
+            self.latest_frame = frame
+            self.latest_frame_time = time.time()
+        self.frames_processed += 1
         return frame
 
     def get_context_json(self):
-        return {k: v for k, v in self.context.items() if not k.startswith('_')}
+        """Latest context as a read-only mapping (no copy). Use dict(...) before serializing."""
+        return self._snapshot.data
+
+    def set_detector(self, enabled):
+        self.detector_enabled = enabled
 
     def _yolo_worker(self):
         while self.running:
             if self.latest_frame is None: time.sleep(0.01); continue
-            with self.lock: frame = self.latest_frame.copy()
+            if not self.detector_enabled: time.sleep(0.1); continue  # Tracker coasts, then freezes
+            started = time.time()
+            with self.lock:
+                pyramid = self.latest_frame
+                frame_time = self.latest_frame_time
             try:
-                results = self.yolo(frame, verbose=False, conf=0.5)
+                sx, sy = pyramid.scale(LEVEL_DETECTOR)
+                detector_input = pyramid.get(LEVEL_DETECTOR)
+                inference_started = time.perf_counter()
+                result = self.detector(detector_input)
+                observe_vision("yolo", time.perf_counter() - inference_started)
                 boxes = []
                 surroundings = set()
-                for r in results:
-                    for box in r.boxes:
-                        name = self.yolo.names[int(box.cls[0])]
-                        if name in HOME_CONTEXT_CLASSES:
-                            surroundings.add(name)
-                            if name in ALLOWED_CLASSES_FOR_HOLDING:
-                                b = box.xyxy[0].cpu().numpy()
-                                boxes.append((name, b[0], b[1], b[2], b[3]))
-                self.context["surroundings"] = list(surroundings)
-                self.context["_yolo_boxes"] = boxes
+                for box in result.boxes:
+                    name = self.yolo.names[int(box.cls[0])]
+                    if name in HOME_CONTEXT_CLASSES:
+                        surroundings.add(name)
+                        if name in ALLOWED_CLASSES_FOR_HOLDING:
+                            b = box.xyxy[0].cpu().numpy()
+                            boxes.append((name, b[0] * sx, b[1] * sy, b[2] * sx, b[3] * sy))
+                self._publish(surroundings=list(surroundings))
+                self.tracker.update(boxes, frame_time)
             except: pass
-            time.sleep(0.033)
+            time.sleep(max(YOLO_INTERVAL - (time.time() - started), 0.005))
 
     def _identity_worker(self):
         """
@@ -413,22 +641,21 @@ class VisionSystem:
             
             # If no user is logged in/loaded, we can't match
             if not self.known_embeddings:
-                self.context["identity"] = "Stranger"
+                self._publish(identity="Stranger")
                 time.sleep(1.0)
                 continue
 
-            with self.lock: frame = self.latest_frame.copy()
+            with self.lock: pyramid = self.latest_frame
             
             try:
+                frame = pyramid.get(LEVEL_FULL)
                 # 1. Get embedding of current frame
-                current_emb_obj = DeepFace.represent(
-                    frame, 
-                    model_name="VGG-Face", 
-                    enforce_detection=False
-                )
+                started = time.perf_counter()
+                current_emb_obj = self.faces.represent(frame)
+                observe_vision("identity", time.perf_counter() - started)
                 
                 if not current_emb_obj:
-                    self.context["identity"] = "Unknown"
+                    self._publish(identity="Unknown")
                     time.sleep(0.1)
                     continue
 
@@ -438,12 +665,12 @@ class VisionSystem:
                 is_match = False
                 for auth_emb in self.known_embeddings:
                     # Calculate Cosine Distance
-                    distance = dst.findCosineDistance(curr_emb, auth_emb)
+                    distance = face_models.cosine_distance(curr_emb, auth_emb)
                     if distance < IDENTITY_THRESHOLD:
                         is_match = True
                         break
                 
-                self.context["identity"] = self.active_username if is_match else "Stranger"
+                self._publish(identity=self.active_username if is_match else "Stranger")
 
             except Exception: 
                 pass
@@ -454,22 +681,25 @@ class VisionSystem:
         while self.running:
             if self.latest_frame is None or self._current_landmarks is None:
                 time.sleep(0.05); continue
-            with self.lock: frame = self.latest_frame.copy()
+            with self.lock: pyramid = self.latest_frame
             metrics = getattr(self, '_current_metrics', {})
             landmarks = self._current_landmarks
             try:
-                analysis = DeepFace.analyze(frame, actions=['emotion'], enforce_detection=False, silent=True)
+                frame = pyramid.get(LEVEL_FULL)
+                started = time.perf_counter()
+                analysis = self.faces.analyze_emotion(frame)
+                observe_vision("emotion", time.perf_counter() - started)
                 emo_res = self.emotion_engine.process(
                     analysis, metrics.get('gaze', 0.5), metrics.get('posture', {}), 
                     metrics.get('attention', 0.5), landmarks
                 )
-                self.context.update({
-                    "emotion": emo_res['dominant'],
-                    "emotion_intensity": emo_res['intensity'],
-                    "state_confidence": emo_res['confidence'],
-                    "energy_level": emo_res['energy'],
-                    "emotion_probs": emo_res['probabilities']
-                })
+                self._publish(
+                    emotion=emo_res['dominant'],
+                    emotion_intensity=emo_res['intensity'],
+                    state_confidence=emo_res['confidence'],
+                    energy_level=emo_res['energy'],
+                    emotion_probs=emo_res['probabilities']
+                )
             except Exception: pass
             time.sleep(0.05)
 
@@ -0,0 +1,273 @@
+import os
+import sys
+import argparse
+import threading
+import cv2
+import numpy as np
+from modules import model_store
+from modules.inference_queue import InferenceQueue, ENABLED as BATCHING
+
+# DeepFace looks for its weights under $DEEPFACE_HOME/.deepface/weights: point it at the model store
+os.environ.setdefault("DEEPFACE_HOME", os.path.join(model_store.MODEL_DIR, "deepface"))
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# "onnx": exported models on onnxruntime (no TensorFlow in the process)
+# "deepface": DeepFace on TensorFlow/Keras (reference implementation)
+# "auto": onnx if the exported models exist, else deepface
+BACKEND = os.getenv("AVAANI_FACE_BACKEND", "auto")
+ONNX_DIR = os.path.join(model_store.MODEL_DIR, "deepface", "onnx")
+QUANTIZED = os.getenv("AVAANI_FACE_QUANTIZED") == "1"   # Use the int8 exports
+INTRA_OP_THREADS = int(os.getenv("AVAANI_FACE_THREADS", "2"))  # Per model; emotion and identity run concurrently
+
+EMOTION_LABELS = ("angry", "disgust", "fear", "happy", "sad", "surprise", "neutral")  # DeepFace output order
+EMOTION_INPUT = (48, 48)
+VGG_FACE_INPUT = (224, 224)
+
+# OpenCV detector settings, as DeepFace's "opencv" backend uses them
+HAAR_FACE = os.path.join(cv2.data.haarcascades, "haarcascade_frontalface_default.xml")
+HAAR_EYE = os.path.join(cv2.data.haarcascades, "haarcascade_eye.xml")
+SCALE_FACTOR = 1.1
+MIN_NEIGHBORS = 10
+
+def onnx_path(name, quantized=QUANTIZED):
+    return os.path.join(ONNX_DIR, f"{name}.int8.onnx" if quantized else f"{name}.onnx")
+
+def cosine_distance(a, b):
+    """Same as DeepFace's findCosineDistance."""
+    a, b = np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)
+    return 1.0 - float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+# ==========================================
+# PREPROCESSING (mirrors DeepFace: opencv detector, align=True, expand 0)
+# ==========================================
+class FaceExtractor:
+    """Finds the first face like DeepFace.extract_faces(detector_backend="opencv", align=True)."""
+    def __init__(self):
+        self.face_detector = cv2.CascadeClassifier(HAAR_FACE)
+        self.eye_detector = cv2.CascadeClassifier(HAAR_EYE)
+
+    def extract(self, img):
+        """img: BGR uint8. Returns: BGR float32 face in [0, 1] (whole image if no face is found)."""
+        height, width = img.shape[:2]
+        # Border so alignment can't rotate faces near an edge out of the image
+        border_h, border_w = int(0.5 * height), int(0.5 * width)
+        padded = cv2.copyMakeBorder(img, border_h, border_h, border_w, border_w, cv2.BORDER_CONSTANT, value=[0, 0, 0])
+
+        face = None
+        try:
+            faces, _, _ = self.face_detector.detectMultiScale3(padded, SCALE_FACTOR, MIN_NEIGHBORS, outputRejectLevels=True)
+        except Exception:
+            faces = []
+        if len(faces) > 0:
+            x, y, w, h = (int(v) for v in faces[0])
+            face = padded[y:y + h, x:x + w]
+            left_eye, right_eye = self._find_eyes(face)
+            if left_eye is not None and right_eye is not None:
+                left_eye = (x + left_eye[0], y + left_eye[1])
+                right_eye = (x + right_eye[0], y + right_eye[1])
+                face = self._aligned_crop(padded, (x, y, w, h), left_eye, right_eye)
+        if face is None or face.shape[0] == 0 or face.shape[1] == 0:
+            face = img
+        return face.astype(np.float32) / 255.0
+
+    def _find_eyes(self, face):
+        if face.shape[0] == 0 or face.shape[1] == 0: return None, None
+        eyes = self.eye_detector.detectMultiScale(cv2.cvtColor(face, cv2.COLOR_BGR2GRAY), SCALE_FACTOR, MIN_NEIGHBORS)
+        eyes = sorted(eyes, key=lambda v: abs(v[2] * v[3]), reverse=True)
+        if len(eyes) < 2: return None, None
+        right, left = sorted(eyes[:2], key=lambda v: v[0])  # Image-left eye is the person's right
+        center = lambda e: (int(e[0] + e[2] / 2), int(e[1] + e[3] / 2))
+        return center(left), center(right)
+
+    @staticmethod
+    def _aligned_crop(img, box, left_eye, right_eye):
+        """Rotates the image so the eyes are level, then crops the rotated face box."""
+        angle = float(np.degrees(np.arctan2(left_eye[1] - right_eye[1], left_eye[0] - right_eye[0])))
+        h, w = img.shape[:2]
+        m = cv2.getRotationMatrix2D((w // 2, h // 2), angle, 1.0)
+        rotated = cv2.warpAffine(img, m, (w, h), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_CONSTANT, borderValue=(0, 0, 0))
+
+        # Rotated box corners -> enclosing box
+        x, y, bw, bh = box
+        corners = np.array([[x, y, 1], [x + bw, y, 1], [x, y + bh, 1], [x + bw, y + bh, 1]], dtype=np.float64) @ m.T
+        x1, y1 = np.floor(corners.min(axis=0)).astype(int)
+        x2, y2 = np.ceil(corners.max(axis=0)).astype(int)
+        x1, y1, x2, y2 = max(0, x1), max(0, y1), min(w, x2), min(h, y2)
+        return rotated[y1:y2, x1:x2]
+
+def resize_padded(img, target):
+    """DeepFace's resize_image: fit inside `target` keeping aspect, zero pad, add batch axis."""
+    factor = min(target[0] / img.shape[0], target[1] / img.shape[1])
+    img = cv2.resize(img, (int(img.shape[1] * factor), int(img.shape[0] * factor)))
+    d0, d1 = target[0] - img.shape[0], target[1] - img.shape[1]
+    pad = ((d0 // 2, d0 - d0 // 2), (d1 // 2, d1 - d1 // 2)) + (((0, 0),) if img.ndim == 3 else ())
+    img = np.pad(img, pad, "constant")
+    if img.shape[:2] != tuple(target):
+        img = cv2.resize(img, (target[1], target[0]))
+    return img[np.newaxis].astype(np.float32)
+
+def emotion_input(face):
+    """BGR [0, 1] face -> (1, 48, 48, 1), as DeepFace's Emotion model receives it."""
+    img = resize_padded(face, (224, 224))[0]
+    gray = cv2.resize(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY), EMOTION_INPUT)
+    return gray[np.newaxis, :, :, np.newaxis].astype(np.float32)
+
+def vgg_face_input(face):
+    return resize_padded(face, VGG_FACE_INPUT)
+
+def emotion_result(probs):
+    """Model softmax -> the DeepFace.analyze shape EmotionEngine.process reads."""
+    probs = np.asarray(probs, dtype=np.float64)
+    scores = 100.0 * probs / probs.sum()
+    return [{"emotion": {label: float(s) for label, s in zip(EMOTION_LABELS, scores)},
+             "dominant_emotion": EMOTION_LABELS[int(np.argmax(scores))]}]
+
+def l2_normalize(v):
+    return v / np.sqrt(np.sum(v * v))
+
+# ==========================================
+# BACKENDS (same call shapes as DeepFace.analyze / DeepFace.represent)
+# ==========================================
+class OnnxFaceBackend:
+    name = "onnx"
+
+    def __init__(self, quantized=QUANTIZED, threads=INTRA_OP_THREADS, batching=BATCHING):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.emotion = ort.InferenceSession(onnx_path("emotion", quantized), options, providers=["CPUExecutionProvider"])
+        self.vgg_face = ort.InferenceSession(onnx_path("vgg_face", quantized), options, providers=["CPUExecutionProvider"])
+        # Exports have a dynamic batch axis: concurrent requests share one forward pass
+        self.emotion_queue = InferenceQueue("emotion", lambda xs: self._run(self.emotion, xs), enabled=batching)
+        self.vgg_face_queue = InferenceQueue("vgg_face", lambda xs: self._run(self.vgg_face, xs), enabled=batching)
+        # Cascade classifiers are not thread-safe: the emotion and identity workers each get their own
+        self._local = threading.local()
+
+    def _extract(self, img):
+        if not hasattr(self._local, "extractor"):
+            self._local.extractor = FaceExtractor()
+        return self._local.extractor.extract(img)
+
+    @staticmethod
+    def _run(session, inputs):
+        """inputs: list of (1, ...) arrays. Returns: one output row per input."""
+        return list(session.run(None, {session.get_inputs()[0].name: np.concatenate(inputs)})[0])
+
+    def emotion_probs(self, face):
+        """face: BGR [0, 1] crop. Returns: 7 softmax probabilities (EMOTION_LABELS order)."""
+        return self.emotion_queue(emotion_input(face))
+
+    def embedding(self, face):
+        return l2_normalize(self.vgg_face_queue(vgg_face_input(face)))
+
+    def analyze_emotion(self, img):
+        return emotion_result(self.emotion_probs(self._extract(img)))
+
+    def represent(self, img):
+        return [{"embedding": self.embedding(self._extract(img)).tolist()}]
+
+    def represent_many(self, imgs):
+        """
+        represent() for several images, submitted together so they share batches (reference poses at login).
+        Returns: one result per image, None where that image failed.
+        """
+        futures = []
+        for img in imgs:
+            try:
+                futures.append(self.vgg_face_queue.submit(vgg_face_input(self._extract(img))))
+            except Exception as e:
+                print(f"⚠️ Face embedding failed: {e}")
+                futures.append(None)
+        results = []
+        for future in futures:
+            try:
+                results.append(None if future is None else [{"embedding": l2_normalize(future.result()).tolist()}])
+            except Exception as e:
+                print(f"⚠️ Face embedding failed: {e}")
+                results.append(None)
+        return results
+
+class DeepFaceBackend:
+    name = "deepface"
+
+    def __init__(self):
+        model_store.ensure_group("deepface")
+        from deepface import DeepFace
+        self.deepface = DeepFace
+
+    def analyze_emotion(self, img):
+        return self.deepface.analyze(img, actions=['emotion'], enforce_detection=False, silent=True)
+
+    def represent(self, img):
+        return self.deepface.represent(img_path=img, model_name="VGG-Face", enforce_detection=False)
+
+    def represent_many(self, imgs):
+        results = []
+        for img in imgs:
+            try:
+                results.append(self.represent(img))
+            except Exception as e:
+                print(f"⚠️ Face embedding failed: {e}")
+                results.append(None)
+        return results
+
+def exported(quantized=QUANTIZED):
+    return all(os.path.exists(onnx_path(n, quantized)) for n in ("emotion", "vgg_face"))
+
+def load_backend(backend=BACKEND):
+    if backend == "auto":
+        backend = "onnx" if exported() else "deepface"
+        if backend == "deepface":
+            print("⚠️ Face models not exported to ONNX (python -m modules.face_models export); using DeepFace")
+    backend = OnnxFaceBackend() if backend == "onnx" else DeepFaceBackend()
+    print(f"   - Face Models: {backend.name}")
+    return backend
+
+# ==========================================
+# EXPORT (needs TensorFlow, DeepFace and tf2onnx; run once per model store)
+# ==========================================
+def keras_models():
+    """The DeepFace Keras models behind analyze(emotion) and represent(VGG-Face)."""
+    model_store.ensure_group("deepface")
+    from deepface import DeepFace
+    return {
+        "emotion": DeepFace.build_model(model_name="Emotion", task="facial_attribute").model,
+        "vgg_face": DeepFace.build_model(model_name="VGG-Face", task="facial_recognition").model
+    }
+
+def export(quantize=False, opset=13):
+    import tensorflow as tf
+    try:
+        import tf2onnx
+    except ImportError:
+        raise SystemExit("❌ Export needs tf2onnx (pip install tf2onnx)")
+
+    os.makedirs(ONNX_DIR, exist_ok=True)
+    for name, model in keras_models().items():
+        path = onnx_path(name, quantized=False)
+        signature = (tf.TensorSpec((None, *model.input_shape[1:]), tf.float32, name="input"),)
+        tf2onnx.convert.from_keras(model, input_signature=signature, opset=opset, output_path=path)
+        print(f"✅ {name}: {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+
+        if quantize:
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+            qpath = onnx_path(name, quantized=True)
+            quantize_dynamic(path, qpath, weight_type=QuantType.QInt8)
+            print(f"✅ {name} (int8): {qpath} ({os.path.getsize(qpath) / 1e6:.1f} MB)")
+
+if __name__ == "__main__":
+    # Usage (from backend_brain/):
+    #   python -m modules.face_models export [--quantize]
+    # Parity against DeepFace: python -m benchmarks.face_parity
+    parser = argparse.ArgumentParser(description="Export DeepFace emotion / VGG-Face models to ONNX")
+    parser.add_argument("command", choices=["export"])
+    parser.add_argument("--quantize", action="store_true", help="Also write dynamic int8 versions")
+    parser.add_argument("--opset", type=int, default=13)
+    args = parser.parse_args()
+    export(quantize=args.quantize, opset=args.opset)
+    sys.exit(0)
@@ -0,0 +1,158 @@
+import threading
+import cv2
+import numpy as np
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Pyramid levels. Each vision model asks for the one it needs.
+LEVEL_LANDMARKS = "landmarks"     # RGB, MediaPipe face/hands/pose (they resize to ~256px internally)
+LEVEL_DETECTOR = "detector"       # BGR, YOLO input (default imgsz=640)
+LEVEL_FULL = "full"               # BGR, native resolution for face crops (DeepFace)
+
+LEVEL_SIZES = {
+    LEVEL_LANDMARKS: 480,         # Long side in pixels (never upscaled)
+    LEVEL_DETECTOR: 640,
+    LEVEL_FULL: None
+}
+LEVEL_RGB = {LEVEL_LANDMARKS}
+
+# cv2 reduced JPEG decode (DCT scaling), largest factor first
+_REDUCED_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2)
+)
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+def jpeg_size(data):
+    """Reads (width, height) from the JPEG SOF header without decoding. Returns None if not found."""
+    n = len(data)
+    if n < 4 or data[0] != 0xFF or data[1] != 0xD8: return None
+    i = 2
+    while i + 9 < n:
+        if data[i] != 0xFF:
+            i += 1; continue
+        marker = data[i + 1]
+        if marker == 0xFF or marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            i += 2 if marker != 0xFF else 1
+            continue
+        if marker in _SOF_MARKERS:
+            height = int.from_bytes(data[i + 5:i + 7], "big")
+            width = int.from_bytes(data[i + 7:i + 9], "big")
+            return (width, height) if width and height else None
+        i += 2 + int.from_bytes(data[i + 2:i + 4], "big")
+    return None
+
+# ==========================================
+# FRAME PYRAMID
+# ==========================================
+class FramePyramid:
+    """
+    Lazily built, cached set of resolutions for one video frame.
+    Levels are produced on first request from the cheapest source available:
+    reduced-DCT JPEG decode, a PyAV frame reformat (scale + colour convert in one pass),
+    or a resize of an already decoded level. Arrays are shared between consumers and
+    must be treated as read-only.
+    """
+    # Process-wide level cache counters (read by /metrics; unlocked, approximate by design)
+    cache_hits = 0
+    cache_builds = 0
+
+    def __init__(self, width, height, jpeg=None, av_frame=None, bgr=None):
+        self.width = width
+        self.height = height
+        self._jpeg = jpeg
+        self._av_frame = av_frame
+        self._levels = {}
+        self._lock = threading.Lock()
+        if bgr is not None:
+            self._levels[LEVEL_FULL] = bgr
+
+    @classmethod
+    def from_jpeg(cls, data):
+        """Returns: FramePyramid, or None if the bytes are not a decodable image."""
+        size = jpeg_size(data)
+        if size is not None:
+            return cls(size[0], size[1], jpeg=data)
+        frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        return None if frame is None else cls.from_bgr(frame)
+
+    @classmethod
+    def from_av_frame(cls, frame):
+        return cls(frame.width, frame.height, av_frame=frame)
+
+    @classmethod
+    def from_bgr(cls, frame):
+        h, w = frame.shape[:2]
+        return cls(w, h, bgr=frame)
+
+    @property
+    def jpeg(self):
+        """Original JPEG bytes if the frame arrived encoded, else None."""
+        return self._jpeg
+
+    @property
+    def shape(self):
+        """Native (height, width, channels), same as the full-resolution ndarray would report."""
+        return (self.height, self.width, 3)
+
+    def level_size(self, level):
+        """(width, height) of a level."""
+        target = LEVEL_SIZES[level]
+        scale = 1.0 if target is None else min(1.0, target / max(self.width, self.height))
+        return max(1, round(self.width * scale)), max(1, round(self.height * scale))
+
+    def scale(self, level):
+        """(sx, sy) multipliers that map pixel coords in `level` back to native resolution."""
+        lw, lh = self.level_size(level)
+        return self.width / lw, self.height / lh
+
+    def get(self, level):
+        """Returns the cached ndarray for `level`, building it on first use."""
+        img = self._levels.get(level)
+        if img is not None:
+            FramePyramid.cache_hits += 1
+            return img
+        with self._lock:
+            img = self._levels.get(level)
+            if img is None:
+                img = self._build(level)
+                self._levels[level] = img
+                FramePyramid.cache_builds += 1
+            else:
+                FramePyramid.cache_hits += 1
+        return img
+
+    def _build(self, level):
+        tw, th = self.level_size(level)
+        rgb = level in LEVEL_RGB
+
+        if self._av_frame is not None:
+            return self._av_frame.reformat(width=tw, height=th, format="rgb24" if rgb else "bgr24").to_ndarray()
+
+        full = self._levels.get(LEVEL_FULL)
+        if full is not None:
+            img = full
+        elif level == LEVEL_FULL:
+            img = self._decode_jpeg(cv2.IMREAD_COLOR)
+        else:
+            img = self._decode_jpeg(self._reduced_flag(tw))
+
+        if img.shape[1] != tw or img.shape[0] != th:
+            img = cv2.resize(img, (tw, th), interpolation=cv2.INTER_AREA)
+        if rgb:
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        return img
+
+    def _reduced_flag(self, target_width):
+        for factor, flag in _REDUCED_FLAGS:
+            if self.width // factor >= target_width:
+                return flag
+        return cv2.IMREAD_COLOR
+
+    def _decode_jpeg(self, flag):
+        img = cv2.imdecode(np.frombuffer(self._jpeg, np.uint8), flag)
+        if img is None:
+            raise ValueError("Corrupt JPEG frame")
+        return img
@@ -0,0 +1,125 @@
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import Future
+from modules.metrics import observe_batch
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+ENABLED = os.getenv("AVAANI_BATCHING", "1") == "1"
+MAX_BATCH = int(os.getenv("AVAANI_BATCH_SIZE", "8"))            # Requests per model call
+# Extra wait for company once a request is taken. 0: an idle model runs a request at once, and only
+# requests that pile up while a batch is running are coalesced (no added latency for a lone caller).
+MAX_WAIT = float(os.getenv("AVAANI_BATCH_WAIT_MS", "0")) / 1000.0
+
+# ==========================================
+# BATCHING QUEUE (one per model, shared by every caller in the process)
+# ==========================================
+class InferenceQueue:
+    """
+    Collects single requests from any thread and runs them as one batched model call.
+    run_batch(items) -> results, same length and order. One call runs at a time: a request
+    that finds the model idle runs at once on the caller's thread (no queue hop, no wait);
+    requests arriving while a call runs pile up and go together in the next one (up to max_batch).
+    max_wait > 0 additionally holds a batch open that long after its oldest request.
+    enabled=False runs every request on the caller's thread (batch of one, no queue).
+    """
+    def __init__(self, name, run_batch, max_batch=MAX_BATCH, max_wait=MAX_WAIT, enabled=ENABLED):
+        self.name = name
+        self.run_batch = run_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.enabled = enabled
+        self.batches = 0
+        self.items = 0
+        self._pending = deque()  # (item, future, queued_at)
+        self._busy = False       # A model call is running (inline or on the queue thread)
+        self._cond = threading.Condition()
+        if enabled:
+            threading.Thread(target=self._loop, name=f"batch-{name}", daemon=True).start()
+
+    def submit(self, item):
+        """Returns: a Future for this item's result."""
+        request = (item, Future(), time.perf_counter())
+        if self.enabled:
+            with self._cond:
+                if self._busy or self._pending:
+                    self._pending.append(request)
+                    self._cond.notify()
+                    return request[1]
+                self._busy = True
+        try:
+            self._run([request])
+        finally:
+            if self.enabled: self._release()
+        return request[1]
+
+    def __call__(self, item):
+        return self.submit(item).result()
+
+    def map(self, items):
+        """Submits every item before waiting, so they can share batches."""
+        return [future.result() for future in [self.submit(item) for item in items]]
+
+    def _release(self):
+        with self._cond:
+            self._busy = False
+            self._cond.notify()
+
+    def _next_batch(self):
+        with self._cond:
+            while self._busy or not self._pending:
+                self._cond.wait()
+            deadline = self._pending[0][2] + self.max_wait
+            while self.max_wait > 0 and len(self._pending) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0: break
+                self._cond.wait(remaining)
+            self._busy = True
+            return [self._pending.popleft() for _ in range(min(self.max_batch, len(self._pending)))]
+
+    def _loop(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                self._run(batch)
+            finally:
+                self._release()
+
+    def _run(self, batch):
+        """One model call; every future in `batch` gets a result or an exception."""
+        started = time.perf_counter()
+        observe_batch(self.name, len(batch), [started - queued for _, _, queued in batch])
+        self.batches += 1
+        self.items += len(batch)
+        try:
+            results = list(self.run_batch([item for item, _, _ in batch]))
+            if len(results) != len(batch):
+                raise RuntimeError(f"{self.name}: batch of {len(batch)} returned {len(results)} results")
+        except Exception as e:
+            for _, future, _ in batch: future.set_exception(e)
+            return
+        for (_, future, _), result in zip(batch, results):
+            future.set_result(result)
+
+    def stats(self):
+        return {"batches": self.batches, "items": self.items,
+                "mean_batch": round(self.items / self.batches, 2) if self.batches else 0.0}
+
+# ==========================================
+# PROCESS-WIDE MODELS
+# ==========================================
+_shared = {}
+_shared_lock = threading.Lock()
+
+def shared_model(name, factory):
+    """
+    Loads `name` once per process via factory() and hands every caller the same object,
+    so all VisionSystems (sessions) in a process feed the same queues.
+    """
+    with _shared_lock:
+        if name not in _shared:
+            _shared[name] = factory()
+        return _shared[name]
@@ -0,0 +1,126 @@
+import os
+import re
+import random
+import string
+from collections import namedtuple
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Intents answered in-process (comma-separated, "" disables the router).
+# Everything else falls through to the LLM.
+ENABLED_INTENTS = {
+    name.strip() for name in
+    os.getenv("AVAANI_FAST_INTENTS", "greeting,goodbye,time,date,stop,identity").split(",")
+    if name.strip()
+}
+
+# Leading fillers stripped before matching ("hey avaani, what time is it")
+WAKE_PREFIX = re.compile(r"^(?:(?:hey|hi|ok|okay|so|um|uh)\s+)?avaani\s+")
+
+UNKNOWN_NAMES = {"Stranger", "Unknown", None, ""}
+CLOCK_FIELDS = ("{time}", "{date}")   # Need the user's timezone; replies using them are never cached
+
+# ==========================================
+# INTENTS
+# ==========================================
+# Patterns must match the WHOLE normalized transcript: "hello, can you help me" is not a greeting.
+# Replies follow the SYSTEM_PROMPT persona: short, warm, plain text. {name} is ", Priyanshu" or "".
+# {time}/{date} are in the client's timezone; without one those intents go to the LLM.
+Intent = namedtuple("Intent", ["name", "patterns", "replies"])
+
+INTENTS = (
+    Intent("greeting",
+           (r"(?:hello|hi|hey|hiya|yo|howdy)(?: there| avaani)?",
+            r"good (?:morning|afternoon|evening)(?: avaani)?"),
+           ("Hey{name}! What can I do for you?",
+            "Hi{name}. I'm all ears.",
+            "Hello{name}! What's on your mind?")),
+    Intent("goodbye",
+           (r"(?:good ?bye|bye(?: bye)?|see you(?: later| soon)?|talk to you later|good night)(?: avaani)?",),
+           ("Bye{name}, talk soon.",
+            "See you later{name}.",
+            "Take care{name}. I'll be right here.")),
+    Intent("time",
+           (r"what(?: is|'?s)? the time(?: now| right now)?",
+            r"what time is it(?: now| right now)?",
+            r"(?:tell me )?the time(?: please)?"),
+           ("It's {time}.",)),
+    Intent("date",
+           (r"what(?: is|'?s)? (?:the date|today'?s date)(?: today)?",
+            r"what day is (?:it|today)(?: today)?"),
+           ("It's {date}.",
+            "Today is {date}.")),
+    Intent("stop",
+           (r"(?:stop|cancel|never ?mind|be quiet|quiet|shush|that's enough|enough)(?: please)?",),
+           ("Okay.", "Sure, stopping.")),
+    Intent("identity",
+           (r"who are you", r"what(?: is|'?s)? your name"),
+           ("I'm Avaani, your companion. I can see and hear you, so just talk to me.",)),
+)
+
+FastReply = namedtuple("FastReply", ["intent", "text", "cacheable"])  # cacheable: same text every time (TTS phrase cache)
+
+def parse_timezone(name):
+    """IANA name from the client ("Asia/Kolkata") -> ZoneInfo, or None if missing/unknown."""
+    if not isinstance(name, str) or not name: return None
+    try:
+        return ZoneInfo(name)
+    except Exception:
+        return None
+
+def uses_clock(template):
+    return any(field in template for field in CLOCK_FIELDS)
+
+def normalize(text):
+    text = text.lower().replace("’", "'")
+    text = text.translate(str.maketrans("", "", string.punctuation.replace("'", "")))
+    text = " ".join(text.split())
+    return WAKE_PREFIX.sub("", text + " ").strip() or text  # "Hey Avaani." alone is a greeting
+
+# ==========================================
+# ROUTER
+# ==========================================
+class IntentRouter:
+    """
+    Rule/template matcher in front of BrainSystem.think for trivial turns.
+    route() returns a FastReply, or None to fall through to the LLM.
+    """
+    def __init__(self, enabled=ENABLED_INTENTS):
+        self.intents = [
+            (intent, [re.compile(p + r"$") for p in intent.patterns])
+            for intent in INTENTS if intent.name in enabled
+        ]
+
+    def match(self, user_text, timezone=None):
+        """
+        timezone: the session's ZoneInfo (parse_timezone), None if the client sent none.
+        Returns: the matching intent name, or None.
+        """
+        if not user_text or not self.intents: return None
+        text = normalize(user_text)
+        for intent, patterns in self.intents:
+            if timezone is None and any(uses_clock(r) for r in intent.replies):
+                continue  # The server's clock is not the user's: let the LLM answer
+            if any(p.match(text) for p in patterns):
+                return intent.name
+        return None
+
+    def route(self, user_text, vision_context=None, timezone=None):
+        name = self.match(user_text, timezone)
+        if name is None: return None
+        intent = next(i for i, _ in self.intents if i.name == name)
+        template = random.choice(intent.replies)
+        return FastReply(name, self._fill(template, vision_context or {}, timezone), not uses_clock(template))
+
+    @staticmethod
+    def _fill(template, vision_context, timezone):
+        identity = vision_context.get("identity")
+        fields = {"name": f", {identity}" if identity not in UNKNOWN_NAMES else ""}
+        if uses_clock(template):
+            now = datetime.now(timezone)
+            fields["time"] = now.strftime("%I:%M %p").lstrip("0")
+            fields["date"] = now.strftime("%A, %B ") + str(now.day)
+        return template.format(**fields)
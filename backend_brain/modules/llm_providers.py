@@ -0,0 +1,232 @@
+import os
+import json
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+from modules.metrics import LLM_PROVIDER_SECONDS, LLM_PROVIDER_REQUESTS, LLM_HEDGES
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Ordered provider list (first = preferred), as JSON in AVAANI_LLM_PROVIDERS, e.g.
+# [{"name": "groq-70b", "kind": "groq", "model": "llama3-70b-8192"},
+#  {"name": "groq-8b", "kind": "groq", "model": "llama-3.1-8b-instant"},
+#  {"name": "local", "kind": "openai", "model": "llama3", "base_url": "http://127.0.0.1:8000/v1", "api_key_env": null}]
+# kind "groq": Groq SDK (base_url defaults to GROQ_BASE_URL / api.groq.com)
+# kind "openai": any OpenAI-compatible server, POST {base_url}/chat/completions
+PROVIDERS_ENV = "AVAANI_LLM_PROVIDERS"
+DEFAULT_PROVIDERS = [
+    {"name": "groq-70b", "kind": "groq", "model": "llama3-70b-8192"},
+    {"name": "groq-8b", "kind": "groq", "model": "llama-3.1-8b-instant"}
+]
+
+REQUEST_TIMEOUT = 10.0            # Per provider call (seconds)
+TOTAL_TIMEOUT = 12.0              # Whole completion, hedges and failover included
+POOL_THREADS = 16                 # Concurrent provider calls per worker (all sessions, losers included)
+
+# Hedging: if the current request is slower than the provider's recent p95, fire the next one too
+HEDGE_ENABLED = os.getenv("AVAANI_LLM_HEDGE", "1") == "1"
+LATENCY_WINDOW = 50               # Recent successful calls per provider
+MIN_SAMPLES = 10                  # Below this the p95 is not trusted: DEFAULT_HEDGE_DELAY is used
+DEFAULT_HEDGE_DELAY = 1.5
+MIN_HEDGE_DELAY = 0.3
+MAX_HEDGE_DELAY = 4.0
+
+# Circuit breaker
+FAILURE_THRESHOLD = 3             # Consecutive failures that open the circuit
+COOLDOWN = 30.0                   # Seconds open before a single probe request is let through
+
+class LLMUnavailable(Exception):
+    """Every provider failed, timed out or is circuit-broken."""
+
+# ==========================================
+# PROVIDERS
+# ==========================================
+class LatencyTracker:
+    def __init__(self, window=LATENCY_WINDOW):
+        self.samples = deque(maxlen=window)
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+
+    def hedge_delay(self):
+        if len(self.samples) < MIN_SAMPLES:
+            return DEFAULT_HEDGE_DELAY
+        p95 = float(np.percentile(self.samples, 95))
+        return min(MAX_HEDGE_DELAY, max(MIN_HEDGE_DELAY, p95))
+
+class CircuitBreaker:
+    """closed -> (FAILURE_THRESHOLD failures) -> open -> (COOLDOWN) -> half_open -> one probe -> closed/open"""
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, threshold=FAILURE_THRESHOLD, cooldown=COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.time() - self.opened_at >= self.cooldown:
+                self.state = self.HALF_OPEN  # This caller is the probe
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def failure(self):
+        """Returns: True if this failure opened the circuit."""
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.threshold):
+                self.state = self.OPEN
+                self.opened_at = time.time()
+                return True
+            return False
+
+def default_key_env(kind):
+    """Only Groq has an implied key; other endpoints must name theirs, so no secret goes to the wrong host."""
+    return "GROQ_API_KEY" if kind == "groq" else None
+
+class Provider:
+    def __init__(self, name, model, kind="groq", base_url=None, api_key_env=None, timeout=REQUEST_TIMEOUT):
+        self.name = name
+        self.model = model
+        self.kind = kind
+        self.timeout = timeout
+        self.latency = LatencyTracker()
+        self.breaker = CircuitBreaker()
+        api_key_env = api_key_env or default_key_env(kind)
+        api_key = os.getenv(api_key_env) if api_key_env else None
+
+        if kind == "groq":
+            from groq import Groq
+            self.client = Groq(api_key=api_key, base_url=base_url, timeout=timeout, max_retries=0)
+        elif kind == "openai":
+            import httpx
+            headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+            self.client = httpx.Client(base_url=base_url.rstrip("/"), headers=headers, timeout=timeout)
+        else:
+            raise ValueError(f"{name}: unknown provider kind '{kind}'")
+
+    def complete(self, messages, **params):
+        """Blocking chat completion. Returns: reply text."""
+        if self.kind == "groq":
+            completion = self.client.chat.completions.create(model=self.model, messages=messages, stream=False, **params)
+            return completion.choices[0].message.content
+        response = self.client.post("/chat/completions", json={"model": self.model, "messages": messages, **params})
+        response.raise_for_status()
+        return response.json()["choices"][0]["message"]["content"]
+
+    def __repr__(self):
+        return f"{self.name} ({self.model}, {self.breaker.state})"
+
+def load_providers(spec=None):
+    """Builds providers from `spec` (list of dicts), AVAANI_LLM_PROVIDERS, or the Groq defaults."""
+    if spec is None:
+        raw = os.getenv(PROVIDERS_ENV)
+        spec = json.loads(raw) if raw else DEFAULT_PROVIDERS
+    providers = []
+    for entry in spec:
+        entry = dict(entry)
+        key_env = entry["api_key_env"] = entry.get("api_key_env") or default_key_env(entry.get("kind", "groq"))
+        if key_env and not os.getenv(key_env):
+            print(f"⚠️ LLM provider '{entry['name']}' skipped: {key_env} not set")
+            continue
+        try:
+            providers.append(Provider(**entry))
+        except Exception as e:
+            print(f"❌ LLM provider '{entry.get('name')}' failed: {e}")
+    return providers
+
+# ==========================================
+# ROUTER (ordered failover + hedging)
+# ==========================================
+class ProviderRouter:
+    """
+    Sends a completion to the first healthy provider. If it is slower than its recent p95,
+    the next healthy provider is fired as a hedge; a failure moves on to the next one at once.
+    The first successful reply wins. Losing calls run to completion in the background
+    (HTTP calls cannot be interrupted) and still update latency and breaker state.
+    """
+    def __init__(self, providers, hedge=HEDGE_ENABLED, total_timeout=TOTAL_TIMEOUT):
+        self.providers = providers
+        self.hedge = hedge
+        self.total_timeout = total_timeout
+        self._pool = ThreadPoolExecutor(max_workers=POOL_THREADS, thread_name_prefix="llm")
+
+    def complete(self, messages, **params):
+        """Returns: (reply text, provider name). Raises LLMUnavailable."""
+        queue = list(self.providers)
+        running = {}   # future -> (provider, hedged)
+        deadline = time.time() + self.total_timeout
+        errors = []
+
+        def launch_next(hedged=False):
+            while queue:
+                provider = queue.pop(0)
+                if not provider.breaker.allow():
+                    LLM_PROVIDER_REQUESTS.labels(provider.name, "rejected").inc()
+                    continue
+                if hedged: LLM_HEDGES.labels("fired").inc()
+                running[self._pool.submit(self._call, provider, messages, params)] = (provider, hedged)
+                return True
+            return False
+
+        launch_next()
+        while running:
+            remaining = deadline - time.time()
+            if remaining <= 0: break
+            # Hedge timer: the newest request's provider p95
+            newest = list(running.values())[-1][0]
+            timeout = min(remaining, newest.latency.hedge_delay()) if self.hedge and queue else remaining
+            done, _ = wait(list(running), timeout=timeout, return_when=FIRST_COMPLETED)
+
+            if not done:
+                launch_next(hedged=True)  # Hedge timer expired
+                continue
+
+            for future in done:
+                provider, hedged = running.pop(future)
+                try:
+                    text = future.result()
+                except Exception as e:
+                    errors.append(f"{provider.name}: {e}")
+                    continue
+                if hedged: LLM_HEDGES.labels("won").inc()
+                return text, provider.name
+
+            launch_next()  # Failover: a request failed
+
+        raise LLMUnavailable("; ".join(errors) or "no healthy provider")
+
+    def _call(self, provider, messages, params):
+        started = time.perf_counter()
+        try:
+            text = provider.complete(messages, **params)
+        except Exception:
+            LLM_PROVIDER_REQUESTS.labels(provider.name, "error").inc()
+            if provider.breaker.failure():
+                print(f"⚠️ LLM provider '{provider.name}' circuit open for {provider.breaker.cooldown:.0f}s")
+                LLM_PROVIDER_REQUESTS.labels(provider.name, "circuit_opened").inc()
+            raise
+        elapsed = time.perf_counter() - started
+        provider.latency.add(elapsed)
+        provider.breaker.success()
+        LLM_PROVIDER_SECONDS.labels(provider.name).observe(elapsed)
+        LLM_PROVIDER_REQUESTS.labels(provider.name, "ok").inc()
+        return text
+
+    def status(self):
+        return [{"name": p.name, "model": p.model, "circuit": p.breaker.state,
+                 "hedge_delay": round(p.latency.hedge_delay(), 3), "samples": len(p.latency.samples)}
+                for p in self.providers]
@@ -0,0 +1,160 @@
+import os
+import time
+import asyncio
+from collections import deque, namedtuple
+import psutil
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+ENABLED = os.getenv("AVAANI_QUALITY_CONTROL", "1") == "1"
+
+# Quality tiers, cheapest last. Vision is degraded before anything on the conversation path,
+# so turn latency is the last thing to give.
+# vision_fps: frames/sec a session may hand to vision (None = every frame)
+# detector: YOLO object detection (worker-wide: vision is shared by the worker's sessions)
+# stt: "adaptive" (greedy + beam fallback, see ears._decode) or "greedy" (never beam)
+# accept_sessions: False makes this worker answer new connections with server_busy
+QualityTier = namedtuple("QualityTier", ["name", "vision_fps", "detector", "stt", "accept_sessions"])
+
+TIERS = (
+    QualityTier("full",         None, True,  "adaptive", True),
+    QualityTier("vision_10fps", 10,   True,  "adaptive", True),
+    QualityTier("no_detector",  5,    False, "adaptive", True),
+    QualityTier("fast_stt",     5,    False, "greedy",   True),
+    QualityTier("shed",         2,    False, "greedy",   False)
+)
+
+# Signal -> (high, low). Any signal >= high for UP_HOLD steps one tier down in quality;
+# every signal <= low for DOWN_HOLD steps one tier back up. In between: hold.
+LIMITS = {
+    "cpu": (0.90, 0.65),              # System CPU utilisation (0-1)
+    "loop_lag": (0.05, 0.01),         # Event loop scheduling delay (s): vision/decode starving the loop
+    "vision_queue": (3, 0),           # Snapshots waiting in the vision result queue
+    "stt_rtf": (0.5, 0.25),           # Transcription seconds per second of speech
+    "tts_first_chunk": (0.75, 0.35)   # Reply text ready -> first reply audio (s)
+}
+# Reported per turn by the server (others are sampled). Only stages this worker's load can slow
+# down: the cloud LLM round trip is left out, since no local tier would make it faster.
+OBSERVED = ("stt_rtf", "tts_first_chunk")
+SIGNAL_WINDOW = 20.0              # Seconds a per-turn observation counts
+SAMPLE_INTERVAL = 0.5
+UP_HOLD = 2.0                     # Seconds over a high limit before degrading one tier
+DOWN_HOLD = 10.0                  # Seconds under every low limit before restoring one tier
+
+# ==========================================
+# CONTROLLER (one per worker)
+# ==========================================
+class LoadController:
+    """
+    Watches CPU, event loop lag, vision queue depth and per-turn STT/TTS latency, and
+    moves one tier at a time through TIERS with hysteresis (separate high/low limits and hold times).
+    apply(tier) is called after every sample with the current tier (so it must be idempotent).
+    """
+    def __init__(self, tiers=TIERS, apply=None, enabled=ENABLED):
+        self.tiers = tiers
+        self.level = 0
+        self.enabled = enabled
+        self.apply = apply
+        self.signals = {}
+        self.changes = 0
+        self._observed = {name: deque(maxlen=64) for name in OBSERVED}
+        self._above_since = None
+        self._below_since = None
+
+    @property
+    def tier(self):
+        return self.tiers[self.level]
+
+    def observe(self, signal, value):
+        """Per-turn measurements (stt_rtf, tts_first_chunk)."""
+        if value is not None:
+            self._observed[signal].append((time.time(), value))
+
+    def sample(self, loop_lag=None, vision_queue=None):
+        now = time.time()
+        signals = {"cpu": psutil.cpu_percent(interval=None) / 100.0, "loop_lag": loop_lag, "vision_queue": vision_queue}
+        for name, samples in self._observed.items():
+            recent = [v for t, v in samples if now - t <= SIGNAL_WINDOW]
+            signals[name] = max(recent) if recent else None
+        self.signals = signals
+        if self.enabled:
+            self._step(now)
+        return self.tier
+
+    def _step(self, now):
+        present = {k: v for k, v in self.signals.items() if v is not None}
+        if any(v >= LIMITS[k][0] for k, v in present.items()):
+            self._below_since = None
+            self._above_since = self._above_since or now
+            if now - self._above_since >= UP_HOLD and self.level < len(self.tiers) - 1:
+                self._set_level(self.level + 1)
+                self._above_since = now  # Give the new tier a full hold before the next step
+        elif all(v <= LIMITS[k][1] for k, v in present.items()):
+            self._above_since = None
+            self._below_since = self._below_since or now
+            if now - self._below_since >= DOWN_HOLD and self.level > 0:
+                self._set_level(self.level - 1)
+                self._below_since = now
+        else:
+            self._above_since = self._below_since = None
+
+    def _set_level(self, level):
+        old = self.tier
+        self.level = level
+        self.changes += 1
+        for samples in self._observed.values():
+            samples.clear()  # Measured under the old tier
+        print(f"🎚️ Quality tier {old.name} -> {self.tier.name} ({self._describe()})")
+
+    def _describe(self):
+        return ", ".join(f"{k}={v:.2f}" for k, v in self.signals.items() if v is not None)
+
+    async def run(self, vision_getter):
+        """Sampling loop (asyncio task in the worker). Loop lag = how late the sleep wakes up."""
+        loop = asyncio.get_running_loop()
+        psutil.cpu_percent(interval=None)  # Prime: the first call has no reference point
+        while True:
+            started = loop.time()
+            await asyncio.sleep(SAMPLE_INTERVAL)
+            lag = max(0.0, loop.time() - started - SAMPLE_INTERVAL)
+            vision = vision_getter()
+            depth = vision.result_queue_depth() if hasattr(vision, "result_queue_depth") else None
+            try:
+                tier = self.sample(loop_lag=lag, vision_queue=depth)
+                if self.apply: self.apply(tier)
+            except Exception as e:
+                print(f"⚠️ Load Control Error: {e}")
+
+# ==========================================
+# SESSION VIEW
+# ==========================================
+class SessionQuality:
+    """A session's side of the current tier: frame pacing, STT policy and tier-change notices."""
+    def __init__(self, controller):
+        self.controller = controller
+        self.applied = None
+        self._next_frame = 0.0
+
+    @property
+    def tier(self):
+        return self.controller.tier
+
+    def poll(self):
+        """Returns: the tier if it changed since the last poll (tell the client), else None."""
+        tier = self.tier
+        if tier is self.applied: return None
+        self.applied = tier
+        return tier
+
+    def frame_due(self):
+        """Paces frames handed to vision to the tier's vision_fps."""
+        fps = self.tier.vision_fps
+        if fps is None: return True
+        now = time.time()
+        if now < self._next_frame: return False
+        self._next_frame = now + 1.0 / fps
+        return True
+
+    def apply_ears(self, ears):
+        ears.force_greedy = self.tier.stt == "greedy"
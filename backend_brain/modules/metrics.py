@@ -0,0 +1,207 @@
+import os
+import time
+import threading
+from collections import deque
+from prometheus_client import (
+    Histogram, Counter, CollectorRegistry, REGISTRY, generate_latest, CONTENT_TYPE_LATEST
+)
+from prometheus_client.core import GaugeMetricFamily, CounterMetricFamily
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Under gunicorn set PROMETHEUS_MULTIPROC_DIR (an empty directory) so histograms are
+# aggregated across workers; runtime gauges are reported per worker (label "worker").
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+VISION_MODELS = ("face_mesh", "pose", "hands", "yolo", "identity", "emotion")
+
+# ==========================================
+# HISTOGRAMS (hot path: one observe() per stage call)
+# ==========================================
+VAD_SECONDS = Histogram(
+    "avaani_vad_seconds", "Silero VAD inference per audio chunk",
+    buckets=(0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1)
+)
+STT_SECONDS = Histogram(
+    "avaani_stt_seconds", "Whisper transcription per utterance",
+    buckets=(0.05, 0.1, 0.2, 0.35, 0.5, 0.75, 1.0, 1.5, 2.5, 5.0)
+)
+STT_PATHS = Counter(
+    "avaani_stt_path", "Utterances by STT decoding path (greedy, small_greedy, beam, ...+beam fallback)", ["path"]
+)
+SPECULATIONS = Counter(
+    "avaani_speculation", "Speculative transcripts taken at a pause, by outcome (committed at endpoint / cancelled by resumed speech)", ["outcome"]
+)
+SPECULATION_WASTED_SECONDS = Counter(
+    "avaani_speculation_wasted_seconds", "Compute spent on cancelled speculations", ["stage"]
+)
+INTENT_ROUTES = Counter(
+    "avaani_intent_route", "Turns by route: a fast-path intent answered locally, or \"llm\"", ["route"]
+)
+ECHO_CHUNKS = Counter(
+    "avaani_echo_chunks", "Mic chunks overlapping Avaani's own audio: gated (silenced as echo) or cancelled (residual kept)", ["action"]
+)
+LLM_SECONDS = Histogram(
+    "avaani_llm_seconds", "LLM completion (full reply)",
+    buckets=(0.1, 0.2, 0.35, 0.5, 0.75, 1.0, 1.5, 2.5, 5.0, 10.0)
+)
+TTS_FIRST_CHUNK_SECONDS = Histogram(
+    "avaani_tts_first_chunk_seconds", "Reply text ready -> first TTS audio chunk",
+    buckets=(0.02, 0.05, 0.1, 0.2, 0.35, 0.5, 0.75, 1.0, 2.0)
+)
+TTS_PLAYOUTS = Counter(
+    "avaani_tts_playout", "Spoken replies by outcome (completed, error, cancelled by a new turn / interrupt / disconnect)", ["outcome"]
+)
+TTS_UNDERRUNS = Counter(
+    "avaani_tts_underrun", "Reply audio that arrived after the client's buffer ran dry (synthesis behind playback)"
+)
+TURN_SECONDS = Histogram(
+    "avaani_turn_seconds", "End of user speech -> first reply audio chunk",
+    buckets=(0.25, 0.5, 0.75, 1.0, 1.25, 1.5, 2.0, 2.5, 3.0, 4.0, 6.0)
+)
+LLM_PROVIDER_SECONDS = Histogram(
+    "avaani_llm_provider_seconds", "Successful completion per LLM provider", ["provider"],
+    buckets=(0.1, 0.2, 0.35, 0.5, 0.75, 1.0, 1.5, 2.5, 5.0, 10.0)
+)
+LLM_PROVIDER_REQUESTS = Counter(
+    "avaani_llm_provider_requests", "LLM provider calls by outcome (ok, error, rejected by open circuit, circuit_opened)", ["provider", "outcome"]
+)
+LLM_HEDGES = Counter(
+    "avaani_llm_hedges", "Hedged LLM requests fired after the p95 delay, and how many of them won", ["outcome"]
+)
+VISION_INFERENCE_SECONDS = Histogram(
+    "avaani_vision_inference_seconds", "Per-model vision inference", ["model"],
+    buckets=(0.002, 0.005, 0.01, 0.02, 0.035, 0.05, 0.075, 0.1, 0.2, 0.5, 1.0)
+)
+INFERENCE_BATCH_SIZE = Histogram(
+    "avaani_inference_batch_size", "Requests per batched model call (see inference_queue)", ["model"],
+    buckets=(1, 2, 3, 4, 6, 8, 12, 16, 32)
+)
+INFERENCE_BATCH_WAIT_SECONDS = Histogram(
+    "avaani_inference_batch_wait_seconds", "Request queued -> its batch starts running", ["model"],
+    buckets=(0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25)
+)
+
+# Vision observations made in the worker process are queued here as (kind, model, value) and
+# shipped to the server process with each snapshot (see vision_process), instead of a registry nobody scrapes.
+_forwarded = None
+_FORWARDABLE = {
+    "inference": VISION_INFERENCE_SECONDS,
+    "batch_size": INFERENCE_BATCH_SIZE,
+    "batch_wait": INFERENCE_BATCH_WAIT_SECONDS
+}
+
+def forward_vision_metrics():
+    """Called in the vision worker process: queue observations for the parent."""
+    global _forwarded
+    _forwarded = deque(maxlen=4096)
+
+def _observe(kind, model, value):
+    if _forwarded is not None:
+        _forwarded.append((kind, model, value))
+    else:
+        _FORWARDABLE[kind].labels(model).observe(value)
+
+def observe_vision(model, seconds):
+    _observe("inference", model, seconds)
+
+def observe_batch(model, size, waits):
+    """One batched call: its size and how long each of its requests queued."""
+    _observe("batch_size", model, size)
+    for seconds in waits:
+        _observe("batch_wait", model, seconds)
+
+def drain_vision_metrics():
+    """Worker side: pops queued (kind, model, value) observations."""
+    items = []
+    while _forwarded:
+        items.append(_forwarded.popleft())
+    return items
+
+def replay_vision_metrics(items):
+    """Server side: records observations shipped back from the worker."""
+    for kind, model, value in items:
+        _FORWARDABLE[kind].labels(model).observe(value)
+
+# ==========================================
+# RUNTIME GAUGES (read at scrape time, nothing on the hot path)
+# ==========================================
+# key -> (kind, help). Values come from the source registered with set_runtime_source().
+RUNTIME_METRICS = {
+    "active_sessions": ("gauge", "Open WebSocket sessions"),
+    "max_sessions": ("gauge", "Session cap"),
+    "subsystems_ready": ("gauge", "Subsystems finished loading"),
+    "vision_fps": ("gauge", "Frames/sec processed by vision"),
+    "vision_frames_sent": ("counter", "Frames handed to vision"),
+    "vision_frames_processed": ("counter", "Frames vision finished"),
+    "vision_frames_dropped": ("counter", "Frames overwritten or rejected before vision saw them"),
+    "vision_worker_restarts": ("counter", "Vision worker process restarts"),
+    "vision_result_queue_depth": ("gauge", "Snapshots waiting in the vision result queue"),
+    "video_decode_buffer_bytes": ("gauge", "Undecoded video bytes queued across sessions"),
+    "video_frames_decoded": ("counter", "Compressed-stream frames decoded"),
+    "video_frames_skipped": ("counter", "Compressed-stream frames skipped or superseded"),
+    "frame_pyramid_hits": ("counter", "Pyramid level requests served from cache"),
+    "frame_pyramid_builds": ("counter", "Pyramid levels decoded/resized"),
+    "frame_pyramid_hit_ratio": ("gauge", "Pyramid level cache hit ratio"),
+    "quality_tier": ("gauge", "Load controller quality tier (0 = full quality)"),
+    "quality_tier_changes": ("counter", "Quality tier transitions"),
+    "event_loop_lag_seconds": ("gauge", "Event loop scheduling delay at the last load sample")
+}
+
+_runtime_source = None
+
+def set_runtime_source(fn):
+    """fn() -> {key: value} for any subset of RUNTIME_METRICS."""
+    global _runtime_source
+    _runtime_source = fn
+
+class RateTracker:
+    """Turns a monotonically increasing count into a per-second rate between reads."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last = None
+        self.rate = 0.0
+
+    def update(self, count):
+        now = time.time()
+        with self._lock:
+            if self._last is not None:
+                last_t, last_count = self._last
+                if now - last_t >= 0.5:
+                    self.rate = max(0.0, count - last_count) / (now - last_t)
+                    self._last = (now, count)
+            else:
+                self._last = (now, count)
+        return self.rate
+
+class RuntimeCollector:
+    def collect(self):
+        if _runtime_source is None: return
+        try:
+            stats = _runtime_source()
+        except Exception as e:
+            print(f"⚠️ Metrics Source Error: {e}")
+            return
+        worker = str(os.getpid())
+        for key, (kind, doc) in RUNTIME_METRICS.items():
+            value = stats.get(key)
+            if value is None: continue
+            family = CounterMetricFamily if kind == "counter" else GaugeMetricFamily
+            metric = family(f"avaani_{key}", doc, labels=["worker"])
+            metric.add_metric([worker], float(value))
+            yield metric
+
+_runtime_collector = RuntimeCollector()
+REGISTRY.register(_runtime_collector)
+
+def render():
+    """Prometheus text exposition for /metrics."""
+    if MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(_runtime_collector)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
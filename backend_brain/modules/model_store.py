@@ -0,0 +1,314 @@
+import os
+import sys
+import json
+import mmap
+import time
+import hashlib
+import zipfile
+import argparse
+import threading
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_DIR = os.path.abspath(os.getenv("AVAANI_MODEL_DIR", os.path.join(CURRENT_DIR, "../../models")))
+MANIFEST_PATH = os.path.abspath(os.getenv("AVAANI_MODEL_MANIFEST", os.path.join(CURRENT_DIR, "../model_manifest.json")))
+
+# Strict offline mode: never touch the network. Every artifact must already be on disk,
+# pinned in the manifest and match its checksum, or loading fails immediately.
+OFFLINE = os.getenv("AVAANI_OFFLINE") == "1"
+
+DOWNLOAD_CHUNK = 1024 * 1024      # Streamed to disk in 1 MB pieces (never held whole in memory)
+DOWNLOAD_TIMEOUT = 30             # Seconds per connect/read, not for the whole file
+VERIFIED_FILE = ".verified.json"  # (size, mtime) -> sha256 cache so boots don't rehash gigabytes
+
+if OFFLINE:
+    # huggingface_hub (used by faster-whisper) would otherwise check for model updates
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+class ModelStoreError(RuntimeError):
+    pass
+
+_lock = threading.Lock()
+_artifact_locks = {}
+_manifest = None
+_verified = None
+_repo_commits = {}                # Artifact name -> commit a moving ref resolved to when downloaded (X-Repo-Commit)
+MOVING_REF = "/resolve/main/"     # Hugging Face URLs that follow a branch; pinning swaps in the commit
+
+# ==========================================
+# MANIFEST
+# ==========================================
+def load_manifest():
+    """Returns: {artifact name: entry}. Entries carry group, path, url, size, sha256 (and optional unpack)."""
+    global _manifest
+    if _manifest is None:
+        with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        _manifest = {a["name"]: a for a in data["artifacts"]}
+    return _manifest
+
+def _save_manifest(artifacts):
+    tmp = f"{MANIFEST_PATH}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": 1, "artifacts": list(artifacts.values())}, f, indent=2)
+        f.write("\n")
+    os.replace(tmp, MANIFEST_PATH)
+
+def artifact(name):
+    try:
+        return load_manifest()[name]
+    except KeyError:
+        raise ModelStoreError(f"Unknown model artifact: {name}")
+
+def group(name):
+    """All artifacts belonging to a group (e.g. the four files of a Whisper model)."""
+    entries = [a for a in load_manifest().values() if a["group"] == name]
+    if not entries:
+        raise ModelStoreError(f"Unknown model group: {name}")
+    return entries
+
+def artifact_path(name):
+    """Absolute local path of an artifact (whether or not it exists yet)."""
+    return os.path.join(MODEL_DIR, artifact(name)["path"])
+
+def group_dir(name):
+    """Directory holding a group's files (for runtimes that load a model folder)."""
+    return os.path.dirname(os.path.join(MODEL_DIR, group(name)[0]["path"]))
+
+# ==========================================
+# VERIFICATION
+# ==========================================
+def open_mapped(path):
+    """Read-only memory map of a file. Pages come from the OS page cache, shared by every process."""
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def sha256_file(path):
+    if os.path.getsize(path) == 0:
+        return hashlib.sha256().hexdigest()
+    with open_mapped(path) as mm:
+        return hashlib.sha256(mm).hexdigest()
+
+def _verified_cache():
+    global _verified
+    if _verified is None:
+        try:
+            with open(os.path.join(MODEL_DIR, VERIFIED_FILE), "r", encoding="utf-8") as f:
+                _verified = json.load(f)
+        except (OSError, ValueError):
+            _verified = {}
+    return _verified
+
+def _remember(entry, st, digest):
+    with _lock:
+        cache = _verified_cache()
+        cache[entry["path"]] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest}
+        tmp = os.path.join(MODEL_DIR, f"{VERIFIED_FILE}.{os.getpid()}.tmp")
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(cache, f, indent=1)
+            os.replace(tmp, os.path.join(MODEL_DIR, VERIFIED_FILE))
+        except OSError:
+            pass  # Read-only store: verification still holds for this process
+
+def verify(entry, force=False):
+    """
+    Checks a local artifact against its manifest entry.
+    Hashes only when the file changed since it was last verified (or force=True).
+    Returns: sha256 of the file. Raises: ModelStoreError on mismatch.
+    """
+    path = os.path.join(MODEL_DIR, entry["path"])
+    st = os.stat(path)
+    if entry.get("size") is not None and st.st_size != entry["size"]:
+        raise ModelStoreError(f"{entry['name']}: size {st.st_size} != manifest {entry['size']} ({path})")
+
+    known = _verified_cache().get(entry["path"])
+    if not force and known and known["size"] == st.st_size and known["mtime_ns"] == st.st_mtime_ns:
+        digest = known["sha256"]
+    else:
+        digest = sha256_file(path)
+        _remember(entry, st, digest)
+
+    if entry.get("sha256") and digest != entry["sha256"]:
+        raise ModelStoreError(f"{entry['name']}: checksum mismatch ({path}). Delete it and run prefetch again.")
+    return digest
+
+# ==========================================
+# DOWNLOAD
+# ==========================================
+def download(entry):
+    """Streams one artifact to disk, hashing as it goes, then moves it into place atomically."""
+    if OFFLINE:
+        raise ModelStoreError(f"{entry['name']} is missing and AVAANI_OFFLINE=1 (run: python -m modules.model_store prefetch)")
+    import requests
+
+    path = os.path.join(MODEL_DIR, entry["path"])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.part"
+    digest = hashlib.sha256()
+    size = 0
+    print(f"⬇️ Downloading {entry['name']}...")
+    started = time.time()
+    try:
+        with requests.get(entry["url"], stream=True, timeout=DOWNLOAD_TIMEOUT) as r:
+            r.raise_for_status()
+            if r.headers.get("X-Repo-Commit"):
+                _repo_commits[entry["name"]] = r.headers["X-Repo-Commit"]
+            with open(tmp, "wb") as f:
+                for chunk in r.iter_content(chunk_size=DOWNLOAD_CHUNK):
+                    f.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+        digest = digest.hexdigest()
+        if entry.get("size") is not None and size != entry["size"]:
+            raise ModelStoreError(f"{entry['name']}: downloaded {size} bytes, manifest says {entry['size']}")
+        if entry.get("sha256") and digest != entry["sha256"]:
+            raise ModelStoreError(f"{entry['name']}: downloaded file does not match manifest checksum")
+        os.replace(tmp, path)
+    except Exception:
+        try: os.remove(tmp)
+        except OSError: pass
+        raise
+
+    _remember(entry, os.stat(path), digest)
+    print(f"   - {size / 1e6:.1f} MB in {time.time() - started:.1f}s")
+    return digest
+
+def _unpack(entry):
+    """Extracts a zip artifact once (dropping the archive's top-level folder). Returns: target dir."""
+    target = os.path.join(MODEL_DIR, entry["unpack"])
+    marker = os.path.join(target, ".unpacked")
+    if os.path.exists(marker): return target
+    archive = os.path.join(MODEL_DIR, entry["path"])
+    with zipfile.ZipFile(archive) as z:
+        for info in z.infolist():
+            parts = info.filename.split("/", 1)
+            if len(parts) < 2 or not parts[1]: continue
+            dest = os.path.normpath(os.path.join(target, parts[1]))
+            if not dest.startswith(target + os.sep): continue  # Never write outside the target
+            if info.is_dir():
+                os.makedirs(dest, exist_ok=True)
+            else:
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                with z.open(info) as src, open(dest, "wb") as out:
+                    out.write(src.read())
+    with open(marker, "w") as f:
+        f.write(entry.get("sha256") or "")
+    return target
+
+# ==========================================
+# LOADING API
+# ==========================================
+def ensure(name):
+    """
+    Returns the local path of an artifact (its unpacked folder for archives).
+    Online: downloads it if missing. Offline: it must exist and be pinned in the manifest.
+    Raises: ModelStoreError.
+    """
+    entry = artifact(name)
+    path = os.path.join(MODEL_DIR, entry["path"])
+    with _lock:
+        lock = _artifact_locks.setdefault(name, threading.Lock())
+    with lock:
+        if OFFLINE and not entry.get("sha256"):
+            raise ModelStoreError(f"{name} has no pinned sha256 in {MANIFEST_PATH}; offline loading requires one "
+                                  f"(python -m modules.model_store prefetch --pin, then commit the manifest)")
+        if os.path.exists(path):
+            verify(entry)
+        else:
+            download(entry)
+        if entry.get("unpack"):
+            return _unpack(entry)
+    return path
+
+def ensure_group(name):
+    """ensure() for every artifact of a group. Returns: list of paths."""
+    return [ensure(entry["name"]) for entry in group(name)]
+
+# ==========================================
+# CLI
+# ==========================================
+def prefetch(groups=None, pin=False):
+    """
+    Downloads (or re-verifies) every artifact of the given groups (all by default).
+    pin=True writes the checksums of unpinned artifacts into the manifest, for a maintainer
+    to review and commit (never done implicitly: a tracked manifest must not trust first use).
+    Returns: number of failures.
+    """
+    artifacts = load_manifest()
+    failures = 0
+    pinned = False
+    for entry in artifacts.values():
+        if groups and entry["group"] not in groups: continue
+        path = os.path.join(MODEL_DIR, entry["path"])
+        try:
+            digest = verify(entry, force=True) if os.path.exists(path) else download(entry)
+            if entry.get("unpack"):
+                _unpack(entry)
+            if pin and not entry.get("sha256"):
+                entry["sha256"] = digest
+                entry["size"] = os.path.getsize(path)
+                commit = _repo_commits.get(entry["name"])
+                if commit and MOVING_REF in entry["url"]:
+                    entry["url"] = entry["url"].replace(MOVING_REF, f"/resolve/{commit}/")
+                elif MOVING_REF in entry["url"]:
+                    print(f"⚠️ {entry['name']}: URL still follows main (file was already local; delete it and pin again to freeze it)")
+                pinned = True
+                print(f"📌 Pinned {entry['name']}: {digest}")
+            elif not entry.get("sha256"):
+                print(f"⚠️ {entry['name']} is unpinned (sha256 {digest})")
+            print(f"✅ {entry['name']}")
+        except Exception as e:
+            failures += 1
+            print(f"❌ {entry['name']}: {e}")
+    if pinned:
+        _save_manifest(artifacts)
+    return failures
+
+def unpinned(groups=None):
+    """Artifacts the manifest has no size/sha256 for: nothing verifies them, and offline boot refuses them."""
+    return [e["name"] for e in load_manifest().values()
+            if (not groups or e["group"] in groups) and not (e.get("sha256") and e.get("size") is not None)]
+
+def check(groups=None):
+    """
+    Full rehash of every local artifact against the manifest.
+    Unpinned artifacts count as failures (release gate: the committed manifest must pin everything).
+    Returns: number of failures.
+    """
+    failures = 0
+    for name in unpinned(groups):
+        print(f"❌ {name}: not pinned in {MANIFEST_PATH} (python -m modules.model_store prefetch --pin, then commit it)")
+        failures += 1
+    for entry in load_manifest().values():
+        if groups and entry["group"] not in groups: continue
+        path = os.path.join(MODEL_DIR, entry["path"])
+        if not os.path.exists(path):
+            print(f"❌ {entry['name']}: missing ({path})")
+            failures += 1
+            continue
+        try:
+            verify(entry, force=True)
+            if entry.get("sha256"): print(f"✅ {entry['name']}")
+        except ModelStoreError as e:
+            print(f"❌ {e}")
+            failures += 1
+    return failures
+
+if __name__ == "__main__":
+    # Usage (from backend_brain/):
+    #   python -m modules.model_store prefetch [group ...]
+    #   python -m modules.model_store prefetch --pin    # maintainers: record checksums, then commit the manifest
+    #   python -m modules.model_store verify [group ...]         # exit 1 on missing, mismatched or unpinned artifacts
+    parser = argparse.ArgumentParser(description="Avaani model artifact store")
+    parser.add_argument("command", choices=["prefetch", "verify"])
+    parser.add_argument("groups", nargs="*", help="Artifact groups (default: all)")
+    parser.add_argument("--pin", action="store_true", help="Write checksums of unpinned artifacts into the manifest")
+    args = parser.parse_args()
+
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    if args.command == "prefetch":
+        sys.exit(1 if prefetch(args.groups, pin=args.pin) else 0)
+    sys.exit(1 if check(args.groups) else 0)
@@ -1,64 +1,134 @@
 import os
+import json
 import numpy as np
-import requests
 import asyncio
+import multiprocessing as mp
+from collections import OrderedDict
+import onnxruntime as ort
 from kokoro_onnx import Kokoro
+from modules import model_store
 
 # ==========================================
 # CONFIGURATION
 # ==========================================
-KOKORO_MODEL_URL = "https://github.com/thewh1teagle/kokoro-onnx/releases/download/model-files-v1.0/kokoro-v1.0.int8.onnx"
-VOICES_FILE_URL = "https://github.com/thewh1teagle/kokoro-onnx/releases/download/model-files-v1.0/voices-v1.0.bin"
+# Files, URLs and checksums live in model_manifest.json (group "kokoro")
+MODEL_PATH = model_store.artifact_path("kokoro-model")
+VOICES_PATH = model_store.artifact_path("kokoro-voices")
 
-# Path: backend_brain/models/
-MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../models")
-MODEL_PATH = os.path.join(MODEL_DIR, "kokoro-v1.0.int8.onnx")
-VOICES_PATH = os.path.join(MODEL_DIR, "voices-v1.0.bin")
+PHRASE_CACHE_SIZE = 64  # Synthesized fixed phrases kept in memory (fast-path intent replies)
+
+# Pre-fork weight sharing: the graph is converted once to ORT format, the only format ONNX Runtime
+# can run straight from the caller's buffer. The master reads it, and every worker's session uses the
+# weights in place (no prepacking copy), so they stay copy-on-write pages shared by all workers.
+SHARED_WEIGHTS = os.getenv("AVAANI_TTS_SHARED_WEIGHTS", "1") == "1"
+ORT_MODEL_PATH = os.path.splitext(MODEL_PATH)[0] + ".ort"   # Derived from MODEL_PATH, rebuilt when it changes
+ORT_MAGIC = b"ORTM"                                          # Flatbuffer file identifier (bytes 4-8)
+
+def _convert_to_ort(src, dst):
+    """Child process: writes the ORT-format graph (portable optimizations only, no CPU-specific layouts)."""
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+    options.optimized_model_filepath = dst
+    options.add_session_config_entry("session.save_model_format", "ORT")
+    ort.InferenceSession(src, options, providers=["CPUExecutionProvider"])
+
+def _ort_model():
+    """Returns: path of the ORT-format graph, converting it first if missing or stale."""
+    stamp = {"sha256": model_store.verify(model_store.artifact("kokoro-model")), "onnxruntime": ort.__version__}
+    stamp_path = f"{ORT_MODEL_PATH}.json"
+    try:
+        with open(stamp_path, "r", encoding="utf-8") as f:
+            if json.load(f) == stamp and os.path.exists(ORT_MODEL_PATH):
+                return ORT_MODEL_PATH
+    except (OSError, ValueError):
+        pass
+    print("   - Converting Kokoro to ORT format (once)...")
+    # Own process: the master must not own ONNX Runtime threads when gunicorn forks
+    tmp = f"{ORT_MODEL_PATH}.{os.getpid()}.tmp"
+    proc = mp.get_context("spawn").Process(target=_convert_to_ort, args=(MODEL_PATH, tmp), name="kokoro-convert")
+    proc.start()
+    proc.join()
+    if proc.exitcode != 0 or not os.path.exists(tmp):
+        raise RuntimeError(f"conversion exited with {proc.exitcode}")
+    os.replace(tmp, ORT_MODEL_PATH)
+    with open(stamp_path, "w", encoding="utf-8") as f:
+        json.dump(stamp, f)
+    return ORT_MODEL_PATH
+
+def read_model_bytes():
+    """
+    Pre-fork: reads the Kokoro graph once for every worker (ORT format when SHARED_WEIGHTS).
+    Keep the returned bytes alive and unmodified: worker sessions run on them in place.
+    """
+    Mouth._ensure_models()
+    path = MODEL_PATH
+    if SHARED_WEIGHTS:
+        try:
+            path = _ort_model()
+        except Exception as e:
+            print(f"⚠️ Kokoro ORT conversion failed ({e}): workers will each copy the weights")
+    with open(path, "rb") as f:
+        return f.read()
+
+def _session_options(model_bytes):
+    options = ort.SessionOptions()
+    if model_bytes[4:8] == ORT_MAGIC:
+        # Run on the preloaded buffer itself: shared pages instead of a per-worker copy
+        options.add_session_config_entry("session.use_ort_model_bytes_directly", "1")
+        options.add_session_config_entry("session.use_ort_model_bytes_for_initializers", "1")
+        options.add_session_config_entry("session.disable_prepacking", "1")
+    return options
 
 # VOICE OPTIONS:
 # 'af_sarah' (Recommended), 'af_bella', 'am_michael', 'bf_emma', 'bm_george'
 
 class Mouth:
-    def __init__(self, voice="af_sarah", speed=1.0):
+    def __init__(self, voice="af_sarah", speed=1.0, model_bytes=None):
+        """model_bytes: preloaded graph from read_model_bytes(); the session is built from (and, in ORT format, runs on) it."""
         print("👄 Initializing Avaani Mouth (Server Streaming Mode)...")
         
         self.voice = voice
         self.speed = speed
+        self.phrase_cache = OrderedDict()  # (text, voice, speed) -> [(pcm_bytes, sample_rate)]
+        self.model_bytes = model_bytes     # Must outlive the session when it runs on the buffer in place
         
         # 1. Ensure Model Files Exist
         self._ensure_models()
         
         # 2. Load Model
         try:
-            self.kokoro = Kokoro(MODEL_PATH, VOICES_PATH)
+            if model_bytes is not None:
+                session = ort.InferenceSession(model_bytes, _session_options(model_bytes), providers=["CPUExecutionProvider"])
+                self.kokoro = Kokoro.from_session(session, VOICES_PATH)
+            else:
+                self.kokoro = Kokoro(MODEL_PATH, VOICES_PATH)
             print(f"✅ TTS Model Loaded. Voice: {self.voice}")
         except Exception as e:
             print(f"❌ Error loading Kokoro: {e}")
             self.kokoro = None
 
-    def _ensure_models(self):
-        """Downloads the lightweight ONNX models if missing."""
-        if not os.path.exists(MODEL_DIR):
-            os.makedirs(MODEL_DIR)
-        
-        if not os.path.exists(MODEL_PATH):
-            print("⬇️ Downloading Kokoro Model (80MB)...")
-            r = requests.get(KOKORO_MODEL_URL)
-            with open(MODEL_PATH, "wb") as f: f.write(r.content)
-            
-        if not os.path.exists(VOICES_PATH):
-            print("⬇️ Downloading Voices File...")
-            r = requests.get(VOICES_FILE_URL)
-            with open(VOICES_PATH, "wb") as f: f.write(r.content)
-
-    async def generate_stream(self, text):
+    @staticmethod
+    def _ensure_models():
+        """Verifies the ONNX model and voices (streamed download if missing, unless offline)."""
+        model_store.ensure_group("kokoro")
+
+    async def generate_stream(self, text, cache=False):
         """
         Async Generator for Server.
+        cache: keep/reuse the synthesized audio (for replies that repeat verbatim).
         Yields: (pcm_bytes, sample_rate)
         """
         if not text or not self.kokoro:
             return
 
+        key = (text, self.voice, self.speed)
+        if cache and key in self.phrase_cache:
+            self.phrase_cache.move_to_end(key)
+            for chunk in self.phrase_cache[key]:
+                yield chunk
+            return
+        chunks = [] if cache else None
+
         try:
             # Create stream from Kokoro
             stream = self.kokoro.create_stream(
@@ -73,9 +143,15 @@ class Mouth:
                 # CONVERSION: Float32 (-1.0 to 1.0) -> Int16 PCM (-32768 to 32767)
                 # This is the standard format for browsers and raw audio players.
                 pcm_data = (samples * 32767).astype(np.int16).tobytes()
+                if chunks is not None: chunks.append((pcm_data, sample_rate))
                 
                 yield pcm_data, sample_rate
 
+            if chunks:
+                self.phrase_cache[key] = chunks
+                if len(self.phrase_cache) > PHRASE_CACHE_SIZE:
+                    self.phrase_cache.popitem(last=False)
+
         except Exception as e:
             print(f"❌ Audio Generation Error: {e}")
 
@@ -0,0 +1,91 @@
+import os
+import re
+import asyncio
+from modules.metrics import TTS_UNDERRUNS
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+LOOKAHEAD_SEGMENTS = int(os.getenv("AVAANI_TTS_LOOKAHEAD", "1"))  # Sentences synthesized ahead of the one being sent
+TARGET_LEAD = float(os.getenv("AVAANI_TTS_LEAD_MS", "300")) / 1000.0  # Audio the client holds ahead of its playhead
+SLICE_SECONDS = 0.25              # Max audio per audio_chunk packet (pacing granularity)
+MIN_SEGMENT_CHARS = 24            # Shorter sentences are joined to the next (fewer, fuller TTS calls)
+SENTENCE_END = re.compile(r"(?<=[.!?;:])\s+")
+BYTES_PER_SAMPLE = 2              # Int16 PCM
+
+_SEGMENT_END = object()
+
+def split_segments(text):
+    """Reply text -> sentence-sized synthesis units, in order."""
+    segments = []
+    for sentence in SENTENCE_END.split(text.strip()):
+        if segments and len(segments[-1]) < MIN_SEGMENT_CHARS:
+            segments[-1] = f"{segments[-1]} {sentence}"
+        elif sentence:
+            segments.append(sentence)
+    return segments
+
+# ==========================================
+# PLAYOUT (one per spoken reply)
+# ==========================================
+class PlayoutScheduler:
+    """
+    Speaks one reply: synthesizes it segment by segment at most `lookahead` segments ahead of
+    the one being sent, and sends audio at real time plus `lead` seconds of client buffer.
+    Each send is awaited, so a slow socket holds back sending and, through the lookahead
+    bound, synthesis. Cancelling the task running play() stops both at once.
+
+    synthesize(text): async iterator of (pcm_bytes, sample_rate)
+    send(pcm_bytes, sample_rate): coroutine delivering one audio_chunk
+    """
+    def __init__(self, synthesize, send, lookahead=LOOKAHEAD_SEGMENTS, lead=TARGET_LEAD):
+        self.synthesize = synthesize
+        self.send = send
+        self.lookahead = lookahead
+        self.lead = lead
+        self.sent_seconds = 0.0
+        self.underruns = 0
+        self._play_until = None   # Loop time the client runs out of audio (playback assumed to start on arrival)
+
+    async def play(self, text):
+        queue = asyncio.Queue()
+        slots = asyncio.Semaphore(self.lookahead + 1)  # The segment being sent + lookahead
+        producer = asyncio.create_task(self._produce(split_segments(text), queue, slots))
+        try:
+            await self._consume(queue, slots)
+        finally:
+            producer.cancel()  # Cancellation: no further synthesis for this reply
+        await producer  # Surfaces synthesis errors
+
+    async def _produce(self, segments, queue, slots):
+        try:
+            for segment in segments:
+                await slots.acquire()
+                async for pcm, sample_rate in self.synthesize(segment):
+                    queue.put_nowait((pcm, sample_rate))
+                queue.put_nowait(_SEGMENT_END)
+        finally:
+            queue.put_nowait(None)
+
+    async def _consume(self, queue, slots):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await queue.get()
+            if item is None: return
+            if item is _SEGMENT_END:
+                slots.release()
+                continue
+            pcm, sample_rate = item
+            if self._play_until is not None and loop.time() > self._play_until:
+                self.underruns += 1  # Synthesis fell behind playback: the client heard a gap
+                TTS_UNDERRUNS.inc()
+            step = int(SLICE_SECONDS * sample_rate) * BYTES_PER_SAMPLE
+            for offset in range(0, len(pcm), step):
+                piece = pcm[offset:offset + step]
+                if self._play_until is not None:
+                    wait = self._play_until - loop.time() - self.lead
+                    if wait > 0: await asyncio.sleep(wait)
+                await self.send(piece, sample_rate)
+                seconds = len(piece) / BYTES_PER_SAMPLE / sample_rate
+                self._play_until = max(self._play_until or 0.0, loop.time()) + seconds
+                self.sent_seconds += seconds
@@ -0,0 +1,82 @@
+import threading
+import time
+
+# ==========================================
+# SUBSYSTEM REGISTRY
+# ==========================================
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+class Subsystem:
+    def __init__(self, name, loader):
+        self.name = name
+        self.loader = loader
+        self.state = PENDING
+        self.value = None
+        self.error = None
+        self.load_time = None
+        self.loaded = threading.Event()
+
+class SubsystemRegistry:
+    """
+    Loads server subsystems (brain, ears, mouth, vision, auth) concurrently in background
+    threads, so the app can bind immediately and features come online as their models finish.
+    Loaders do their own heavy imports, keeping them off the module import path.
+    """
+    def __init__(self):
+        self._subsystems = {}
+        self._lock = threading.Lock()
+        self._started = False
+        self.started_at = None
+
+    def register(self, name, loader):
+        self._subsystems[name] = Subsystem(name, loader)
+
+    def start(self):
+        """Starts every loader in its own thread. Safe to call more than once."""
+        with self._lock:
+            if self._started: return
+            self._started = True
+            self.started_at = time.time()
+        for sub in self._subsystems.values():
+            threading.Thread(target=self._load, args=(sub,), name=f"load-{sub.name}", daemon=True).start()
+
+    def _load(self, sub):
+        sub.state = LOADING
+        started = time.time()
+        try:
+            sub.value = sub.loader()
+            sub.state = READY
+            print(f"✅ Subsystem '{sub.name}' ready in {time.time() - started:.1f}s")
+        except Exception as e:
+            sub.error = str(e)
+            sub.state = FAILED
+            print(f"❌ Subsystem '{sub.name}' failed: {e}")
+        finally:
+            sub.load_time = round(time.time() - started, 3)
+            sub.loaded.set()
+
+    def get(self, name):
+        """Returns the loaded object, or None while it is still loading (or failed)."""
+        sub = self._subsystems[name]
+        return sub.value if sub.state == READY else None
+
+    def pending(self, *names):
+        """Names (of those given) that are not ready yet."""
+        return [n for n in names if self._subsystems[n].state != READY]
+
+    def wait(self, name, timeout=None):
+        self._subsystems[name].loaded.wait(timeout)
+        return self.get(name)
+
+    @property
+    def all_ready(self):
+        return all(sub.state == READY for sub in self._subsystems.values())
+
+    def status(self):
+        return {
+            name: {"state": sub.state, "load_time": sub.load_time, "error": sub.error}
+            for name, sub in self._subsystems.items()
+        }
@@ -0,0 +1,152 @@
+import os
+import json
+import time
+import threading
+from collections import deque
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+TRACE_DIR = os.getenv("AVAANI_TRACE_DIR", os.path.join(CURRENT_DIR, "../traces"))
+TRACE_BUFFER_EVENTS = int(os.getenv("AVAANI_TRACE_BUFFER", "50000"))  # Per session; oldest events are dropped
+
+def now_us():
+    """Wall clock in microseconds (comparable across the server and vision worker processes)."""
+    return time.time_ns() // 1000
+
+# ==========================================
+# SESSION TRACER
+# ==========================================
+class _NoopSpan:
+    def __enter__(self): return self
+    def __exit__(self, *exc): return False
+    def set(self, **args): pass
+
+_NOOP = _NoopSpan()
+
+class _Span:
+    __slots__ = ("tracer", "name", "cat", "args", "start")
+
+    def __init__(self, tracer, name, cat, args):
+        self.tracer, self.name, self.cat, self.args = tracer, name, cat, args
+
+    def __enter__(self):
+        self.start = now_us()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.complete(self.name, self.start, now_us() - self.start, self.cat, self.args)
+        return False
+
+    def set(self, **args):
+        """Attach results known only at the end of the span (e.g. VAD probability)."""
+        self.args = {**(self.args or {}), **args}
+
+class SessionTracer:
+    """
+    Records Chrome trace-format events for one WebSocket session into a bounded ring,
+    so it can be left on in production.
+    Disabled tracers hand out a shared no-op span: the hot path cost is one attribute check.
+    """
+    def __init__(self, session_id, capacity=TRACE_BUFFER_EVENTS):
+        self.session_id = session_id
+        self.enabled = False
+        self.events = deque(maxlen=capacity)
+        self.recorded = 0
+        self.started_at = None
+        self.info = {}
+        self._threads = {}
+
+    def start(self):
+        self.events.clear()
+        self.recorded = 0
+        self.started_at = time.time()
+        self.enabled = True
+
+    def stop(self):
+        self.enabled = False
+
+    @property
+    def dropped(self):
+        return self.recorded - len(self.events)
+
+    def span(self, name, cat="server", **args):
+        if not self.enabled: return _NOOP
+        return _Span(self, name, cat, args or None)
+
+    def complete(self, name, start_us, dur_us, cat="server", args=None, pid=None, tid=None):
+        if not self.enabled: return
+        if tid is None:
+            tid = threading.get_native_id()
+            if tid not in self._threads:
+                self._threads[tid] = threading.current_thread().name
+        event = {"name": name, "cat": cat, "ph": "X", "ts": start_us, "dur": dur_us,
+                 "pid": pid or os.getpid(), "tid": tid}
+        if args: event["args"] = args
+        self.events.append(event)
+        self.recorded += 1
+
+    def instant(self, name, cat="server", **args):
+        if not self.enabled: return
+        tid = threading.get_native_id()
+        if tid not in self._threads:
+            self._threads[tid] = threading.current_thread().name
+        event = {"name": name, "cat": cat, "ph": "i", "s": "t", "ts": now_us(), "pid": os.getpid(), "tid": tid}
+        if args: event["args"] = args
+        self.events.append(event)
+        self.recorded += 1
+
+    def to_json(self):
+        """Chrome/Perfetto trace object (load in chrome://tracing or ui.perfetto.dev)."""
+        pid = os.getpid()
+        meta = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": f"avaani-server ({pid})"}}]
+        meta += [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                 for tid, name in list(self._threads.items())]
+        for worker_pid in {e["pid"] for e in list(self.events) if e["pid"] != pid}:
+            meta.append({"name": "process_name", "ph": "M", "pid": worker_pid, "args": {"name": f"avaani-vision ({worker_pid})"}})
+        return {
+            "traceEvents": meta + list(self.events),
+            "displayTimeUnit": "ms",
+            "metadata": {"session": self.session_id, "started_at": self.started_at,
+                         "dropped_events": self.dropped, **self.info}
+        }
+
+    def dump(self, directory=TRACE_DIR):
+        """Writes the buffer to {directory}/avaani-{session}-{time}.json. Returns: path."""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"avaani-{self.session_id}-{int(time.time())}.json")
+        with open(path, "w") as f:
+            json.dump(self.to_json(), f)
+        return path
+
+# Stand-in for components created without a session (benchmarks, tools)
+NULL_TRACER = SessionTracer("none", capacity=1)
+
+# ==========================================
+# SESSION REGISTRY (this worker's open sessions)
+# ==========================================
+_sessions = {}
+_lock = threading.Lock()
+
+def register(tracer):
+    with _lock: _sessions[tracer.session_id] = tracer
+
+def unregister(tracer):
+    with _lock: _sessions.pop(tracer.session_id, None)
+
+def get(session_id):
+    return _sessions.get(session_id)
+
+def sessions():
+    with _lock: return list(_sessions.values())
+
+def any_enabled():
+    return any(t.enabled for t in sessions())
+
+def broadcast(events):
+    """Adds shared events (vision worker ticks) to every tracing session. events: list of complete-event tuples."""
+    active = [t for t in sessions() if t.enabled]
+    for tracer in active:
+        for name, start_us, dur_us, cat, args, pid in events:
+            tracer.complete(name, start_us, dur_us, cat, args, pid=pid, tid=pid)
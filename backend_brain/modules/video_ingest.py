@@ -0,0 +1,162 @@
+import threading
+import time
+import weakref
+import av
+from modules.frame_pyramid import FramePyramid
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Container formats a client may stream (MediaRecorder WebM, raw Annex-B H.264, IVF VP8)
+SUPPORTED_FORMATS = {"webm", "matroska", "h264", "ivf"}
+
+VIDEO_DECODE_FPS = 15             # Max frames/sec handed to vision (extra frames are skipped at decode)
+VIDEO_MAX_BUFFER = 8 * 1024 * 1024  # Undecoded bytes allowed to queue before the stream is reset
+
+# ==========================================
+# VIDEO STREAM DECODER
+# ==========================================
+class VideoStreamDecoder:
+    """
+    Per-session decoder for a compressed video stream sent in chunks.
+    The client appends container bytes with feed(); a background thread demuxes and
+    decodes them with PyAV. Only the newest decoded frame is kept, and it is scaled and
+    colour-converted only to the pyramid levels vision actually asks for.
+    Rate gating uses presentation time, not decode time (a chunk decodes in a burst):
+    frames closer than 1/VIDEO_DECODE_FPS to the last kept one are dropped, and a newer frame
+    replaces one vision has not picked up yet, so vision always gets the newest picture.
+    While a frame is waiting, or packets come faster than VIDEO_DECODE_FPS, the codec skips
+    non-reference frames so no work goes into pictures vision would never see.
+    """
+    # Process-wide totals and live decoders (read by /metrics)
+    total_decoded = 0
+    total_skipped = 0
+    live = weakref.WeakSet()
+
+    def __init__(self, container_format="webm", max_fps=VIDEO_DECODE_FPS):
+        if container_format not in SUPPORTED_FORMATS:
+            raise ValueError(f"Unsupported video stream format: {container_format}")
+        self.container_format = container_format
+        self.min_interval = 1.0 / max_fps
+
+        self._cond = threading.Condition()
+        self._buffer = bytearray()
+        self._closed = False
+        self._failed = False
+
+        self._latest = None        # av.VideoFrame (not yet converted)
+        self._latest_seq = 0
+        self._consumed_seq = 0
+        self._last_kept = None     # Presentation time (s) of the last kept frame
+
+        self.frames_decoded = 0
+        self.frames_skipped = 0
+        VideoStreamDecoder.live.add(self)
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    # --- Producer side (WebSocket handler) ---
+    def feed(self, data):
+        """
+        Appends a chunk of the compressed stream.
+        Returns: False if the stream is unusable (decoder failed or buffer overflow) and should be reset.
+        """
+        with self._cond:
+            if self._closed or self._failed: return False
+            if len(self._buffer) + len(data) > VIDEO_MAX_BUFFER:
+                self._failed = True
+                self._cond.notify_all()
+                return False
+            self._buffer.extend(data)
+            self._cond.notify_all()
+        return True
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def healthy(self):
+        return not self._failed
+
+    @property
+    def buffered_bytes(self):
+        return len(self._buffer)
+
+    # --- Consumer side (vision) ---
+    def latest_frame(self):
+        """Returns: newest decoded frame as a FramePyramid, or None if nothing new since last call."""
+        with self._cond:
+            if self._latest is None or self._latest_seq == self._consumed_seq:
+                return None
+            frame = self._latest
+            self._consumed_seq = self._latest_seq
+        return FramePyramid.from_av_frame(frame)
+
+    # --- File-like interface for av.open ---
+    def read(self, size=-1):
+        with self._cond:
+            while not self._buffer and not self._closed and not self._failed:
+                self._cond.wait()
+            if not self._buffer or self._failed:
+                return b""
+            if size is None or size < 0 or size > len(self._buffer):
+                size = len(self._buffer)
+            data = bytes(self._buffer[:size])
+            del self._buffer[:size]
+            return data
+
+    # --- Decode Thread ---
+    @staticmethod
+    def _media_time(obj):
+        """Presentation time (s) of a packet or frame; wall clock if the stream has no timestamps."""
+        if obj.pts is None or obj.time_base is None:
+            return time.time()
+        return float(obj.pts * obj.time_base)
+
+    def _too_soon(self, t):
+        return self._last_kept is not None and 0 <= t - self._last_kept < self.min_interval
+
+    def _run(self):
+        container = None
+        try:
+            container = av.open(self, mode="r", format=self.container_format)
+            stream = container.streams.video[0]
+            stream.thread_type = "AUTO"
+            codec = stream.codec_context
+
+            for packet in container.demux(stream):
+                if self._closed: break
+                with self._cond:
+                    backlog = self._latest_seq != self._consumed_seq
+                too_soon = self._too_soon(self._media_time(packet))
+                # Reference frames must still be decoded to keep the picture intact
+                codec.skip_frame = "NONREF" if (backlog or too_soon) else "DEFAULT"
+
+                for frame in packet.decode():
+                    self.frames_decoded += 1
+                    VideoStreamDecoder.total_decoded += 1
+                    t = self._media_time(frame)
+                    with self._cond:
+                        waiting = self._latest_seq != self._consumed_seq
+                        if not waiting and self._too_soon(t):
+                            self.frames_skipped += 1
+                            VideoStreamDecoder.total_skipped += 1
+                            continue
+                        if waiting:
+                            self.frames_skipped += 1   # Replaced by a newer frame before vision picked it up
+                            VideoStreamDecoder.total_skipped += 1
+                        self._latest = frame
+                        self._latest_seq += 1
+                    self._last_kept = t
+        except Exception as e:
+            if not self._closed:
+                print(f"❌ Video Stream Decode Error: {e}")
+                with self._cond:
+                    self._failed = True
+        finally:
+            if container is not None:
+                try: container.close()
+                except Exception: pass
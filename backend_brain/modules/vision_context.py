@@ -0,0 +1,48 @@
+import time
+from collections import namedtuple
+from types import MappingProxyType
+
+# ==========================================
+# SHARED VISION CONTEXT
+# ==========================================
+# Lightweight pieces shared by the in-process VisionSystem and the VisionProcess proxy.
+# Kept free of model imports so the server process can use them without loading any.
+
+# Immutable published context. `data` is a read-only mapping; nested values are
+# replaced (never mutated) by producers, so a snapshot never changes once published.
+ContextSnapshot = namedtuple("ContextSnapshot", ["version", "data"])
+
+FACE_POSES = 5  # Reference images per user: faces/{user_id}/pose_{i}.jpg
+
+def initial_context():
+    """Context packet before any frame has been processed."""
+    return {
+        "identity": "Stranger",
+        "emotion": "neutral",
+        "emotion_intensity": 0.0,
+        "state_confidence": 0.0,
+        "energy_level": 0.5,
+        "attention": 0.0,
+        "engagement": 0.0,
+        "gaze": {"score": 0.0, "vector": "averted"},
+        "tracking": {"x": 0.5, "y": 0.5, "z": 0.5, "visible": False},
+        "posture": {"inclination": 0.0, "facing_camera": False, "energy": 0.5},
+        "gestures": [],
+        "holding": [],
+        "surroundings": [],
+        "timestamp": time.time(),
+        "system_status": "active"
+    }
+
+def initial_snapshot():
+    return ContextSnapshot(0, MappingProxyType(initial_context()))
+
+def download_face_images(supabase_client, user_id):
+    """Downloads the user's reference poses from Supabase storage. Returns: list of JPEG bytes."""
+    images = []
+    for i in range(FACE_POSES):
+        try:
+            images.append(supabase_client.storage.from_("faces").download(f"{user_id}/pose_{i}.jpg"))
+        except Exception:
+            continue
+    return images
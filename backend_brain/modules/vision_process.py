@@ -0,0 +1,334 @@
+import os
+import time
+import queue
+import threading
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from types import MappingProxyType
+from collections import deque
+import numpy as np
+
+from modules.frame_pyramid import FramePyramid, LEVEL_DETECTOR, LEVEL_FULL
+from modules.vision_context import ContextSnapshot, initial_snapshot, download_face_images
+from modules.metrics import forward_vision_metrics, drain_vision_metrics, replay_vision_metrics
+from modules import tracing
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+RING_SLOTS = 4                    # Frames buffered in shared memory (writer overwrites the oldest)
+SLOT_BYTES = 1920 * 1080 * 3      # Max payload per slot (fits a raw 1080p BGR frame)
+
+HEARTBEAT_INTERVAL = 0.5          # Supervisor check period (seconds)
+STALL_TIMEOUT = 5.0               # Worker loop silent this long -> killed and restarted
+STARTUP_GRACE = 180.0             # Model loading time allowed before heartbeats are expected
+RESTART_BACKOFF = 2.0
+RESULT_QUEUE_SIZE = 64
+TRACE_TICKS = 512                 # Worker ticks buffered between snapshots while a session is tracing
+
+# Fresh interpreter: the worker is (re)started from a server that already runs threads (asyncio,
+# subsystem loaders, ORT/torch pools), and a fork of it can deadlock on a lock copied mid-use.
+START_METHOD = os.getenv("VISION_START_METHOD", "spawn")
+
+KIND_JPEG = 1
+KIND_BGR = 2
+_HEADER = np.dtype([("seq", "<u8"), ("kind", "<u4"), ("width", "<u4"), ("height", "<u4"), ("nbytes", "<u4")])
+
+# ==========================================
+# SHARED MEMORY FRAME RING
+# ==========================================
+class SharedFrameRing:
+    """
+    Fixed-size ring of frame slots in multiprocessing.shared_memory.
+    Single writer (server process), single reader (vision worker). Each slot header carries
+    the sequence number it holds; the writer zeroes it while copying and the reader re-checks
+    it after copying (seqlock), so a slot overwritten mid-read is simply skipped.
+    """
+    def __init__(self, latest, name=None, slots=RING_SLOTS, slot_bytes=SLOT_BYTES):
+        self.latest = latest          # mp.Value('Q'): newest published sequence number
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.stride = _HEADER.itemsize + slot_bytes
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=slots * self.stride)
+        self._headers = [np.ndarray((), dtype=_HEADER, buffer=self.shm.buf, offset=i * self.stride)
+                         for i in range(slots)]
+        self._payloads = [np.ndarray((slot_bytes,), dtype=np.uint8, buffer=self.shm.buf,
+                                     offset=i * self.stride + _HEADER.itemsize)
+                          for i in range(slots)]
+        self._write_lock = threading.Lock()
+        self._seq = 0
+        self.rejected = 0             # Frames too large for a slot
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def write(self, pyramid):
+        """Copies one frame into the next slot. Returns: sequence number, or 0 if it didn't fit."""
+        if pyramid.jpeg is not None:
+            kind, width, height = KIND_JPEG, pyramid.width, pyramid.height
+            payload = np.frombuffer(pyramid.jpeg, np.uint8)
+        else:
+            level = LEVEL_FULL if pyramid.width * pyramid.height * 3 <= self.slot_bytes else LEVEL_DETECTOR
+            img = np.ascontiguousarray(pyramid.get(level))
+            kind, width, height = KIND_BGR, img.shape[1], img.shape[0]
+            payload = img.reshape(-1)
+        if payload.size > self.slot_bytes:
+            self.rejected += 1
+            return 0
+
+        with self._write_lock:
+            self._seq += 1
+            seq = self._seq
+            slot = seq % self.slots
+            header = self._headers[slot]
+            header["seq"] = 0
+            self._payloads[slot][:payload.size] = payload
+            header["kind"], header["width"], header["height"], header["nbytes"] = kind, width, height, payload.size
+            header["seq"] = seq
+            self.latest.value = seq
+        return seq
+
+    def read(self, after_seq):
+        """Returns: (seq, FramePyramid) for the newest frame newer than `after_seq`, or None."""
+        seq = self.latest.value
+        if seq <= after_seq: return None
+        header = self._headers[seq % self.slots]
+        if int(header["seq"]) != seq: return None
+        kind, width, height, nbytes = int(header["kind"]), int(header["width"]), int(header["height"]), int(header["nbytes"])
+        data = self._payloads[seq % self.slots][:nbytes].copy()
+        if int(header["seq"]) != seq: return None  # Overwritten while copying
+        if kind == KIND_JPEG:
+            return seq, FramePyramid(width, height, jpeg=data.tobytes())
+        return seq, FramePyramid.from_bgr(data.reshape(height, width, 3))
+
+    def close(self):
+        self._headers = self._payloads = None
+        self.shm.close()
+        if self.owner:
+            try: self.shm.unlink()
+            except FileNotFoundError: pass
+
+# ==========================================
+# WORKER PROCESS
+# ==========================================
+def _vision_worker_main(shm_name, latest, heartbeat, trace_flag, commands, results):
+    """Child process: runs VisionSystem on frames from the ring and ships context snapshots back."""
+    from modules.eyes import VisionSystem
+
+    forward_vision_metrics()
+    FramePyramid.cache_hits = FramePyramid.cache_builds = 0  # Don't re-report the parent's counts
+    ring = SharedFrameRing(latest, name=shm_name)
+    vision = VisionSystem()
+    last_seq = latest.value
+    last_version = -1
+    frames = 0
+    ticks = deque(maxlen=TRACE_TICKS)
+    pid = os.getpid()
+
+    while True:
+        heartbeat.value = time.time()
+
+        try:
+            cmd = commands.get_nowait()
+        except queue.Empty:
+            cmd = None
+        if cmd is not None:
+            if cmd[0] == "stop": break
+            if cmd[0] == "detector":
+                vision.set_detector(cmd[1])
+            if cmd[0] == "load_user":
+                # Embedding generation takes seconds; keep the loop (and heartbeat) going
+                threading.Thread(target=vision.load_user_images, args=(cmd[2], cmd[1]), daemon=True).start()
+
+        item = ring.read(last_seq)
+        if item is not None:
+            last_seq, pyramid = item
+            started = tracing.now_us()
+            try:
+                vision.process_frame(pyramid)
+                frames += 1
+            except Exception as e:
+                print(f"⚠️ Vision Worker Frame Error: {e}")
+            if trace_flag.value:
+                ticks.append(("vision.tick", started, tracing.now_us() - started, "vision", {"seq": last_seq}, pid))
+        else:
+            time.sleep(0.005)
+
+        snapshot = vision.snapshot()
+        if snapshot.version != last_version:
+            last_version = snapshot.version
+            stats = {
+                "frames": frames,
+                "timings": drain_vision_metrics(),
+                "pyramid": (FramePyramid.cache_hits, FramePyramid.cache_builds),
+                "ticks": list(ticks)
+            }
+            ticks.clear()
+            try:
+                results.put_nowait((dict(snapshot.data), stats))
+            except queue.Full:
+                pass  # Parent is behind; the next snapshot supersedes this one (timings are dropped)
+
+    vision.stop()
+    ring.close()
+
+# ==========================================
+# VISION PROCESS (SERVER-SIDE PROXY)
+# ==========================================
+class VisionProcess:
+    """
+    Drop-in replacement for VisionSystem that runs all vision work in a child process.
+    process_frame() only copies the frame into shared memory, so MediaPipe, YOLO and
+    DeepFace never hold the server's GIL. Context snapshots come back over a queue and are
+    re-published locally with the same snapshot()/context/get_context_json() API.
+    A supervisor thread restarts the worker if it crashes or its loop stalls, and replays
+    the active user's biometrics into the new worker.
+    """
+    def __init__(self):
+        print("👁️ Starting Avaani Vision Worker Process...")
+        self._mp = mp.get_context(START_METHOD)
+        self._latest = self._mp.Value("Q", 0, lock=False)
+        self._heartbeat = self._mp.Value("d", 0.0, lock=False)
+        self._trace_flag = self._mp.Value("b", 0, lock=False)  # Worker records ticks while set
+        self.ring = SharedFrameRing(self._latest)
+
+        self._snapshot = initial_snapshot()
+        self._user = None             # (username, images) replayed after a restart
+        self.detector_enabled = True  # Replayed after a restart too
+        self.running = True
+        self.restarts = 0
+        self.frames_sent = 0
+        self.frames_processed = 0
+        self.pyramid_stats = (0, 0)   # Worker-side (cache hits, builds)
+        self._worker_counts = (0, 0, 0)  # Last (frames, hits, builds) reported by the current worker
+        self._proc = None
+        self._ready = threading.Event()  # Set once a worker has loaded its models and reported
+
+        self._start_worker()
+        self._reader = threading.Thread(target=self._read_results, daemon=True)
+        self._supervisor = threading.Thread(target=self._supervise, daemon=True)
+        self._reader.start()
+        self._supervisor.start()
+
+    # --- VisionSystem API ---
+    @property
+    def context(self):
+        return self._snapshot.data
+
+    def snapshot(self):
+        return self._snapshot
+
+    def get_context_json(self):
+        return self._snapshot.data
+
+    def wait_ready(self, timeout=None):
+        """Blocks until the worker has finished loading models. Returns: True if ready."""
+        return self._ready.wait(timeout)
+
+    def set_tracing(self, enabled):
+        """Worker ticks are only recorded (and shipped back) while some session is tracing."""
+        self._trace_flag.value = 1 if enabled else 0
+
+    def result_queue_depth(self):
+        try:
+            return self._results.qsize()
+        except (NotImplementedError, OSError):
+            return None  # qsize() is unsupported on macOS
+
+    def process_frame(self, frame):
+        if not isinstance(frame, FramePyramid):
+            frame = FramePyramid.from_bgr(frame)
+        if self.ring.write(frame):
+            self.frames_sent += 1
+        return frame
+
+    def set_detector(self, enabled):
+        """YOLO on/off in the worker (load_control). No-op if unchanged."""
+        if enabled == self.detector_enabled: return
+        self.detector_enabled = enabled
+        self._commands.put(("detector", enabled))
+
+    def load_user_into_memory(self, supabase_client, user_id, username):
+        """Downloads biometrics here (network I/O), embeds them in the worker."""
+        print(f"📡 Downloading Biometrics for: {username}...")
+        images = download_face_images(supabase_client, user_id)
+        self._user = (username, images)
+        self._commands.put(("load_user", username, images))
+
+    def stop(self):
+        self.running = False
+        try: self._commands.put(("stop",))
+        except Exception: pass
+        self._stop_worker(timeout=5.0)
+        self.ring.close()
+
+    # --- Worker Lifecycle ---
+    def _start_worker(self):
+        self._commands = self._mp.Queue()
+        self._results = self._mp.Queue(maxsize=RESULT_QUEUE_SIZE)
+        self._heartbeat.value = time.time() + STARTUP_GRACE
+        self._proc = self._mp.Process(
+            target=_vision_worker_main,
+            args=(self.ring.name, self._latest, self._heartbeat, self._trace_flag, self._commands, self._results),
+            name="avaani-vision",
+            daemon=True
+        )
+        self._proc.start()
+        if self._user is not None:
+            self._commands.put(("load_user", *self._user))
+        if not self.detector_enabled:
+            self._commands.put(("detector", False))
+
+    def _stop_worker(self, timeout=1.0):
+        proc = self._proc
+        if proc is None: return
+        proc.join(timeout)
+        if proc.is_alive():
+            proc.kill()
+            proc.join(timeout)
+
+    def _supervise(self):
+        while self.running:
+            time.sleep(HEARTBEAT_INTERVAL)
+            if not self.running: break
+            alive = self._proc.is_alive()
+            stalled = time.time() - self._heartbeat.value > STALL_TIMEOUT
+            if alive and not stalled: continue
+
+            reason = "stalled" if alive else f"crashed (exit {self._proc.exitcode})"
+            print(f"⚠️ Vision worker {reason}. Restarting...")
+            self._proc.kill()
+            self._stop_worker()
+            time.sleep(RESTART_BACKOFF)
+            if not self.running: break
+            self._start_worker()
+            self.restarts += 1
+
+    def _read_results(self):
+        while self.running:
+            results = self._results
+            try:
+                data, stats = results.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                time.sleep(0.1)  # Queue torn down by a restart; pick up the new one
+                continue
+            self._accumulate(stats["frames"], *stats["pyramid"])
+            replay_vision_metrics(stats["timings"])
+            if stats["ticks"]:
+                tracing.broadcast(stats["ticks"])
+            self._ready.set()
+            self._snapshot = ContextSnapshot(self._snapshot.version + 1, MappingProxyType(data))
+
+    def _accumulate(self, frames, hits, builds):
+        """Worker counters restart from zero with each new worker; keep process-lifetime totals here."""
+        counts = (frames, hits, builds)
+        if frames < self._worker_counts[0]:
+            self._worker_counts = (0, 0, 0)  # New worker after a restart
+        df, dh, db = (c - last for c, last in zip(counts, self._worker_counts))
+        self._worker_counts = counts
+        self.frames_processed += df
+        self.pyramid_stats = (self.pyramid_stats[0] + dh, self.pyramid_stats[1] + db)
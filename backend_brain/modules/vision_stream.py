@@ -0,0 +1,121 @@
+import math
+import asyncio
+import numbers
+from collections.abc import Mapping
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+DEFAULT_MAX_HZ = 10.0             # Pushes per second unless the client asks otherwise
+MIN_HZ = 0.5
+MAX_HZ = 30.0
+DEFAULT_QUANTUM = 0.02            # Float fields are snapped to this step before diffing
+
+# Fields the avatar can use. Internal/bookkeeping keys (timestamp, system_status) are left out.
+STREAM_FIELDS = (
+    "identity", "emotion", "emotion_intensity", "state_confidence", "emotion_probs",
+    "energy_level", "attention", "engagement", "gaze", "tracking", "posture",
+    "gestures", "holding", "surroundings"
+)
+
+_MISSING = object()
+
+def _positive_number(value):
+    """Client-supplied option -> finite float > 0, or None if it is anything else (ignored)."""
+    if isinstance(value, bool) or not isinstance(value, numbers.Real): return None
+    value = float(value)
+    return value if math.isfinite(value) and value > 0 else None
+
+def quantize(value, step):
+    """Snaps floats (recursively) to `step` so sensor jitter doesn't count as a change."""
+    if value is None or isinstance(value, (bool, str, numbers.Integral)):
+        return value
+    if isinstance(value, numbers.Real):
+        return round(round(float(value) / step) * step, 6)
+    if isinstance(value, Mapping):
+        return {k: quantize(v, step) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        items = [quantize(v, step) for v in value]
+        # Set-derived lists (gestures, holding) have no stable order
+        return sorted(items) if all(isinstance(v, str) for v in items) else items
+    return value
+
+# ==========================================
+# VISION DELTA STREAM
+# ==========================================
+class VisionDeltaStream:
+    """
+    Opt-in, per-connection push of vision context changes.
+    Each tick reads the latest VisionSystem snapshot, and sends only the fields whose
+    quantized value changed since the last push. Sends are awaited before the next tick,
+    so a slow client skips intermediate versions instead of building a backlog.
+    """
+    def __init__(self, vision, send_json):
+        self.vision = vision
+        self.send_json = send_json
+        self.max_hz = DEFAULT_MAX_HZ
+        self.quantum = DEFAULT_QUANTUM
+        self.fields = STREAM_FIELDS
+        self._last_sent = {}
+        self._last_version = -1
+        self._task = None
+
+    def configure(self, max_hz=None, quantum=None, fields=None):
+        """Applies client options from a 'vision_subscribe' packet. Forces a full resend. Invalid options are ignored."""
+        max_hz, quantum = _positive_number(max_hz), _positive_number(quantum)
+        if max_hz is not None:
+            self.max_hz = min(max(max_hz, MIN_HZ), MAX_HZ)
+        if quantum is not None:
+            self.quantum = quantum
+        if fields and isinstance(fields, (list, tuple)):
+            self.fields = tuple(f for f in fields if isinstance(f, str) and f in STREAM_FIELDS) or STREAM_FIELDS
+        self._last_sent = {}
+        self._last_version = -1
+
+    @property
+    def active(self):
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if not self.active:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None: return
+        self._task.cancel()
+        try:
+            await self._task
+        except (asyncio.CancelledError, Exception):
+            pass
+        self._task = None
+
+    def diff(self, data):
+        """Returns {field: quantized_value} for fields that changed since the last push."""
+        delta = {}
+        for key in self.fields:
+            if key not in data: continue
+            value = quantize(data[key], self.quantum)
+            if self._last_sent.get(key, _MISSING) != value:
+                delta[key] = value
+        self._last_sent.update(delta)
+        return delta
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            snapshot = self.vision.snapshot()
+            if snapshot.version != self._last_version:
+                self._last_version = snapshot.version
+                delta = self.diff(snapshot.data)
+                if delta:
+                    try:
+                        await self.send_json({
+                            "type": "vision_delta",
+                            "version": snapshot.version,
+                            "timestamp": snapshot.data.get("timestamp"),
+                            "data": delta
+                        })
+                    except Exception:
+                        return  # Socket gone; the connection handler cleans up
+            await asyncio.sleep(max((1.0 / self.max_hz) - (loop.time() - started), 0.0))
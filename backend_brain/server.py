@@ -2,23 +2,34 @@ import uvicorn
 import os
 import sys
 import json
+import time
 import base64
+import uuid
+import hmac
 import numpy as np
-import cv2
 import asyncio
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 from dotenv import load_dotenv
 
 # 1. Path Setup (Ensure we can import from modules)
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 # 2. Module Imports
+# Model-heavy modules (brain, ears, mouth, eyes) are imported by the subsystem loaders below
 from modules.auth import router as auth_router, supabase  # We need supabase client for face loading
-from modules.brain import BrainSystem
-from modules.eyes import VisionSystem
-from modules.ears import EarSystem
-from modules.mouth import Mouth
+from modules.startup import SubsystemRegistry
+from modules.vision_stream import VisionDeltaStream
+from modules.video_ingest import VideoStreamDecoder
+from modules.frame_pyramid import FramePyramid
+from modules.intent_router import IntentRouter, parse_timezone
+from modules.load_control import LoadController, SessionQuality
+from modules.playout import PlayoutScheduler
+from modules.echo import EchoSuppressor
+from modules.vision_process import VisionProcess, STARTUP_GRACE
+from modules import metrics
+from modules import tracing
 
 load_dotenv()
 
@@ -42,131 +53,461 @@ app.include_router(auth_router)
 # ==========================================
 # GLOBAL AI STATE
 # ==========================================
-print("🚀 Booting AI Core Systems...")
+# Under gunicorn (gunicorn.conf.py) this module is imported once in the master with
+# AVAANI_PREFORK=1: model files are verified (and downloaded) once here instead of by every
+# worker racing. The Kokoro weights are read here in ORT format and every worker's TTS session
+# runs on those copy-on-write pages (see modules/mouth.py), so they are in memory once.
+# Whisper (CTranslate2 copies its weights) and the vision process remain per worker.
+PREFORK = os.getenv("AVAANI_PREFORK") == "1"
+MAX_SESSIONS_PER_WORKER = int(os.getenv("MAX_SESSIONS_PER_WORKER", "8"))
+# Send a "turn_timing" packet after each reply (used by benchmarks/e2e_latency.py)
+TURN_TIMINGS = os.getenv("AVAANI_TURN_TIMINGS") == "1"
+# Enables the /admin/traces endpoints (sent as the X-Admin-Token header). Unset: endpoints disabled.
+ADMIN_TOKEN = os.getenv("AVAANI_ADMIN_TOKEN")
 
-# 1. BRAIN: The LLM Core (Groq)
-brain = BrainSystem()
+# Subsystems each WebSocket feature needs before it is served
+FEATURES = {
+    "biometrics": ("vision", "auth"),
+    "video": ("vision",),
+    "conversation": ("ears", "brain", "mouth")
+}
 
-# 2. EYES: Vision System (Background Threads)
-vision = VisionSystem() 
+subsystems = SubsystemRegistry()
+intent_router = IntentRouter()  # Trivial turns (greetings, time, stop...) answered without the LLM
+active_sessions = 0
+_preloaded = {}
+_vision_process = None
 
-# 3. MOUTH: TTS Engine (Kokoro)
-mouth = Mouth(voice="af_sarah", speed=1.0)
+def preload_models():
+    """Pre-fork: verify every model file once and read what the loaders take as bytes. Nothing here may own threads or sessions."""
+    from modules import model_store
+    from modules.ears import read_model_files, USE_SMALL_MODEL, SMALL_MODEL_GROUP
+    from modules.mouth import read_model_bytes
+    print("📦 Preloading Model Files...")
+    _preloaded["kokoro"] = read_model_bytes()
+    _preloaded["whisper"] = read_model_files()
+    if USE_SMALL_MODEL:
+        _preloaded["whisper_small"] = read_model_files(SMALL_MODEL_GROUP)
+    # Vision models load in each worker's vision process: only make sure they are on disk and intact
+    model_store.ensure_group("yolo")
+    model_store.ensure_group("deepface")
 
-# Note: Ears are initialized per-connection to maintain separate VAD buffers
+# --- Loaders (run concurrently in background threads; heavy imports live here) ---
+def _load_brain():
+    # 1. BRAIN: The LLM Core (Groq)
+    from modules.brain import BrainSystem
+    return BrainSystem()
+
+def _load_vision():
+    # 2. EYES: Vision System
+    # "process" (default): separate worker process fed through a shared-memory frame ring,
+    # so vision never competes with the audio path for the GIL and a crash/stall is restarted.
+    # "thread": legacy in-process background threads.
+    if _vision_process is None:
+        from modules.eyes import VisionSystem
+        return VisionSystem()
+    if not _vision_process.wait_ready(STARTUP_GRACE):
+        raise TimeoutError("Vision worker did not come up")
+    return _vision_process
+
+def _load_mouth():
+    # 3. MOUTH: TTS Engine (Kokoro)
+    from modules.mouth import Mouth
+    return Mouth(voice="af_sarah", speed=1.0, model_bytes=_preloaded.get("kokoro"))
+
+def _load_ears():
+    # 4. EARS: Whisper is shared by this worker's connections.
+    # Note: EarSystem itself is per-connection to maintain separate VAD buffers
+    # Returns: (main model, small model for short utterances or None)
+    from modules.ears import load_stt_model, USE_SMALL_MODEL, SMALL_MODEL_GROUP
+    small = load_stt_model(_preloaded.get("whisper_small"), SMALL_MODEL_GROUP) if USE_SMALL_MODEL else None
+    return load_stt_model(_preloaded.get("whisper")), small
+
+def _load_auth():
+    return supabase.connect()
+
+subsystems.register("brain", _load_brain)
+subsystems.register("vision", _load_vision)
+subsystems.register("mouth", _load_mouth)
+subsystems.register("ears", _load_ears)
+subsystems.register("auth", _load_auth)
+
+def init_worker():
+    """Post-fork (or single process): start loading this worker's subsystems. Returns immediately."""
+    global _vision_process
+    if subsystems.started_at is not None: return
+    print("🚀 Booting AI Core Systems...")
+    # Vision runs in its own (spawned) process, which loads its own models
+    if os.getenv("VISION_MODE", "process") != "thread":
+        _vision_process = VisionProcess()
+    subsystems.start()
+
+def _apply_worker_tier(tier):
+    """Worker-wide part of a quality tier (vision is shared by every session)."""
+    vision = subsystems.get("vision")
+    if vision is not None:
+        vision.set_detector(tier.detector)
+
+load_controller = LoadController(apply=_apply_worker_tier)
+
+def _sync_vision_tracing():
+    """Vision worker ticks are only shipped back while at least one session is tracing."""
+    if _vision_process is not None:
+        _vision_process.set_tracing(tracing.any_enabled())
+
+def _discard_speculation(speculation):
+    """Drops a drafted reply. The LLM call cannot be interrupted, so its time is booked as wasted when it returns."""
+    _, started, task = speculation
+    task.add_done_callback(lambda _: metrics.SPECULATION_WASTED_SECONDS.labels("llm").inc(time.time() - started))
+
+async def _cancel_reply(reply):
+    """Stops a reply mid-playout: nothing more is synthesized or sent for it."""
+    if reply is None or reply.done(): return
+    reply.cancel()
+    await asyncio.gather(reply, return_exceptions=True)
+
+if PREFORK:
+    preload_models()
+
+@app.on_event("startup")
+async def start_subsystems():
+    init_worker()
+    asyncio.create_task(load_controller.run(lambda: subsystems.get("vision")))
 
 # ==========================================
 # WEBSOCKET CONTROLLER
 # ==========================================
 @app.websocket("/ws/avaani")
 async def websocket_endpoint(websocket: WebSocket):
+    global active_sessions
     await websocket.accept()
-    print("🔌 Client Connected")
+
+    # Per-worker session cap: tell the client to retry (the balancer picks another worker)
+    # (also while the load controller is shedding)
+    if active_sessions >= MAX_SESSIONS_PER_WORKER or not load_controller.tier.accept_sessions:
+        await websocket.send_json({"type": "system", "status": "server_busy"})
+        await websocket.close(code=1013)
+        return
+    active_sessions += 1
+    tracer = tracing.SessionTracer(f"{os.getpid()}-{uuid.uuid4().hex[:12]}")  # Owning worker's pid first (see _tracer_or_404)
+    tracing.register(tracer)
+    print(f"🔌 Client Connected ({active_sessions}/{MAX_SESSIONS_PER_WORKER}) session={tracer.session_id}")
     
-    # Initialize Per-Connection Resources
-    ears = EarSystem()
+    # Initialize Per-Connection Resources (created once their subsystems are loaded)
+    ears = None
+    vision_stream = None
+    video_decoder = None  # Created on the first "video_stream" chunk
+    speculation = None    # (ears speculation id, started, task drafting the reply) in speculative mode
+    reply = None          # Task speaking the current reply (see speak); the receive loop keeps running meanwhile
+    timezone = None       # User's ZoneInfo from "config"; until then time/date questions go to the LLM
+    echo = EchoSuppressor()  # Removes the reply audio sent below from this session's mic audio
+    quality = SessionQuality(load_controller)
+    quality.poll()        # Clients assume "full" until told otherwise
+    warned = set()
+
+    async def feature_ready(feature):
+        """True if every subsystem behind `feature` is loaded; tells the client once if not."""
+        missing = subsystems.pending(*FEATURES[feature])
+        if missing and feature not in warned:
+            warned.add(feature)
+            await websocket.send_json({"type": "system", "status": "warming_up", "feature": feature, "pending": missing})
+        return not missing
+
+    async def speak(response_text, cache, emotion, turn, llm_started, llm_done):
+        """Streams the reply's audio through a PlayoutScheduler, then response_end (and turn_timing)."""
+        mouth = subsystems.get("mouth")
+        vision = subsystems.get("vision")
+        first_audio = None
+        seen_version = -1
+        live_emotion = emotion
+
+        async def synthesize(segment):
+            chunk_wait = tracing.now_us()
+            async for pcm_chunk, sample_rate in mouth.generate_stream(segment, cache=cache):
+                tracer.complete("tts.chunk", chunk_wait, tracing.now_us() - chunk_wait, "tts", {"bytes": len(pcm_chunk)})
+                yield pcm_chunk, sample_rate
+                chunk_wait = tracing.now_us()
+
+        async def send(pcm_chunk, sample_rate):
+            nonlocal first_audio, seen_version, live_emotion
+            if first_audio is None:
+                first_audio = time.time()
+                metrics.TTS_FIRST_CHUNK_SECONDS.observe(first_audio - llm_done)
+                load_controller.observe("tts_first_chunk", first_audio - llm_done)
+                if turn:
+                    metrics.TURN_SECONDS.observe(first_audio - turn["speech_end"])
+            # Encode Audio Chunk
+            b64_audio = base64.b64encode(pcm_chunk).decode('utf-8')
+
+            # Get *Latest* Emotion (updates in real-time as user moves)
+            # This allows the avatar to react mid-sentence if the user frowns/smiles
+            snapshot = vision.snapshot() if vision else None
+            if snapshot is not None and snapshot.version != seen_version:
+                seen_version = snapshot.version
+                live_emotion = snapshot.data.get("emotion", "neutral")
+
+            echo.played(pcm_chunk, sample_rate)
+            with tracer.span("send", type="audio_chunk"):
+                await websocket.send_json({
+                    "type": "audio_chunk",
+                    "payload": b64_audio,
+                    "sample_rate": sample_rate,
+                    "emotion": live_emotion
+                })
+
+        playout = PlayoutScheduler(synthesize, send)
+        try:
+            await playout.play(response_text)
+        except asyncio.CancelledError:
+            # Client drops its buffered audio; nothing further is synthesized for this reply
+            metrics.TTS_PLAYOUTS.labels("cancelled").inc()
+            echo.cancel_reference()
+            tracer.instant("tts.cancelled", sent_s=round(playout.sent_seconds, 2))
+            try: await websocket.send_json({"type": "response_end", "cancelled": True})
+            except Exception: pass
+            raise
+        except Exception as e:
+            print(f"❌ Playout Error: {e}")
+            metrics.TTS_PLAYOUTS.labels("error").inc()
+        else:
+            metrics.TTS_PLAYOUTS.labels("completed").inc()
+
+        # 7. End Interaction
+        with tracer.span("send", type="response_end"):
+            await websocket.send_json({"type": "response_end"})
+
+        if TURN_TIMINGS and turn and first_audio is not None:
+            await websocket.send_json({
+                "type": "turn_timing",
+                "endpoint_ms": round((turn["endpointed"] - turn["speech_end"]) * 1000, 1),
+                "stt_ms": round(turn["stt"] * 1000, 1),
+                "stt_path": turn["stt_path"],
+                "speculated": turn["speculation"] is not None,
+                "llm_ms": round((llm_done - llm_started) * 1000, 1),
+                "tts_first_chunk_ms": round((first_audio - llm_done) * 1000, 1),
+                "tts_underruns": playout.underruns,
+                "total_ms": round((first_audio - turn["speech_end"]) * 1000, 1)
+            })
     
     try:
         while True:
             # 1. Receive JSON Packet from Frontend
             # Format: { "type": "...", "payload": "..." }
-            data = await websocket.receive_json()
-            packet_type = data.get("type")
-            payload = data.get("payload")
+            raw = await websocket.receive_text()
+
+            tier = quality.poll()
+            if tier is not None:
+                tracer.instant("quality_tier", tier=tier.name)
+                await websocket.send_json({"type": "system", "status": "quality", "tier": tier.name, "vision_fps": tier.vision_fps})
+            with tracer.span("receive", bytes=len(raw)) as span:
+                data = json.loads(raw)
+                packet_type = data.get("type")
+                payload = data.get("payload")
+                span.set(type=packet_type)
 
             # ------------------------------------------------
             # A. CONFIGURATION / LOGIN (Load User Faces)
             # ------------------------------------------------
             if packet_type == "config":
-                # Frontend sends this after login: { "type": "config", "user_id": "...", "username": "..." }
+                # Frontend sends this after login: { "type": "config", "user_id": "...", "username": "...", "timezone": "Asia/Kolkata" }
                 user_id = data.get("user_id")
                 username = data.get("username")
-                if user_id and username:
+                if "timezone" in data:
+                    timezone = parse_timezone(data.get("timezone"))
+                if username: tracer.info["username"] = username
+                if user_id and username and await feature_ready("biometrics"):
                     print(f"👤 Loading Biometrics for: {username}")
                     # Offload to thread to not block WS
+                    vision = subsystems.get("vision")
                     await asyncio.to_thread(vision.load_user_into_memory, supabase, user_id, username)
                     await websocket.send_json({"type": "system", "status": "biometrics_loaded"})
 
+            # ------------------------------------------------
+            # A1. SESSION TRACE (Chrome trace format)
+            # ------------------------------------------------
+            elif packet_type == "trace":
+                # { "type": "trace", "enabled": true } ... { "type": "trace", "enabled": false }
+                # Stopping writes the buffer to TRACE_DIR; admins can also fetch it via /admin/traces.
+                if data.get("enabled"):
+                    tracer.start()
+                    _sync_vision_tracing()
+                    await websocket.send_json({"type": "system", "status": "trace_started", "session": tracer.session_id})
+                elif tracer.enabled:
+                    tracer.stop()
+                    _sync_vision_tracing()
+                    await asyncio.to_thread(tracer.dump)
+                    await websocket.send_json({"type": "system", "status": "trace_saved", "session": tracer.session_id, "events": len(tracer.events)})
+
+            # ------------------------------------------------
+            # A2. LIVE VISION SUBSCRIPTION (Opt-in Deltas)
+            # ------------------------------------------------
+            elif packet_type == "vision_subscribe":
+                # { "type": "vision_subscribe", "max_hz": 10, "quantum": 0.02, "fields": ["gaze", "tracking", "emotion"] }
+                # Server then pushes { "type": "vision_delta", "version": n, "data": {changed fields} }
+                if not await feature_ready("video"): continue
+                if vision_stream is None:
+                    vision_stream = VisionDeltaStream(subsystems.get("vision"), websocket.send_json)
+                vision_stream.configure(data.get("max_hz"), data.get("quantum"), data.get("fields"))
+                vision_stream.start()
+
+            elif packet_type == "vision_unsubscribe":
+                if vision_stream is not None:
+                    await vision_stream.stop()
+
+            # ------------------------------------------------
+            # A3. BARGE-IN (client stops the avatar mid-reply)
+            # ------------------------------------------------
+            elif packet_type == "interrupt":
+                await _cancel_reply(reply)
+                reply = None
+
             # ------------------------------------------------
             # B. VIDEO STREAM (Eyes)
             # ------------------------------------------------
             elif packet_type == "video":
+                if not await feature_ready("video"): continue
+                if not quality.frame_due(): continue  # Paced under load (skips the JPEG decode too)
                 try:
-                    # Decode Base64 -> OpenCV Image
-                    img_bytes = base64.b64decode(payload)
-                    nparr = np.frombuffer(img_bytes, np.uint8)
-                    frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+                    # Decode Base64 -> Lazy Resolution Pyramid (each model decodes the size it needs)
+                    with tracer.span("decode.video"):
+                        img_bytes = base64.b64decode(payload)
+                        frame = FramePyramid.from_jpeg(img_bytes)
                     
                     if frame is not None:
                         # Non-blocking update (Vision runs in background threads)
-                        vision.process_frame(frame)
-                        
-                        # OPTIONAL: Send back gaze/tracking data for UI debugging
-                        # await websocket.send_json({
-                        #     "type": "vision_debug", 
-                        #     "data": vision.get_context_json()
-                        # })
+                        with tracer.span("vision.submit"):
+                            subsystems.get("vision").process_frame(frame)
+                        # Live gaze/tracking/emotion goes out via "vision_subscribe" deltas
                 except Exception:
                     pass
 
+            # ------------------------------------------------
+            # B2. COMPRESSED VIDEO STREAM (Eyes, PyAV)
+            # ------------------------------------------------
+            elif packet_type == "video_stream":
+                # { "type": "video_stream", "format": "webm", "payload": "<base64 MediaRecorder chunk>" }
+                # The first chunk must carry the container header (MediaRecorder does this).
+                if not await feature_ready("video"): continue
+                try:
+                    if video_decoder is None:
+                        video_decoder = VideoStreamDecoder(data.get("format", "webm"))
+
+                    with tracer.span("decode.video_stream"):
+                        fed = video_decoder.feed(base64.b64decode(payload))
+                    if not fed:
+                        # Decoder failed or fell too far behind: client restarts its recorder
+                        video_decoder.close()
+                        video_decoder = None
+                        await websocket.send_json({"type": "system", "status": "video_stream_reset"})
+                        continue
+
+                    frame = video_decoder.latest_frame() if quality.frame_due() else None
+                    if frame is not None:
+                        with tracer.span("vision.submit"):
+                            subsystems.get("vision").process_frame(frame)
+                except Exception as e:
+                    print(f"❌ Video Stream Error: {e}")
+
             # ------------------------------------------------
             # C. AUDIO STREAM (Ears)
             # ------------------------------------------------
             elif packet_type == "audio":
+                if not await feature_ready("conversation"): continue
                 try:
-                    # 1. Decode Base64 -> PCM Bytes
-                    audio_bytes = base64.b64decode(payload)
-                    
-                    # 2. Convert to Float32 for VAD/Whisper
-                    # Assumes Frontend sends Int16 PCM
-                    audio_chunk = np.frombuffer(audio_bytes, dtype=np.int16).astype(np.float32) / 32768.0
+                    if ears is None:
+                        from modules.ears import EarSystem
+                        ears = await asyncio.to_thread(EarSystem, *subsystems.get("ears"))
+                        ears.tracer = tracer
+                    brain = subsystems.get("brain")
+                    vision = subsystems.get("vision")
+
+                    with tracer.span("decode.audio"):
+                        # 1. Decode Base64 -> PCM Bytes
+                        audio_bytes = base64.b64decode(payload)
+                        
+                        # 2. Convert to Float32 for VAD/Whisper
+                        # Assumes Frontend sends Int16 PCM
+                        audio_chunk = np.frombuffer(audio_bytes, dtype=np.int16).astype(np.float32) / 32768.0
                     
-                    # 3. Process Chunk (VAD Check)
-                    # Returns text ONLY if a sentence is finished
-                    user_text = ears.process_chunk(audio_chunk)
+                    # 3. Remove Avaani's own voice picked up by the user's mic
+                    with tracer.span("echo"):
+                        audio_chunk = echo.process(audio_chunk)
+
+                    # 4. Process Chunk (VAD Check)
+                    # Returns text ONLY if a sentence is finished. Off the loop: an endpoint runs the Whisper
+                    # decode, which would otherwise stall the playout pacing of a reply still being spoken
+                    quality.apply_ears(ears)
+                    user_text = await asyncio.to_thread(ears.process_chunk, audio_chunk)
+                    if user_text and ears.last_stt and ears.last_turn["speculation"] is None:
+                        load_controller.observe("stt_rtf", ears.last_turn["stt"] / max(ears.last_stt["seconds"], 0.1))
+
+                    # --- C2. SPECULATION (AVAANI_SPECULATE=1) ---
+                    # Draft the reply as soon as the pause transcript exists; throw it away if speech resumes.
+                    pending = ears.speculation
+                    if speculation is not None and not user_text and (pending is None or pending["id"] != speculation[0]):
+                        _discard_speculation(speculation)
+                        speculation = None
+                    if pending is not None and pending["text"] and speculation is None and not intent_router.match(pending["text"], timezone):
+                        vision_context = vision.get_context_json() if vision else {}
+                        speculation = (pending["id"], time.time(),
+                                       asyncio.create_task(asyncio.to_thread(brain.draft, pending["text"], vision_context)))
                     
                     # --- D. INTERACTION TRIGGER ---
                     if user_text:
                         print(f"🗣️ User: {user_text}")
+                        await _cancel_reply(reply)  # A new turn supersedes whatever is still being spoken
+                        reply = None
                         
                         # 1. Notify Frontend: "I heard you, thinking..."
-                        await websocket.send_json({"type": "status", "mode": "thinking"})
+                        with tracer.span("send", type="status"):
+                            await websocket.send_json({"type": "status", "mode": "thinking"})
                         
-                        # 2. Snapshot Vision Context
-                        vision_context = vision.get_context_json()
+                        # 2. Snapshot Vision Context (empty until vision is loaded)
+                        vision_context = vision.get_context_json() if vision else {}
                         
                         # 3. Brain Inference (Run in thread to avoid blocking video)
-                        response_text = await asyncio.to_thread(brain.think, user_text, vision_context)
+                        fast = intent_router.route(user_text, vision_context, timezone)
+                        metrics.INTENT_ROUTES.labels(fast.intent if fast else "llm").inc()
+                        if fast is not None:
+                            # Fast path: answered locally, no cloud round-trip
+                            if speculation is not None:
+                                _discard_speculation(speculation)
+                            llm_started = time.time()
+                            with tracer.span("brain.fast_path", "brain", intent=fast.intent):
+                                response_text = fast.text
+                                brain.note(user_text, response_text, vision_context)
+                        elif speculation is not None and ears.last_turn["speculation"] == speculation[0]:
+                            # Endpoint confirmed the pause: keep the reply drafted during it
+                            llm_started = speculation[1]
+                            with tracer.span("brain.commit", "brain") as span:
+                                user_message, response_text = await speculation[2]
+                                brain.commit(user_message, response_text)
+                                span.set(chars=len(response_text), drafted_ms=round((time.time() - llm_started) * 1000, 1))
+                        else:
+                            if speculation is not None:
+                                _discard_speculation(speculation)
+                            llm_started = time.time()
+                            with tracer.span("brain.think", "brain") as span:
+                                response_text = await asyncio.to_thread(brain.think, user_text, vision_context)
+                                span.set(chars=len(response_text))
+                        speculation = None
+                        llm_done = time.time()
                         print(f"🤖 Brain: {response_text}")
                         
                         # 4. Get Initial Emotion (for Avatar Face)
                         current_emotion = vision_context.get("emotion", "neutral")
                         
                         # 5. Send Text Response Start
-                        await websocket.send_json({
-                            "type": "response_start",
-                            "text": response_text,
-                            "emotion": current_emotion
-                        })
-                        
-                        # 6. Stream Audio Response (Mouth)
-                        async for pcm_chunk, sample_rate in mouth.generate_stream(response_text):
-                            # Encode Audio Chunk
-                            b64_audio = base64.b64encode(pcm_chunk).decode('utf-8')
-                            
-                            # Get *Latest* Emotion (updates in real-time as user moves)
-                            # This allows the avatar to react mid-sentence if the user frowns/smiles
-                            live_emotion = vision.context.get("emotion", "neutral")
-                            
+                        with tracer.span("send", type="response_start"):
                             await websocket.send_json({
-                                "type": "audio_chunk",
-                                "payload": b64_audio,
-                                "sample_rate": sample_rate,
-                                "emotion": live_emotion 
+                                "type": "response_start",
+                                "text": response_text,
+                                "emotion": current_emotion
                             })
-                            
-                        # 7. End Interaction
-                        await websocket.send_json({"type": "response_end"})
+                        
+                        # 6. Stream Audio Response (Mouth), paced, while this loop keeps receiving
+                        reply = asyncio.create_task(speak(response_text, fast is not None and fast.cacheable, current_emotion,
+                                                          ears.last_turn, llm_started, llm_done))
                         
                 except Exception as e:
                     print(f"❌ Audio Pipeline Error: {e}")
@@ -177,20 +518,148 @@ async def websocket_endpoint(websocket: WebSocket):
     except Exception as e:
         print(f"⚠️ Server Error: {e}")
 
+    finally:
+        active_sessions -= 1
+        if vision_stream is not None:
+            await vision_stream.stop()
+        if video_decoder is not None:
+            video_decoder.close()
+        if speculation is not None:
+            _discard_speculation(speculation)
+        await _cancel_reply(reply)
+        tracing.unregister(tracer)
+        if tracer.enabled:
+            # Keep traces of sessions that dropped mid-capture (often the laggy ones)
+            tracer.stop()
+            try: await asyncio.to_thread(tracer.dump)
+            except Exception as e: print(f"⚠️ Trace Dump Error: {e}")
+        _sync_vision_tracing()
+
 # ==========================================
 # HEALTH CHECK
 # ==========================================
 @app.get("/")
 def health_check():
+    brain = subsystems.get("brain")
+    vision = subsystems.get("vision")
+    mouth = subsystems.get("mouth")
     return {
         "status": "online", 
+        "sessions": {"active": active_sessions, "max": MAX_SESSIONS_PER_WORKER, "worker_pid": os.getpid()},
         "modules": {
-            "brain": "active" if brain.client else "offline",
-            "vision": "active" if vision.running else "offline",
-            "mouth": "active" if mouth.kokoro else "offline"
+            "brain": "active" if brain and brain.client else "offline",
+            "vision": "active" if vision and vision.running else "offline",
+            "mouth": "active" if mouth and mouth.kokoro else "offline"
         }
     }
 
+def runtime_stats():
+    """Worker counters for /metrics (read at scrape time)."""
+    stats = {
+        "active_sessions": active_sessions,
+        "max_sessions": MAX_SESSIONS_PER_WORKER,
+        "subsystems_ready": sum(1 for s in subsystems.status().values() if s["state"] == "ready"),
+        "video_decode_buffer_bytes": sum(d.buffered_bytes for d in list(VideoStreamDecoder.live)),
+        "video_frames_decoded": VideoStreamDecoder.total_decoded,
+        "video_frames_skipped": VideoStreamDecoder.total_skipped,
+        "quality_tier": load_controller.level,
+        "quality_tier_changes": load_controller.changes,
+        "event_loop_lag_seconds": load_controller.signals.get("loop_lag")
+    }
+    hits, builds = FramePyramid.cache_hits, FramePyramid.cache_builds
+
+    vision = subsystems.get("vision")
+    if vision is not None:
+        processed = vision.frames_processed
+        stats["vision_frames_processed"] = processed
+        stats["vision_fps"] = _vision_rate.update(processed)
+        if isinstance(vision, VisionProcess):
+            stats["vision_frames_sent"] = vision.frames_sent
+            stats["vision_frames_dropped"] = max(0, vision.frames_sent - processed) + vision.ring.rejected
+            stats["vision_worker_restarts"] = vision.restarts
+            stats["vision_result_queue_depth"] = vision.result_queue_depth()
+            hits, builds = hits + vision.pyramid_stats[0], builds + vision.pyramid_stats[1]
+
+    stats["frame_pyramid_hits"] = hits
+    stats["frame_pyramid_builds"] = builds
+    if hits + builds:
+        stats["frame_pyramid_hit_ratio"] = hits / (hits + builds)
+    return stats
+
+_vision_rate = metrics.RateTracker()
+metrics.set_runtime_source(runtime_stats)
+
+@app.get("/metrics")
+def metrics_endpoint():
+    """Prometheus scrape target: per-stage latency histograms plus runtime gauges."""
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+# ==========================================
+# SESSION TRACES (Admin)
+# ==========================================
+# Sessions live in the worker that owns their socket, and under gunicorn each request lands on
+# whichever worker accepts it. Session ids start with the owner's pid ("<pid>-<hex>"): a request
+# that reaches another worker gets 421 naming both pids, so clients can simply retry (a new
+# connection may land elsewhere). GET /admin/traces lists only the answering worker's sessions.
+def _require_admin(token):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Tracing admin is disabled (set AVAANI_ADMIN_TOKEN)")
+    if token is None or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+def _tracer_or_404(session_id):
+    owner = session_id.split("-", 1)[0]
+    if owner.isdigit() and int(owner) != os.getpid():
+        raise HTTPException(status_code=421, detail=f"Session {session_id} belongs to worker {owner}, "
+                                                    f"this is worker {os.getpid()}: retry on a new connection")
+    tracer = tracing.get(session_id)
+    if tracer is None:
+        raise HTTPException(status_code=404, detail=f"No open session {session_id} on worker {os.getpid()}")
+    return tracer
+
+@app.get("/admin/traces")
+def list_traces(x_admin_token: str = Header(None)):
+    _require_admin(x_admin_token)
+    return {
+        "worker_pid": os.getpid(),
+        "sessions": [
+            {"session": t.session_id, "tracing": t.enabled, "events": len(t.events), "dropped": t.dropped, **t.info}
+            for t in tracing.sessions()
+        ]
+    }
+
+@app.post("/admin/traces/{session_id}/start")
+def start_trace(session_id: str, x_admin_token: str = Header(None)):
+    _require_admin(x_admin_token)
+    _tracer_or_404(session_id).start()
+    _sync_vision_tracing()
+    return {"session": session_id, "tracing": True}
+
+@app.post("/admin/traces/{session_id}/stop")
+def stop_trace(session_id: str, x_admin_token: str = Header(None)):
+    """Stops capture and writes the trace file. Returns: its path."""
+    _require_admin(x_admin_token)
+    tracer = _tracer_or_404(session_id)
+    tracer.stop()
+    _sync_vision_tracing()
+    return {"session": session_id, "tracing": False, "path": tracer.dump(), "events": len(tracer.events)}
+
+@app.get("/admin/traces/{session_id}")
+def get_trace(session_id: str, x_admin_token: str = Header(None)):
+    """Current buffer as Chrome trace JSON (open in ui.perfetto.dev)."""
+    _require_admin(x_admin_token)
+    return JSONResponse(_tracer_or_404(session_id).to_json())
+
+@app.get("/ready")
+def readiness():
+    """Per-subsystem load state and time. 503 until everything is loaded."""
+    ready = subsystems.all_ready
+    return JSONResponse(
+        {"ready": ready, "subsystems": subsystems.status()},
+        status_code=200 if ready else 503
+    )
+
 if __name__ == "__main__":
     # Host 0.0.0.0 is crucial for allowing external connections (e.g. from frontend)
+    # Development server. Production: gunicorn -c gunicorn.conf.py server:app
     uvicorn.run("server:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
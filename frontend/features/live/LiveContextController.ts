@@ -56,6 +56,11 @@ export class LiveContextController {
     this.ctx = ctx;
   }
 
+  /** Call with `data` from a "vision_delta" packet (only the fields that changed) */
+  public applyDelta(delta: Partial<AvaaniLiveContext>) {
+    this.ctx = { ...(this.ctx ?? {}), ...delta };
+  }
+
   /** Use this to drive IdleBodyController intensity */
   public getEnergy() {
     return this.s.energy;